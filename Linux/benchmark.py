@@ -0,0 +1,961 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the LogFS FUSE logger
+Drives the Operations methods directly, no mount needed
+
+Usage:
+    python3 benchmark.py readdir --sizes 1000 100000 1000000
+    python3 benchmark.py events --sink-delay 0.001
+    python3 benchmark.py read --sizes 1M 100M 1G
+    python3 benchmark.py startup --sizes 10000 100000 500000
+    python3 benchmark.py dedup --config cloud_developer.py --scale 100
+    python3 benchmark.py compress --files 200 --file-size 512K
+    python3 benchmark.py synthetic --size 8G --read 2G
+    python3 benchmark.py stress --threads 1 4 16 --seconds 5
+    python3 benchmark.py probes --dirs 2000 --rounds 5
+    python3 benchmark.py sessions --files 2000 --file-size 1M
+    python3 benchmark.py detect --events 1000000 --rate 100000
+    python3 benchmark.py canary --files 2000 --opens 10 --reply-delay 0.05
+    python3 benchmark.py case --sizes 10000 100000 1000000
+    python3 benchmark.py control --batch 1 100 1000 --rotations 20
+    python3 benchmark.py mount --presets strict default fast --files 5000   (needs /dev/fuse)
+"""
+
+import argparse
+import asyncio
+import ctypes
+from datetime import datetime
+import json
+import mmap
+import os
+import random
+import resource
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from canary import DnsAlerter
+from content import SyntheticContent, parse_size
+from control import ControlServer
+from detector import CrawlDetector
+from events import EventPipeline
+from fuse import FUSE, FuseOSError
+from fuse_logger import LogFS
+from generator import GeneratedTree
+from image import write_image
+from mount import PRESETS, mount_options
+from nodes import FILE_MODE
+from procinfo import Accessor
+
+
+def build_tree(fs, count, files_per_dir=100, dirs_per_dir=10):
+    """Populate fs with count files spread over a balanced directory tree"""
+    dirs = ['']
+    for k in range(1, (count + files_per_dir - 1) // files_per_dir):
+        dirs.append(dirs[(k - 1) // dirs_per_dir] + '/dir%d' % k)
+    for i in range(count):
+        fs.add_file(dirs[i // files_per_dir] + '/file%d.txt' % i, b'decoy')
+    return [d or '/' for d in dirs]
+
+
+def legacy_readdir(fs, path):
+    """Original full-scan readdir, kept for comparison"""
+    entries = ['.', '..']
+    if path == '/':
+        for item_path in fs.files:
+            if item_path != '/' and item_path.count('/') == 1:
+                entries.append(item_path[1:])
+    else:
+        prefix = path + '/'
+        for item_path in fs.files:
+            if item_path.startswith(prefix) and item_path != path:
+                remainder = item_path[len(prefix):]
+                if '/' not in remainder:
+                    entries.append(remainder)
+    return entries
+
+
+def time_listing(func, fs, dirs, budget):
+    """Average seconds per listing, cycling through dirs for up to budget seconds"""
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < budget:
+        func(fs, dirs[calls % len(dirs)])
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / calls, calls
+
+
+def bench_readdir(args):
+    print(f'{"entries":>10} {"dirs":>8} {"indexed":>14} {"full scan":>14} {"speedup":>9}')
+    for size in args.sizes:
+        fs = LogFS()
+        dirs = build_tree(fs, size)
+        indexed, _ = time_listing(lambda fs, p: fs.readdir(p, None), fs, dirs, args.budget)
+        if args.skip_legacy:
+            print(f'{size:>10} {len(dirs):>8} {indexed * 1e6:>12.1f}us')
+            continue
+        scanned, _ = time_listing(legacy_readdir, fs, dirs, args.budget)
+        print(f'{size:>10} {len(dirs):>8} {indexed * 1e6:>12.1f}us '
+              f'{scanned * 1e6:>12.1f}us {scanned / indexed:>8.0f}x')
+
+
+class SlowSink:
+    """Sink that stalls on every write, like a blocked pipe or a full disk"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, batch):
+        time.sleep(self.delay)
+        self.lines += len(batch)
+
+    def close(self):
+        pass
+
+
+def legacy_log(sink, operation, path, extra=''):
+    """Original synchronous LogFS.log, writing straight to a sink"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    sink.write([f'[{timestamp}] {operation:12} {path} {extra}'])
+
+
+def bench_events(args):
+    print(f'{"logger":>12} {"calls":>9} {"per call":>12} {"dropped":>9}')
+
+    sink = SlowSink(args.sink_delay)
+    calls = min(args.calls, int(args.budget / max(args.sink_delay, 1e-6)) + 1)
+    start = time.perf_counter()
+    for i in range(calls):
+        legacy_log(sink, 'OPEN', '/aws/credentials')
+    elapsed = time.perf_counter() - start
+    print(f'{"synchronous":>12} {calls:>9} {elapsed / calls * 1e6:>10.2f}us {0:>9}')
+
+    events = EventPipeline([SlowSink(args.sink_delay)], max_queue=args.queue_size)
+    fs = LogFS(events=events)
+    start = time.perf_counter()
+    for i in range(args.calls):
+        fs.open('/aws/credentials', 0)
+    elapsed = time.perf_counter() - start
+    events.close()
+    stats = events.stats()
+    print(f'{"pipeline":>12} {args.calls:>9} {elapsed / args.calls * 1e6:>10.2f}us {stats["dropped"]:>9}')
+
+    # Same, with a real request context resolved through /proc (ttl 0 = no cache)
+    context = (os.getuid(), os.getgid(), os.getpid())
+    for label, ttl in (('proc cached', 5.0), ('proc ttl 0', 0)):
+        events = EventPipeline([SlowSink(args.sink_delay)], max_queue=args.queue_size)
+        fs = LogFS(events=events, proc_ttl=ttl)
+        fs.context = lambda: context
+        start = time.perf_counter()
+        for i in range(args.calls):
+            fs.open('/aws/credentials', 0)
+        elapsed = time.perf_counter() - start
+        events.close()
+        stats = events.stats()
+        print(f'{label:>12} {args.calls:>9} {elapsed / args.calls * 1e6:>10.2f}us {stats["dropped"]:>9}')
+
+
+def read_worker(args):
+    """Runs in a child process so ru_maxrss is per mode"""
+    fs = LogFS(events=EventPipeline([]))
+    with open(args.file, 'rb') as f:
+        if args.worker == 'bytes':
+            content = f.read()
+        elif args.worker == 'bytearray':
+            content = bytearray(os.path.getsize(args.file))
+            f.readinto(content)
+        else:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    fs.add_file('/backup.tar.gz', b'')
+    fs.data['/backup.tar.gz'] = content
+    fs.files['/backup.tar.gz'] = fs.stat('/backup.tar.gz', FILE_MODE, len(content))
+
+    # Same copy fusepy does into the kernel buffer
+    kernel_buf = ctypes.create_string_buffer(args.chunk)
+    total = 0
+    passes = max(1, args.min_bytes // len(content))
+    start = time.perf_counter()
+    for _ in range(passes):
+        for offset in range(0, len(content), args.chunk):
+            # Every mode goes through the same LogFS.read
+            ret = fs.read('/backup.tar.gz', args.chunk, offset, 0)
+            ctypes.memmove(kernel_buf, ret, len(ret))
+            total += len(ret)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps(dict(mbps=total / elapsed / (1 << 20), peak_mb=peak_kb / 1024)))
+
+
+def bench_read(args):
+    if args.worker:
+        return read_worker(args)
+    print(f'{"size":>8} {"mode":>10} {"MB/s":>10} {"peak RSS":>10}')
+    for size_text in args.sizes:
+        size = parse_size(size_text)
+        with tempfile.NamedTemporaryFile(dir=args.tmpdir) as f:
+            block = os.urandom(1 << 20)
+            for _ in range(size // len(block)):
+                f.write(block)
+            f.write(block[:size % len(block)])
+            f.flush()
+            for mode in ('bytes', 'bytearray', 'mmap'):
+                out = subprocess.run(
+                    [sys.executable, __file__, 'read', '--worker', mode, '--file', f.name,
+                     '--chunk', str(args.chunk), '--min-bytes', str(args.min_bytes)],
+                    capture_output=True, text=True, check=True).stdout
+                result = json.loads(out)
+                print(f'{size_text:>8} {mode:>10} {result["mbps"]:>10.0f} {result["peak_mb"]:>8.0f}MB')
+
+
+def write_config(filename, count):
+    """cloud_developer.json style config with count small files"""
+    fs = LogFS(events=EventPipeline([]))
+    build_tree(fs, count)
+    files = [{'path': path, 'content': 'DB_PASSWORD=Decoy%d!\nDB_HOST=prod-db.internal' % i}
+             for i, path in enumerate(fs.data)]
+    with open(filename, 'w') as f:
+        json.dump({'files': files}, f)
+    return fs
+
+
+def bench_startup(args):
+    # The image resolves paths on first use, so startup alone hides the
+    # cost: also time getattr of paths not looked at before (cold) and again
+    print(f'{"files":>9} {"json":>10} {"image":>10} {"speedup":>9} '
+          f'{"json stat":>10} {"img cold":>10} {"img warm":>10}')
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmp:
+        for size in args.sizes:
+            config = os.path.join(tmp, 'config.json')
+            image = os.path.join(tmp, 'tree.img')
+            write_config(config, size)
+            write_image(LogFS(config, events=EventPipeline([])), image)
+
+            start = time.perf_counter()
+            fs = LogFS(config, events=EventPipeline([]))
+            from_json = time.perf_counter() - start
+            start = time.perf_counter()
+            mapped = LogFS(events=EventPipeline([]), image_file=image)
+            from_image = time.perf_counter() - start
+
+            sample = random.Random(0).sample(list(fs.files), min(10000, len(fs.files)))
+            stat_us = []
+            for tree in (fs, mapped, mapped):
+                start = time.perf_counter()
+                for path in sample:
+                    tree.getattr(path)
+                stat_us.append((time.perf_counter() - start) / len(sample) * 1e6)
+            print(f'{size:>9} {from_json * 1000:>8.0f}ms {from_image * 1000:>8.1f}ms '
+                  f'{from_json / from_image:>8.0f}x ' + ' '.join(f'{us:>8.2f}us' for us in stat_us))
+            del fs, mapped
+
+
+def bench_dedup(args):
+    with open(args.config) as f:
+        items = [i for i in json.load(f)['files'] if 'content' in i]
+    print(f'{"dedup":>6} {"files":>9} {"logical":>12} {"stored":>12} {"traced heap":>12}')
+    for dedup in (False, True):
+        tracemalloc.start()
+        fs = LogFS(events=EventPipeline([]), dedup=dedup)
+        for copy in range(args.scale):
+            for item in items:
+                # Fresh bytes per path, as json.load would produce
+                fs.add_file(f'/copy{copy}' + item['path'], item['content'].encode())
+        heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        report = fs.memory_report()
+        print(f'{str(dedup):>6} {report["files"]:>9} {report["logical_bytes"]:>12} '
+              f'{report["stored_bytes"]:>12} {heap:>12}')
+        del fs
+
+
+TEXT_LINES = [
+    'resource "aws_instance" "web_%d" {', '  ami           = "ami-0c55b159cbfcdf0%d"',
+    '  instance_type = "t3.large"', '  tags = { Name = "prod-web-%d", Owner = "platform" }', '}',
+    'apiVersion: apps/v1', 'kind: Deployment', '  replicas: %d', '    image: registry.corp/api:1.%d.0',
+    'user_%d,jsmith@corp.example,Engineering,95000,2021-03-14',
+    'DB_PASSWORD=Decoy%d!', '# TODO rotate this key before %d',
+]
+
+
+def text_body(rng, size):
+    out = []
+    total = 0
+    while total < size:
+        line = rng.choice(TEXT_LINES).replace('%d', str(rng.randint(0, 9999))) + '\n'
+        out.append(line)
+        total += len(line)
+    return ''.join(out)[:size].encode()
+
+
+def bench_compress(args):
+    size = parse_size(args.file_size)
+    print(f'{"store":>16} {"stored":>10} {"traced heap":>12} {"seq MB/s":>10} {"random MB/s":>12} '
+          f'{"cache hit":>10}')
+    configs = [('raw', None, 0)] + [(f'zlib cache={c}M', 6, c) for c in args.cache_mb]
+    for label, level, cache_mb in configs:
+        # Bodies are made inside the traced region and only LogFS keeps
+        # them, so the heap is what each store actually holds on to
+        rng = random.Random(1)
+        tracemalloc.start()
+        fs = LogFS(events=EventPipeline([]), compress=level, cache_bytes=cache_mb << 20)
+        for i in range(args.files):
+            fs.add_file(f'/terraform/f{i}.tf', text_body(rng, size))
+        heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        stored = fs.memory_report()['stored_bytes']
+
+        start = time.perf_counter()
+        total = 0
+        for i in range(args.files):
+            for offset in range(0, size, args.chunk):
+                total += len(fs.read(f'/terraform/f{i}.tf', args.chunk, offset, 0))
+        seq = total / (time.perf_counter() - start) / (1 << 20)
+
+        reads = random.Random(2)
+        start = time.perf_counter()
+        total = 0
+        for _ in range(args.random_reads):
+            path = f'/terraform/f{reads.randrange(args.files)}.tf'
+            total += len(fs.read(path, 4096, reads.randrange(size), 0))
+        rand = total / (time.perf_counter() - start) / (1 << 20)
+        cache = fs.chunk_cache
+        hit = cache.hits / max(cache.hits + cache.misses, 1)
+        print(f'{label:>16} {stored / (1 << 20):>8.1f}MB {heap / (1 << 20):>10.1f}MB {seq:>10.0f} '
+              f'{rand:>12.0f} {hit:>10.0%}')
+        del fs
+
+
+def bench_synthetic(args):
+    size = parse_size(args.size)
+    to_read = min(parse_size(args.read), size)
+    print(f'{"fill":>8} {"st_size":>14} {"read":>10} {"MB/s":>8} {"peak heap":>10}')
+    kernel_buf = ctypes.create_string_buffer(args.chunk)
+    for fill in ('random', 'pattern', 'zero'):
+        tracemalloc.start()
+        fs = LogFS(events=EventPipeline([]))
+        fs.add_file('/backups/prod_db_dump.sql', SyntheticContent(
+            size, b'-- PostgreSQL database dump\n', fill,
+            "INSERT INTO users VALUES ({n}, 'jsmith', 'jsmith@corp.example', '$2b$12$Kix');\n"))
+        st_size = fs.getattr('/backups/prod_db_dump.sql')['st_size']
+        # Start halfway in, like a resumed copy
+        offset = (size - to_read) // 2 // args.chunk * args.chunk
+        start = time.perf_counter()
+        done = 0
+        while done < to_read:
+            ret = fs.read('/backups/prod_db_dump.sql', args.chunk, offset + done, 0)
+            ctypes.memmove(kernel_buf, ret, len(ret))
+            done += len(ret)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{fill:>8} {st_size:>14} {done >> 20:>8}MB {done / elapsed / (1 << 20):>8.0f} '
+              f'{peak / (1 << 20):>8.1f}MB')
+
+
+def stress_worker(fs, dirs, files, seed, stop, write_ratio, counts, errors):
+    """Random mix of callbacks; anything but a FuseOSError counts as an error"""
+    rng = random.Random(seed)
+    created = 0
+    while not stop.is_set():
+        roll = rng.random()
+        try:
+            if roll < write_ratio:
+                op = 'create'
+                parent = rng.choice(dirs)
+                path = f'{parent.rstrip("/")}/new_{seed}_{created}.txt'
+                created += 1
+                fs.create(path, 0o644)
+                if path.rpartition('/')[2] not in fs.readdir(parent, None):
+                    raise AssertionError(f'{path} missing from listing after create')
+            elif roll < 0.4:
+                op = 'getattr'
+                fs.getattr(rng.choice(files))
+            elif roll < 0.7:
+                op = 'readdir'
+                fs.readdir(rng.choice(dirs), None)
+            else:
+                op = 'read'
+                path = rng.choice(files)
+                fh = fs.open(path, 0)
+                fs.read(path, 4096, 0, fh)
+                fs.release(path, fh)
+            counts[op] = counts.get(op, 0) + 1
+        except FuseOSError:
+            counts['enoent'] = counts.get('enoent', 0) + 1
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}')
+
+
+def bench_stress(args):
+    print(f'{"threads":>8} {"ops/s":>10} {"getattr":>9} {"readdir":>9} {"read":>9} {"create":>9} {"errors":>7}')
+    for threads in args.threads:
+        fs = LogFS(events=EventPipeline([]))
+        dirs = build_tree(fs, args.files)
+        files = list(fs.data)
+        fs.init('/')
+        stop = threading.Event()
+        counts = [{} for _ in range(threads)]
+        errors = []
+        workers = [threading.Thread(target=stress_worker,
+                                    args=(fs, dirs, files, i, stop, args.write_ratio, counts[i], errors))
+                   for i in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        # Every open was released: no read session may be left behind
+        if fs.sessions.handles:
+            errors.append(f'{len(fs.sessions.handles)} file handles left open')
+        total = {}
+        for c in counts:
+            for op, n in c.items():
+                total[op] = total.get(op, 0) + n
+        rate = {op: n / elapsed for op, n in total.items()}
+        print(f'{threads:>8} {sum(rate.values()):>10.0f} {rate.get("getattr", 0):>9.0f} '
+              f'{rate.get("readdir", 0):>9.0f} {rate.get("read", 0):>9.0f} '
+              f'{rate.get("create", 0):>9.0f} {len(errors):>7}')
+        for e in sorted(set(errors))[:5]:
+            print(f'    {e}')
+
+
+PROBE_NAMES = ['desktop.ini', 'Thumbs.db', 'autorun.inf', 'folder.jpg', 'AlbumArtSmall.jpg',
+               '.DS_Store', 'System Volume Information']
+
+
+def bench_probes(args):
+    """Windows explorer style probes for missing names, static, image and generated dirs"""
+    print(f'{"negative cache":>15} {"tree":>10} {"probes":>9} {"us/probe":>9} {"ENOENT events":>14}')
+    levels = [{'count': 200, 'name': '{first}.{last}'},
+              {'names': ['Documents', 'Desktop', 'Downloads']},
+              {'count': 20, 'name': '{word}_{year}.{ext}', 'files': True}]
+    tmp = tempfile.TemporaryDirectory()
+    image = os.path.join(tmp.name, 'tree.img')
+    source = LogFS(events=EventPipeline([]))
+    image_dirs = build_tree(source, args.dirs * 100)
+    write_image(source, image)
+    for entries in (0, 65536):
+        for kind in ('static', 'image', 'generated'):
+            fs = LogFS(events=EventPipeline([]), negative_entries=entries, probe_interval=0,
+                       image_file=image if kind == 'image' else None)
+            if kind == 'static':
+                dirs = build_tree(fs, args.dirs * 100)
+            elif kind == 'image':
+                dirs = image_dirs
+            else:
+                tree = GeneratedTree('/home', levels, seed=1)
+                fs.add_generator(tree)
+                dirs = ['/home/' + user for user in tree.listing('/home')]
+                dirs += [d + '/' + sub for d in dirs for sub in tree.listing(d)][:args.dirs]
+            probes = [d.rstrip('/') + '/' + name for d in dirs[:args.dirs] for name in PROBE_NAMES]
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for path in probes:
+                    try:
+                        fs.getattr(path)
+                    except FuseOSError:
+                        pass
+            elapsed = time.perf_counter() - start
+            total = len(probes) * args.rounds
+            fs.probes.close()
+            events = fs.events.stats()['emitted']
+            print(f'{entries:>15} {kind:>10} {total:>9} {elapsed / total * 1e6:>9.2f} {events:>14}')
+    tmp.cleanup()
+
+
+def bench_sessions(args):
+    """Log volume of an SMB style bulk copy (made twice) plus a mid-file reader"""
+    size = parse_size(args.file_size)
+    fs = LogFS(events=EventPipeline([]))
+    body = bytearray(size)
+    paths = ['/share/file%d.bin' % i for i in range(args.files)]
+    for path in paths:
+        fs.add_file(path, body)
+    context = (os.getuid(), os.getgid(), os.getpid())
+    fs.context = lambda: context
+
+    legacy = 0
+    chunks = 0
+    start = time.perf_counter()
+    for copy in range(2):
+        for path in paths:
+            # SMB copies hold a metadata handle open next to the data handle
+            meta = fs.open(path, 0)
+            fh = fs.open(path, 0)
+            for offset in range(0, size, args.chunk):
+                fs.read(path, args.chunk, offset, fh)
+                chunks += 1
+            fs.release(path, fh)
+            fs.release(path, meta)
+            legacy += 3  # two OPENs + COPY/READ at offset 0
+    # Another process reading from the middle of every file: invisible to the
+    # old rule. The copies above are one session per file (the second copy
+    # re-opens within --session-timeout)
+    reader = (os.getuid(), os.getgid(), os.getppid())
+    fs.context = lambda: reader
+    for path in paths:
+        fh = fs.open(path, 0)
+        fs.read(path, args.chunk, size // 2, fh)
+        fs.release(path, fh)
+        chunks += 1
+        legacy += 1
+    elapsed = time.perf_counter() - start
+    fs.sessions.close()
+    emitted = fs.events.stats()['emitted']
+    print(f'{"reads":>9} {"offset==0 events":>17} {"session events":>15} '
+          f'{"mid-file readers seen":>22} {"us/read":>8}')
+    print(f'{chunks:>9} {legacy:>17} {emitted:>15} {f"0 vs {len(paths)}":>22} '
+          f'{elapsed / chunks * 1e6:>8.2f}')
+
+
+def detect_stream(count, rate, clients, seed=0):
+    """
+    Synthetic event stream at rate events/s: clients browsing normally,
+    plus one SMB peer that crawls and copies the share from the middle on
+    """
+    rng = random.Random(seed)
+    users = [Accessor(1000 + i, 1000, 5000 + i, 'explorer', '', ('10.1.%d.%d:49152' % (i // 250, i % 250),))
+             for i in range(clients)]
+    crawler = Accessor(0, 0, 4242, 'python3', 'smbserver.py -smb2support share /srv', ('10.6.6.6:50123',))
+    base = time.time()
+    crawl_start = count // 2
+    events = []
+    for i in range(count):
+        ts = base + i / rate
+        if i >= crawl_start and i % 4 == 0:
+            k = i // 4
+            d = '/dept%d/proj%d/archive%d' % (k % 12, k % 97, k % 1009)
+            op = ('LIST', 'OPEN', 'READ')[k % 3]
+            path = d if op == 'LIST' else f'{d}/file{k}.docx'
+            extra = f'bytes={rng.randint(10000, 900000)} chunks=4' if op == 'READ' else ''
+            events.append((ts, op, path, extra, crawler))
+        else:
+            who = users[rng.randrange(clients)]
+            op = 'OPEN' if rng.random() < 0.6 else 'READ'
+            path = '/home/%s/Documents/notes%d.txt' % (who.uid, rng.randrange(20))
+            extra = 'bytes=2048 chunks=1' if op == 'READ' else ''
+            events.append((ts, op, path, extra, who))
+    return events, crawl_start
+
+
+def bench_detect(args):
+    events, crawl_start = detect_stream(args.events, args.rate, args.clients)
+    alerts = []
+    collector = type('Collector', (), {'deliver': lambda self, batch: alerts.extend(batch)})()
+
+    def replay():
+        detector = CrawlDetector()
+        detector.pipeline = collector
+        for i in range(0, len(events), 512):
+            detector.write(events[i:i + 512])
+        return detector
+
+    start = time.perf_counter()
+    detector = replay()
+    elapsed = time.perf_counter() - start
+    # Second pass only to measure the detector state (tracemalloc slows it down)
+    del alerts[:]
+    tracemalloc.start()
+    kept = replay()
+    memory = tracemalloc.get_traced_memory()[0]
+    del kept
+    tracemalloc.stop()
+    print(f'{"events":>9} {"clients":>8} {"events/s":>10} {"realtime":>9} {"state KB":>9} {"alerts":>7}')
+    print(f'{len(events):>9} {len(detector.clients):>8} {len(events) / elapsed:>10.0f} '
+          f'{len(events) / elapsed / args.rate:>8.1f}x {memory / 1024:>9.0f} {len(alerts):>7}')
+    for ts, op, path, extra, who in alerts:
+        delay = ts - events[crawl_start][0]
+        print(f'    {op} {path} {extra} (+{delay:.2f}s after the crawl started)')
+
+
+class StubDns(asyncio.DatagramProtocol):
+    """Local DNS server that records every query and answers NXDOMAIN after delay"""
+
+    def __init__(self, loop, delay, answer=True):
+        self.loop = loop
+        self.delay = delay
+        self.answer = answer
+        self.names = []
+        self.outstanding = 0
+        self.peak = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        labels = []
+        pos = 12
+        while data[pos]:
+            labels.append(data[pos + 1:pos + 1 + data[pos]].decode())
+            pos += 1 + data[pos]
+        self.names.append('.'.join(labels))
+        self.outstanding += 1
+        self.peak = max(self.peak, self.outstanding)
+        reply = data[:2] + b'\x81\x83' + data[4:]
+        self.loop.call_later(self.delay, self.reply, reply, addr)
+
+    def reply(self, reply, addr):
+        self.outstanding -= 1
+        if self.answer:
+            self.transport.sendto(reply, addr)
+
+
+def start_stub_dns(delay, answer):
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    stub = StubDns(loop, delay, answer)
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(loop.create_datagram_endpoint(lambda: stub, local_addr=('127.0.0.1', 0)))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return loop, stub, stub.transport.get_extra_info('sockname')
+
+
+def bench_canary(args):
+    """Opens fed to DnsAlerter against a local stub server: coalescing, in-flight cap, writer cost"""
+    print(f'{"server":>9} {"events":>8} {"files":>6} {"queries":>8} {"coalesced":>10} {"dropped":>8} '
+          f'{"peak":>5} {"us/event":>9} {"drain s":>8}')
+    for answer in (True, False):
+        loop, stub, address = start_stub_dns(args.reply_delay, answer)
+        alerter = DnsAlerter('canary.example.com', server=address, max_in_flight=args.max_in_flight,
+                             max_pending=args.max_pending, timeout=args.timeout)
+        who = Accessor(1000, 1000, 4242, 'robocopy.exe', '', ())
+        base = time.time()
+        events = [(base + i * 1e-5, 'OPEN', f'/finance/report{i % args.files}.xlsx', '', who)
+                  for i in range(args.files * args.opens)]
+        start = time.perf_counter()
+        for i in range(0, len(events), 512):
+            alerter.write(events[i:i + 512])
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        alerter.close(timeout=60)
+        drain = time.perf_counter() - start
+        stats = alerter.stats
+        loop.call_soon_threadsafe(loop.stop)
+        print(f'{"answers" if answer else "silent":>9} {len(events):>8} {args.files:>6} {len(stub.names):>8} '
+              f'{stats["coalesced"]:>10} {stats["dropped"]:>8} {stub.peak:>5} '
+              f'{elapsed / len(events) * 1e6:>9.2f} {drain:>8.2f}')
+    print(f'    e.g. {stub.names[0]}')
+
+
+def scan_lookup(fs, path):
+    """Case-insensitive resolve without an index: match each component against its listing"""
+    resolved = ''
+    for part in path.strip('/').split('/'):
+        folded = part.casefold()
+        for name in fs.children.get(resolved or '/', ()):
+            if name.casefold() == folded:
+                resolved += '/' + name
+                break
+        else:
+            return None
+    return resolved
+
+
+def bench_case(args):
+    print(f'{"files":>9} {"index build":>12} {"index MB":>9} {"exact us":>9} '
+          f'{"folded us":>10} {"scan us":>9}')
+    for size in args.sizes:
+        fs = LogFS(events=EventPipeline([]))
+        build_tree(fs, size)
+        paths = random.Random(0).sample(list(fs.data), min(args.lookups, size))
+        upper = [p.upper() for p in paths]
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        fs.build_case_index()
+        build = time.perf_counter() - start
+        index_mb = tracemalloc.get_traced_memory()[0] / (1 << 20)
+        tracemalloc.stop()
+
+        timings = []
+        for lookup, names in ((fs.getattr, paths), (fs.getattr, upper),
+                              (lambda p: scan_lookup(fs, p), upper)):
+            start = time.perf_counter()
+            for path in names:
+                lookup(path)
+            timings.append((time.perf_counter() - start) / len(names) * 1e6)
+        print(f'{size:>9} {build * 1000:>10.0f}ms {index_mb:>9.1f} {timings[0]:>9.2f} '
+              f'{timings[1]:>10.2f} {timings[2]:>9.2f}')
+
+
+def control_call(sock, message):
+    body = json.dumps(message).encode()
+    sock.sendall(struct.pack('<i', len(body)) + body)
+    length = struct.unpack('<i', sock.recv(4, socket.MSG_WAITALL))[0]
+    return json.loads(sock.recv(length, socket.MSG_WAITALL))
+
+
+def control_reader(fs, paths, stop, latencies):
+    rng = random.Random(id(latencies))
+    while not stop.is_set():
+        path = rng.choice(paths)
+        start = time.perf_counter()
+        fs.getattr(path)
+        fs.read(path, 4096, 0, 0)
+        latencies.append(time.perf_counter() - start)
+
+
+def control_lister(fs, stop, rotating, torn):
+    # A listing mixing two rotations, or missing part of one, is a torn batch
+    while not stop.is_set():
+        names = fs.readdir('/rotate', 0)[2:]
+        if len({name.partition('_')[0] for name in names}) > 1 or len(names) not in (0, rotating):
+            torn.append(len(names))
+        time.sleep(0.001)
+
+
+def bench_control(args):
+    """Rotate decoys through the control socket while reader threads hit the tree"""
+    tmpdir = tempfile.mkdtemp(prefix='logfs-control-')
+    try:
+        print(f'{"batch":>7} {"commands/s":>11} {"ms/batch":>9} {"reads/s":>9} {"read p99 us":>12} '
+              f'{"torn":>5}')
+        for size in [0] + args.batch:
+            fs = LogFS(events=EventPipeline([]), session_timeout=0)
+            build_tree(fs, args.files)
+            paths = random.Random(0).sample(list(fs.data), min(args.files, 10000))
+            fs.add_directory('/rotate')
+            socket_path = os.path.join(tmpdir, f'control-{size}.sock')
+            fs.control = ControlServer(fs, socket_path)
+            fs.init('/')
+            stop = threading.Event()
+            latencies = [[] for _ in range(args.readers)]
+            torn = []
+            readers = [threading.Thread(target=control_reader, args=(fs, paths, stop, lat))
+                       for lat in latencies]
+            readers.append(threading.Thread(target=control_lister, args=(fs, stop, size, torn)))
+            for t in readers:
+                t.start()
+            sock = socket.socket(socket.AF_UNIX)
+            sock.connect(socket_path)
+            batch_times = []
+            start = time.perf_counter()
+            if size:
+                for gen in range(args.rotations):
+                    commands = [{'action': 'delete_file', 'path': f'/rotate/{gen - 1}_{i}'}
+                                for i in range(size)] if gen else []
+                    commands += [{'action': 'create_file', 'path': f'/rotate/{gen}_{i}',
+                                  'content': f'decoy {gen} {i}'} for i in range(size)]
+                    sent = time.perf_counter()
+                    reply = control_call(sock, {'action': 'batch', 'commands': commands})
+                    batch_times.append(time.perf_counter() - sent)
+                    assert reply['success'], reply['message']
+            else:
+                time.sleep(args.idle)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            for t in readers:
+                t.join()
+            sock.close()
+            fs.control.close()
+            fs.sessions.close()
+            fs.probes.close()
+
+            merged = sorted(x for lat in latencies for x in lat)
+            p99 = merged[int(len(merged) * 0.99)] * 1e6 if merged else 0.0
+            commands = size * (2 * args.rotations - 1)
+            label = str(size) if size else 'idle'
+            rate = f'{commands / elapsed:>11.0f}' if size else f'{"-":>11}'
+            per_batch = f'{sum(batch_times) / len(batch_times) * 1000:>9.1f}' if size else f'{"-":>9}'
+            print(f'{label:>7} {rate} {per_batch} {len(merged) / elapsed:>9.0f} {p99:>12.1f} {len(torn):>5}')
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+class CountingLogFS(LogFS):
+    """LogFS that counts and times every callback fusepy dispatches"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = {}
+        self.calls_lock = threading.Lock()
+
+    def __call__(self, op, *args):
+        start = time.perf_counter()
+        try:
+            return super().__call__(op, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.calls_lock:
+                count, total = self.calls.get(op, (0, 0.0))
+                self.calls[op] = (count + 1, total + elapsed)
+
+
+def mount_worker(args):
+    """Runs in a child process: serve a tree until unmounted, then print the counts"""
+    fs = CountingLogFS(events=EventPipeline([]))
+    build_tree(fs, args.files)
+    FUSE(fs, args.mountpoint, foreground=True, use_ino=True, **mount_options(args.worker))
+    print(json.dumps(fs.calls))
+
+
+WORKLOADS = {
+    # stat every entry, like an SMB client walking the share
+    'find': lambda mnt, dest: ['find', mnt, '-ls'],
+    'copy': lambda mnt, dest: ['cp', '-r', mnt, dest],
+}
+
+
+def bench_mount(args):
+    if args.worker:
+        return mount_worker(args)
+    if shutil.which('fusermount') is None or not os.path.exists('/dev/fuse'):
+        print('mount benchmark needs fusermount and /dev/fuse')
+        return
+    print(f'{"preset":>8} {"workload":>9} {"wall ms":>9} {"getattr":>8} {"readdir":>8} '
+          f'{"open":>7} {"read":>7} {"other":>7} {"mean us":>8}')
+    for preset in args.presets:
+        for workload in args.workloads:
+            with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmp:
+                mnt = os.path.join(tmp, 'mnt')
+                os.mkdir(mnt)
+                child = subprocess.Popen(
+                    [sys.executable, __file__, 'mount', '--worker', preset, '--files', str(args.files), mnt],
+                    stdout=subprocess.PIPE, text=True)
+                deadline = time.time() + 30
+                while not os.path.ismount(mnt) and time.time() < deadline and child.poll() is None:
+                    time.sleep(0.05)
+                start = time.perf_counter()
+                try:
+                    for n in range(args.passes):
+                        command = WORKLOADS[workload](mnt, os.path.join(tmp, f'copy{n}'))
+                        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    subprocess.run(['fusermount', '-u', mnt], check=False)
+                calls = json.loads(child.communicate()[0].strip().splitlines()[-1])
+            counts = {op: c for op, (c, _) in calls.items()}
+            total = sum(counts.values())
+            seconds = sum(t for _, t in calls.values())
+            main = [counts.pop(op, 0) for op in ('getattr', 'readdir', 'open', 'read')]
+            print(f'{preset:>8} {workload:>9} {elapsed * 1000:>9.0f} {main[0]:>8} {main[1]:>8} '
+                  f'{main[2]:>7} {main[3]:>7} {sum(counts.values()):>7} '
+                  f'{seconds / max(total, 1) * 1e6:>8.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LogFS benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p = sub.add_parser('readdir', help='Directory listing latency vs tree size')
+    p.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    p.add_argument('--budget', type=float, default=1.0, help='Seconds to spend per measurement')
+    p.add_argument('--skip-legacy', action='store_true', help='Only time the indexed readdir')
+    p.set_defaults(func=bench_readdir)
+
+    p = sub.add_parser('events', help='Callback overhead of event logging with a slow sink')
+    p.add_argument('--calls', type=int, default=200000)
+    p.add_argument('--sink-delay', type=float, default=0.001, help='Seconds each sink write stalls')
+    p.add_argument('--queue-size', type=int, default=65536)
+    p.add_argument('--budget', type=float, default=2.0, help='Max seconds for the synchronous run')
+    p.set_defaults(func=bench_events)
+
+    p = sub.add_parser('read', help='Read throughput and peak RSS per storage (bytes, bytearray, mmap)')
+    p.add_argument('--sizes', nargs='+', default=['1M', '100M', '1G'])
+    p.add_argument('--chunk', type=int, default=64 * 1024, help='Read size (SMB copies use 64 KiB)')
+    p.add_argument('--min-bytes', type=int, default=1 << 30, help='Re-read small files up to this many bytes')
+    p.add_argument('--tmpdir', help='Where to write the test files')
+    p.add_argument('--worker', choices=['bytes', 'bytearray', 'mmap'], help=argparse.SUPPRESS)
+    p.add_argument('--file', help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_read)
+
+    p = sub.add_parser('startup', help='LogFS startup time: JSON config vs compiled image')
+    p.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    p.add_argument('--tmpdir', help='Where to write the test configs')
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser('dedup', help='Memory with and without content deduplication')
+    p.add_argument('--config', default='cloud_developer.py', help='Config whose files are replicated')
+    p.add_argument('--scale', type=int, default=100, help='Number of copies of the tree')
+    p.set_defaults(func=bench_dedup)
+
+    p = sub.add_parser('compress', help='Memory vs read throughput for compressed storage')
+    p.add_argument('--files', type=int, default=200)
+    p.add_argument('--file-size', default='512K')
+    p.add_argument('--chunk', type=int, default=64 * 1024)
+    p.add_argument('--random-reads', type=int, default=20000)
+    p.add_argument('--cache-mb', type=int, nargs='+', default=[1, 16, 256])
+    p.set_defaults(func=bench_compress)
+
+    p = sub.add_parser('synthetic', help='Read throughput and memory of generated huge files')
+    p.add_argument('--size', default='8G', help='Declared file size')
+    p.add_argument('--read', default='1G', help='How much of it to read')
+    p.add_argument('--chunk', type=int, default=64 * 1024)
+    p.set_defaults(func=bench_synthetic)
+
+    p = sub.add_parser('stress', help='Drive LogFS callbacks from many threads at once')
+    p.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    p.add_argument('--seconds', type=float, default=5.0)
+    p.add_argument('--files', type=int, default=100000)
+    p.add_argument('--write-ratio', type=float, default=0.05, help='Fraction of ops that are creates')
+    p.set_defaults(func=bench_stress)
+
+    p = sub.add_parser('probes', help='Cost of missing-path lookups with and without the negative cache')
+    p.add_argument('--dirs', type=int, default=2000, help='Directories probed')
+    p.add_argument('--rounds', type=int, default=5, help='Times each directory is probed')
+    p.set_defaults(func=bench_probes)
+
+    p = sub.add_parser('sessions', help='Log volume of bulk copies: offset==0 rule vs read sessions')
+    p.add_argument('--files', type=int, default=2000)
+    p.add_argument('--file-size', default='1M')
+    p.add_argument('--chunk', type=int, default=64 * 1024)
+    p.set_defaults(func=bench_sessions)
+
+    p = sub.add_parser('detect', help='Replay a synthetic event stream through the crawl detector')
+    p.add_argument('--events', type=int, default=1000000)
+    p.add_argument('--rate', type=float, default=100000, help='Events per second in the stream')
+    p.add_argument('--clients', type=int, default=10000, help='Normal clients besides the crawler')
+    p.set_defaults(func=bench_detect)
+
+    p = sub.add_parser('canary', help='DNS canary alerts against a local stub DNS server')
+    p.add_argument('--files', type=int, default=2000)
+    p.add_argument('--opens', type=int, default=10, help='Opens per file (coalesced into one lookup)')
+    p.add_argument('--reply-delay', type=float, default=0.05, help='Seconds the stub server takes to answer')
+    p.add_argument('--max-in-flight', type=int, default=32)
+    p.add_argument('--max-pending', type=int, default=1024)
+    p.add_argument('--timeout', type=float, default=0.5, help='Seconds to wait for each answer')
+    p.set_defaults(func=bench_canary)
+
+    p = sub.add_parser('case', help='Case-insensitive lookups: folded index vs per-component scan')
+    p.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    p.add_argument('--lookups', type=int, default=20000)
+    p.set_defaults(func=bench_case)
+
+    p = sub.add_parser('control', help='Decoy rotation over the control socket under concurrent reads')
+    p.add_argument('--batch', type=int, nargs='+', default=[1, 100, 1000], help='Files replaced per batch')
+    p.add_argument('--rotations', type=int, default=20)
+    p.add_argument('--files', type=int, default=100000, help='Static files the readers pick from')
+    p.add_argument('--readers', type=int, default=4)
+    p.add_argument('--idle', type=float, default=2.0, help='Seconds of the baseline run without rotation')
+    p.set_defaults(func=bench_control)
+
+    p = sub.add_parser('mount', help='Callback counts and latency of find/cp on a real mount per preset')
+    p.add_argument('--presets', nargs='+', choices=list(PRESETS), default=list(PRESETS))
+    p.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    p.add_argument('--files', type=int, default=5000)
+    p.add_argument('--passes', type=int, default=2, help='Repeat each workload to show cache hits')
+    p.add_argument('--tmpdir', help='Where to create the mountpoint')
+    p.add_argument('--worker', choices=list(PRESETS), help=argparse.SUPPRESS)
+    p.add_argument('mountpoint', nargs='?', help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_mount)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,176 @@
+"""
+DNS canary alerts for LogFS, the Linux side of AlertOnFileAccess in
+MCP/ProjFS-Service-MCP.cs: every file open is turned into a lookup of
+
+    u<random>.f<base32 filename>.i<base32 process name>.<domain>
+
+so a Canarytokens style DNS token reports the access even when nobody is
+watching the logs. DnsAlerter is an event sink: it decides what to send on
+the logging thread and hands the query to an asyncio loop on its own
+thread, so neither FUSE callbacks nor the other sinks ever wait on DNS.
+Opens of the same file within rate_limit seconds are coalesced into one
+lookup (like FileEntry.LastAlert), at most max_in_flight lookups run at a
+time and at most max_pending wait for a slot; the rest are dropped and
+counted
+"""
+
+import asyncio
+import base64
+import random
+import struct
+import threading
+
+PORT = 53
+# A label holds 63 characters: 'f' + base32 of 38 bytes (61 characters)
+MAX_LABEL_BYTES = 38
+
+
+def b32(data):
+    """Unpadded base32, same output as BytesToBase32 in the C# service"""
+    return base64.b32encode(data).decode().rstrip('=')
+
+
+def canary_name(filename, process, domain, rng=random):
+    fn = b32(filename.encode()[:MAX_LABEL_BYTES])
+    img = b32(process.encode()[:MAX_LABEL_BYTES])
+    return f'u{rng.randint(1000, 9999)}.f{fn}.i{img}.{domain}'
+
+
+def dns_query(name, qid):
+    """Standard recursive A query for name"""
+    header = struct.pack('>HHHHHH', qid, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(bytes([len(label)]) + label for label in name.encode().split(b'.') if label)
+    return header + qname + b'\0' + struct.pack('>HH', 1, 1)
+
+
+def system_resolver():
+    """First nameserver in /etc/resolv.conf"""
+    try:
+        with open('/etc/resolv.conf', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    return fields[1].split('%')[0], PORT
+    except OSError:
+        pass
+    return '127.0.0.1', PORT
+
+
+def parse_server(text):
+    """'10.0.0.1', '10.0.0.1:5353', '[::1]:5353' -> (host, port)"""
+    if text.startswith('['):
+        host, _, port = text[1:].partition(']')
+        return host, int(port.lstrip(':') or PORT)
+    if text.count(':') == 1:
+        host, port = text.split(':')
+        return host, int(port)
+    return text, PORT
+
+
+class _Reply(asyncio.DatagramProtocol):
+    def __init__(self, qid, done):
+        self.qid = qid
+        self.done = done
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 2 and struct.unpack('>H', data[:2])[0] == self.qid and not self.done.done():
+            self.done.set_result(data)
+
+    def error_received(self, exc):
+        if not self.done.done():
+            self.done.set_exception(exc)
+
+
+class DnsAlerter:
+    def __init__(self, domain, server=None, rate_limit=5.0, max_in_flight=32, max_pending=1024,
+                 timeout=2.0, ops=('OPEN',)):
+        self.domain = domain.strip('.')
+        self.server = server or system_resolver()
+        self.rate_limit = rate_limit
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.ops = set(ops)
+        # OPEN is only delivered to sinks that ask for it (see events.SIGNALS)
+        self.signals = tuple(ops)
+        self.last = {}
+        self.stats = dict(sent=0, answered=0, timeouts=0, errors=0, coalesced=0, dropped=0,
+                          peak_in_flight=0)
+        self.pending = 0
+        self.in_flight = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, name='logfs-dns', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        self.loop.run_forever()
+
+    def write(self, batch):
+        """Called on the logging thread: rate limit here, resolve on the loop"""
+        for ts, operation, path, extra, who in batch:
+            if operation not in self.ops:
+                continue
+            last = self.last.get(path)
+            if last is not None and ts - last < self.rate_limit:
+                self.stats['coalesced'] += 1
+                continue
+            if len(self.last) >= 65536:
+                self.last = {p: t for p, t in self.last.items() if ts - t < self.rate_limit}
+            self.last[path] = ts
+            name = canary_name(path.rpartition('/')[2], who.name if who is not None else 'unknown',
+                               self.domain)
+            self.loop.call_soon_threadsafe(self.submit, name)
+
+    def submit(self, name):
+        if self.pending >= self.max_pending:
+            self.stats['dropped'] += 1
+            return
+        self.pending += 1
+        self.loop.create_task(self.lookup(name))
+
+    async def lookup(self, name):
+        try:
+            async with self.slots:
+                self.in_flight += 1
+                self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.in_flight)
+                try:
+                    await self.query(name)
+                finally:
+                    self.in_flight -= 1
+        finally:
+            self.pending -= 1
+
+    async def query(self, name):
+        qid = random.getrandbits(16)
+        done = self.loop.create_future()
+        transport = None
+        try:
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: _Reply(qid, done), remote_addr=self.server)
+            transport.sendto(dns_query(name, qid))
+            self.stats['sent'] += 1
+            # Any answer will do (NXDOMAIN included): the query reaching the
+            # token's authoritative server is the alert
+            await asyncio.wait_for(done, self.timeout)
+            self.stats['answered'] += 1
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+        except OSError:
+            self.stats['errors'] += 1
+        finally:
+            if transport is not None:
+                transport.close()
+
+    def close(self, timeout=5.0):
+        """Let queued lookups finish (up to timeout), then stop the loop"""
+        async def drain():
+            deadline = self.loop.time() + timeout
+            while self.pending and self.loop.time() < deadline:
+                await asyncio.sleep(0.05)
+            self.loop.stop()
+
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(lambda: self.loop.create_task(drain()))
+            self.thread.join(timeout + 1)
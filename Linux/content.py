@@ -0,0 +1,295 @@
+"""
+Content storage helpers for LogFS
+"""
+
+from collections import OrderedDict
+import base64
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import random
+import threading
+import zlib
+
+PACK_VERSION = 2
+
+
+class Content:
+    """
+    Base for file bodies produced on demand instead of stored as a buffer
+    LogFS.read hands these the request; len() must be the st_size
+    """
+    size = 0
+
+    def __len__(self):
+        return self.size
+
+    def read(self, fs, path, offset, size):
+        raise NotImplementedError
+
+    def to_config(self):
+        """Config entry keys that rebuild this body, None if it only lives in memory"""
+        return None
+
+
+def content_from_config(item):
+    """Content for a config entry with a "template" or "synthetic" body, None for plain content"""
+    if 'template' in item:
+        # Imported here: honeytokens builds on this module
+        from honeytokens import TokenTemplate
+        return TokenTemplate(item['template'])
+    if 'synthetic' in item:
+        return SyntheticContent.from_config(item['synthetic'])
+    return None
+
+
+def read_chunk(buf, offset, size):
+    """
+    Return buf[offset:offset + size] as bytes for fusepy
+    Works for any buffer (bytes, bytearray, mmap); one copy, which fusepy
+    then memmoves into the kernel buffer. A ctypes view sharing buf's
+    memory measured no faster (see benchmark.py read), so plain slicing
+    """
+    if offset >= len(buf):
+        return b''
+    return memoryview(buf)[offset:offset + size].tobytes()
+
+
+def build_pack(config_file, pack_file):
+    """
+    Write every file body from a JSON config into one blob (pack_file)
+    plus an offset/length index (pack_file + '.idx'). Returns (files, bytes)
+    Templated and synthetic files take no room in the blob: their index
+    entry carries the config keys that rebuild them
+    """
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    index = []
+    offset = 0
+    # Identical bodies are written once and shared by every path using them
+    written = {}
+    with open(pack_file, 'wb') as blob:
+        for item in config.get('files', []):
+            try:
+                body = content_from_config(item)
+            except ValueError as e:
+                raise ValueError(f'{item["path"]}: {e}') from None
+            if body is not None:
+                spec = body.to_config()
+                if spec is None:
+                    raise ValueError(f'{item["path"]}: {type(body).__name__} bodies cannot be packed')
+                index.append([item['path'], 0, 0, spec])
+                continue
+            content = item.get('content', '').encode()
+            digest = hashlib.blake2b(content, digest_size=16).digest()
+            if digest not in written:
+                written[digest] = offset
+                blob.write(content)
+                offset += len(content)
+            index.append([item['path'], written[digest], len(content)])
+
+    with open(pack_file + '.idx', 'w') as f:
+        json.dump({'version': PACK_VERSION, 'files': index}, f)
+    return len(index), offset
+
+
+def open_pack(pack_file):
+    """
+    Map a pack built by build_pack. Returns (mmap, [(path, offset, length[, spec])])
+    Read-only mapping: pages stay shared with the page cache
+    """
+    with open(pack_file + '.idx', 'r') as f:
+        index = json.load(f)
+    # Version 1 packs are the same without spec entries
+    if index.get('version') not in (1, PACK_VERSION):
+        raise ValueError(f'{pack_file}: unsupported pack version {index.get("version")}')
+
+    with open(pack_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            blob = bytearray()
+        else:
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return blob, index['files']
+
+
+class ChunkCache:
+    """Size-bounded LRU of decompressed chunks, shared by all compressed files"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            chunk = self.entries.get(key)
+            if chunk is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return chunk
+
+    def put(self, key, chunk):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = chunk
+            self.size += len(chunk)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class CompressedContent(Content):
+    """
+    Body stored as independently zlib-compressed chunks, so a read at a
+    large offset only inflates the chunks it touches
+    """
+    ids = itertools.count()
+
+    def __init__(self, body, chunk_size=64 * 1024, level=6):
+        self.id = next(self.ids)
+        self.size = len(body)
+        self.chunk_size = chunk_size
+        self.chunks = [zlib.compress(body[i:i + chunk_size], level)
+                       for i in range(0, len(body), chunk_size)]
+        self.stored_size = sum(len(c) for c in self.chunks)
+
+    def chunk(self, fs, index):
+        key = (self.id, index)
+        data = fs.chunk_cache.get(key)
+        if data is None:
+            data = bytearray(zlib.decompress(self.chunks[index]))
+            fs.chunk_cache.put(key, data)
+        return data
+
+    def read(self, fs, path, offset, size):
+        if offset >= self.size:
+            return b''
+        end = min(offset + size, self.size)
+        first = offset // self.chunk_size
+        last = (end - 1) // self.chunk_size
+        start = offset - first * self.chunk_size
+        if first == last:
+            return read_chunk(self.chunk(fs, first), start, end - offset)
+        data = b''.join(bytes(self.chunk(fs, i)) for i in range(first, last + 1))
+        return data[start:start + end - offset]
+
+
+def parse_size(text):
+    """'512', '64K', '4G' -> bytes"""
+    text = str(text)
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    if text[-1].upper() in units:
+        return int(float(text[:-1]) * units[text[-1].upper()])
+    return int(text)
+
+
+class SyntheticContent(Content):
+    """
+    Huge file of declared size whose bytes are computed for any offset:
+    an optional header, then a deterministic body. fill='random' serves
+    rotated windows of a 1 MiB pseudo-random pool (looks like compressed
+    data), 'pattern' repeats a fixed-width line where {n} is the zero
+    padded line number, 'zero' is all zeros
+    """
+    POOL = 1 << 20
+    LINES = 1000
+    SENTINEL = b'\x00\x01\x02\x03\x04\x05\x06'
+
+    def __init__(self, size, header=b'', fill='random', pattern='', seed=0):
+        self.size = parse_size(size)
+        self.header = bytearray(header[:self.size])
+        self.fill = fill
+        self.pattern = pattern
+        self.seed = seed
+        if fill == 'random':
+            pool = random.Random(seed).randbytes(self.POOL)
+            # Doubled so every rotated window is one contiguous slice
+            self.pool = bytearray(pool + pool)
+        elif fill == 'pattern':
+            # Lines come in blocks of LINES; a block is rendered once with a
+            # sentinel for the high digits of {n}, then filled in with a
+            # single bytes.replace per block
+            parts = pattern.encode().split(b'{n}')
+            if not b''.join(parts) and len(parts) == 1:
+                raise ValueError('pattern fill needs a non-empty pattern')
+            self.block_template = b''.join(
+                (b'%s%03d' % (self.SENTINEL, j)).join(parts) for j in range(self.LINES))
+            self.block_size = len(self.block_template)
+            self.last_block = (None, b'')
+        elif fill != 'zero':
+            raise ValueError(f'Unknown synthetic fill {fill!r}')
+
+    @classmethod
+    def from_config(cls, spec):
+        header = spec.get('header', '').encode()
+        if 'header_base64' in spec:
+            header = base64.b64decode(spec['header_base64'])
+        return cls(spec['size'], header, spec.get('fill', 'random'), spec.get('pattern', ''),
+                   spec.get('seed', 0))
+
+    def to_config(self):
+        return {'synthetic': {'size': self.size, 'header_base64': base64.b64encode(self.header).decode(),
+                              'fill': self.fill, 'pattern': self.pattern, 'seed': self.seed}}
+
+    def read(self, fs, path, offset, size):
+        if offset >= self.size:
+            return b''
+        end = min(offset + size, self.size)
+        if offset < len(self.header):
+            head = bytes(self.header[offset:end])
+            if end <= len(self.header):
+                return head
+            return head + bytes(self.body(0, end - len(self.header)))
+        return self.body(offset - len(self.header), end - len(self.header))
+
+    def body(self, start, end):
+        # Offsets are relative to the end of the header
+        if self.fill == 'zero':
+            return bytes(end - start)
+        if self.fill == 'pattern':
+            return self.lines(start, end)
+        block = start // self.POOL
+        within = start - block * self.POOL
+        if end <= (block + 1) * self.POOL:
+            return read_chunk(self.pool, self.rotation(block) + within, end - start)
+        parts = []
+        pos = start
+        while pos < end:
+            block = pos // self.POOL
+            within = pos - block * self.POOL
+            take = min(end - pos, self.POOL - within)
+            at = self.rotation(block) + within
+            parts.append(self.pool[at:at + take])
+            pos += take
+        return b''.join(parts)
+
+    def rotation(self, block):
+        return (block * 2654435761 + self.seed * 40503) % self.POOL
+
+    def lines(self, start, end):
+        parts = []
+        pos = start
+        while pos < end:
+            index = pos // self.block_size
+            within = pos - index * self.block_size
+            take = min(end - pos, self.block_size - within)
+            parts.append(self.block(index)[within:within + take])
+            pos += take
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def block(self, index):
+        cached_index, data = self.last_block
+        if cached_index != index:
+            data = self.block_template.replace(self.SENTINEL, b'%07d' % index)
+            self.last_block = (index, data)
+        return data
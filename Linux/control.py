@@ -0,0 +1,232 @@
+"""
+Runtime control of a mounted LogFS over a Unix domain socket
+Same framing and actions as the named pipe of MCP/ProjFS-Service-MCP.cs:
+every message is a 4-byte little-endian length followed by UTF-8 JSON
+
+    {"action": "create_file", "path": "\\finance\\q3.xlsx", "content": "UEsDB...", "isBase64": true}
+
+and is answered with {"success": ..., "message": ..., "data": [...]}.
+Besides create_file, delete_file, create_directory, list_files,
+list_directories and list_all there is
+
+    {"action": "batch", "commands": [{"action": "delete_file", ...}, {"action": "create_file", ...}]}
+
+All changes of a batch are published together when it ends, and each
+directory listing is swapped whole, so a client never lists a directory
+half-way through a batch. Listings of different directories are swapped one
+after another, though: a batch spanning several of them can briefly be
+seen applied to some and not yet to others. Bodies are decoded
+before the tree lock is taken, and lookups, listings and reads never take
+it, so the share keeps serving while a batch is applied. Each command of a batch gets its
+own entry in data, a JSON object with action, path, success, message
+(and data for the list actions)
+"""
+
+import base64
+import binascii
+import json
+import os
+import socketserver
+import stat
+import struct
+import threading
+
+from nodes import is_dir
+
+# Largest message accepted, as in the Windows service
+MAX_MESSAGE = 1024 * 1024
+LIST_ACTIONS = ('list_files', 'list_directories', 'list_all')
+ACTIONS = ('create_file', 'delete_file', 'create_directory') + LIST_ACTIONS
+
+
+def normalize(path):
+    """'\\finance\\q3.xlsx' or 'finance/q3.xlsx' -> '/finance/q3.xlsx'"""
+    parts = [part for part in (path or '').replace('\\', '/').split('/') if part not in ('', '.')]
+    if '..' in parts:
+        raise ValueError('Path may not contain ..: ' + path)
+    return '/' + '/'.join(parts)
+
+
+def read_message(stream, max_size=MAX_MESSAGE):
+    """Next request from stream, None once the client is gone"""
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    length = struct.unpack('<i', header)[0]
+    if length <= 0 or length > max_size:
+        raise ValueError(f'Invalid message length: {length}')
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return json.loads(body.decode('utf-8'))
+
+
+def write_message(stream, message):
+    body = json.dumps(message).encode('utf-8')
+    stream.write(struct.pack('<i', len(body)) + body)
+    stream.flush()
+
+
+def response(success, message, data=None):
+    return {'success': success, 'message': message, 'data': data or []}
+
+
+class Controller:
+    """Applies control commands to a LogFS"""
+
+    def __init__(self, fs):
+        self.fs = fs
+
+    def handle(self, request):
+        try:
+            action = request.get('action')
+            if action == 'batch':
+                return self.batch(request.get('commands') or [])
+            if action not in ACTIONS:
+                return response(False, f'Unknown action: {action}')
+            command = self.prepare(request)
+            with self.fs.batch():
+                success, message, data = self.apply(command)
+            return response(success, message, data)
+        except Exception as e:
+            return response(False, f'Error: {e}')
+
+    def prepare(self, request):
+        """Validate and decode one command without touching the tree"""
+        action = request.get('action')
+        path = normalize(request.get('path'))
+        content = None
+        if action == 'create_file':
+            if path == '/':
+                raise ValueError('No file name given')
+            if request.get('isBase64'):
+                content = base64.b64decode(request.get('content') or '', validate=True)
+            else:
+                content = (request.get('content') or '').encode('utf-8')
+        elif action not in ACTIONS:
+            raise ValueError(f'Unknown action: {action}')
+        return action, path, content
+
+    def batch(self, requests):
+        # All or nothing for malformed commands: nothing is applied
+        try:
+            if not isinstance(requests, list) or not all(isinstance(r, dict) for r in requests):
+                raise ValueError('commands must be a list of JSON objects')
+            commands = [self.prepare(request) for request in requests]
+        except (ValueError, binascii.Error) as e:
+            return response(False, f'Error: {e}')
+        results = []
+        with self.fs.batch():
+            for action, path, content in commands:
+                success, message, data = self.apply((action, path, content))
+                result = dict(action=action, path=path, success=success, message=message)
+                if action in LIST_ACTIONS:
+                    result['data'] = data
+                results.append(result)
+        done = sum(result['success'] for result in results)
+        return response(done == len(results), f'Batch applied: {done} of {len(results)} succeeded',
+                        [json.dumps(result) for result in results])
+
+    def apply(self, command):
+        """(success, message, data) for one prepared command, under fs.batch()"""
+        fs = self.fs
+        action, path, content = command
+        if action == 'create_file':
+            parent, _, name = path.rpartition('/')
+            parent = fs.canonical(parent) if parent else ''
+            path = parent + '/' + name
+            existing = fs.node(path)
+            if self.blocked(parent) or (existing is not None and is_dir(existing)):
+                return False, 'Failed to create file', []
+            fs.add_file(path, content)
+            return True, 'File created successfully', []
+        if action == 'delete_file':
+            path = fs.canonical(path)
+            attrs = fs.node(path)
+            # Files from a tree image are read-only
+            if attrs is None or is_dir(attrs) or not fs.remove_node(path):
+                return False, 'Failed to delete file', []
+            return True, 'File deleted successfully', []
+        if action == 'create_directory':
+            path = fs.canonical(path)
+            if self.blocked(path):
+                return False, 'Failed to create directory', []
+            fs.add_directory(path)
+            return True, 'Directory created successfully', []
+
+        path = fs.canonical(path)
+        dirs, files = [], []
+        prefix = '' if path == '/' else path
+        for name in fs.listing(path) or ():
+            attrs = fs.node(prefix + '/' + name)
+            (dirs if attrs is not None and is_dir(attrs) else files).append(name)
+        if action == 'list_files':
+            return True, 'Files listed successfully', files
+        if action == 'list_directories':
+            return True, 'Directories listed successfully', dirs
+        return True, 'All items listed successfully', ['[DIR] ' + d for d in dirs] + files
+
+    def blocked(self, path):
+        """True when some part of path exists and is not a directory"""
+        current = ''
+        for part in path.split('/')[1:]:
+            current += '/' + part
+            attrs = self.fs.node(current)
+            if attrs is None:
+                return False
+            if not is_dir(attrs):
+                return True
+        return False
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One connection may send any number of requests
+        while True:
+            try:
+                request = read_message(self.rfile, self.server.max_message)
+            except (ValueError, UnicodeDecodeError) as e:
+                write_message(self.wfile, response(False, f'Error: {e}'))
+                return
+            if request is None:
+                return
+            if not isinstance(request, dict):
+                reply = response(False, 'Error: request must be a JSON object')
+            else:
+                reply = self.server.controller.handle(request)
+            write_message(self.wfile, reply)
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves a Controller on a Unix socket, one thread per client"""
+    daemon_threads = True
+
+    def __init__(self, fs, socket_path, max_message=MAX_MESSAGE):
+        self.controller = Controller(fs)
+        self.max_message = max_message
+        self.socket_path = socket_path
+        # A socket left behind by an earlier run
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.unlink(socket_path)
+        # Whoever can write decoys can also blind the logger: owner only,
+        # from the moment the socket exists rather than after a chmod
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        os.chmod(socket_path, 0o600)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='logfs-control', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        if self.thread is not None:
+            self.shutdown()
+        self.server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
@@ -0,0 +1,185 @@
+"""
+Bulk copy / share crawl detection for LogFS
+CrawlDetector is an event sink: it runs on the pipeline's writer thread,
+never in a FUSE callback. Per client it keeps a sliding window of
+`buckets` fixed slots (files opened, bytes read, distinct directories,
+deepest listing), so memory per client is constant whatever the traffic.
+When a window crosses a threshold one ALERT is delivered straight to the
+other sinks (it never waits in, or gets dropped from, the queue), then the
+client is quiet for `cooldown` seconds
+
+    [2025-01-10 14:05:12] ALERT        /finance/2024 client=10.0.0.5:51234 files/s=212.4 ...
+"""
+
+import math
+import re
+import zlib
+
+from procinfo import client_of
+
+BYTES = re.compile(r'\bbytes=(\d+)')
+# Bits per distinct-directory sketch (linear counting)
+SKETCH_BITS = 1024
+
+
+class Window:
+    __slots__ = ('client', 'seen', 'slot', 'files', 'bytes', 'dirs', 'depth', 'total_files', 'total_bytes',
+                 'distinct', 'dirty', 'quiet_until', 'last_path', 'last_dir')
+
+    def __init__(self, buckets, client):
+        self.client = client
+        self.seen = 0.0
+        self.slot = None
+        self.files = [0] * buckets
+        self.bytes = [0] * buckets
+        self.dirs = [0] * buckets
+        self.depth = [0] * buckets
+        self.total_files = 0
+        self.total_bytes = 0
+        # Estimate of distinct directories, recomputed only when a sketch changed
+        self.distinct = 0.0
+        self.dirty = False
+        self.quiet_until = 0.0
+        self.last_path = ''
+        self.last_dir = None
+
+    def advance(self, slot):
+        """Move to time slot, clearing the buckets that fell out of the window"""
+        n = len(self.files)
+        if self.slot is None or slot - self.slot >= n:
+            stale = range(n)
+        elif slot > self.slot:
+            stale = [s % n for s in range(self.slot + 1, slot + 1)]
+        else:
+            return  # late event, count it in the current bucket
+        for i in stale:
+            self.total_files -= self.files[i]
+            self.total_bytes -= self.bytes[i]
+            self.files[i] = self.bytes[i] = self.depth[i] = 0
+            if self.dirs[i]:
+                self.dirs[i] = 0
+                self.dirty = True
+        self.slot = slot
+
+    def add_dir(self, i, directory):
+        bit = 1 << (zlib.crc32(directory.encode()) % SKETCH_BITS)
+        if not self.dirs[i] & bit:
+            self.dirs[i] |= bit
+            self.dirty = True
+
+    def distinct_dirs(self):
+        if self.dirty:
+            sketch = 0
+            for bits in self.dirs:
+                sketch |= bits
+            zeros = max(SKETCH_BITS - bin(sketch).count('1'), 1)
+            self.distinct = SKETCH_BITS * math.log(SKETCH_BITS / zeros)
+            self.dirty = False
+        return self.distinct
+
+
+class CrawlDetector:
+    # Also wants the LIST and OPEN events other sinks never see
+    signals = ('LIST', 'OPEN')
+
+    def __init__(self, window=10.0, buckets=10, files_per_sec=20.0, bytes_per_sec=10 * 1024 * 1024,
+                 distinct_dirs=50, depth=8, cooldown=300.0, max_clients=16384):
+        self.window = window
+        self.buckets = buckets
+        self.width = window / buckets
+        self.files_per_sec = files_per_sec
+        self.bytes_per_sec = bytes_per_sec
+        self.distinct_dirs = distinct_dirs
+        self.depth = depth
+        self.cooldown = cooldown
+        # Totals that cross the per-second thresholds over one window
+        self.max_files = files_per_sec * window
+        self.max_bytes = bytes_per_sec * window
+        self.max_clients = max_clients
+        self.clients = {}
+        self.windows = {}
+        # Set to the EventPipeline this sink belongs to; alerts go to pipeline.deliver
+        self.pipeline = None
+        self.fired = 0
+
+    def write(self, batch):
+        for event in batch:
+            self.observe(*event)
+
+    def window_for(self, who):
+        window = self.windows.get(who)
+        if window is not None:
+            return window
+        client = client_of(who)
+        window = self.clients.get(client)
+        if window is None:
+            if len(self.clients) >= self.max_clients:
+                # Forget the tenth of clients seen least recently
+                idle = sorted(self.clients, key=lambda c: self.clients[c].seen)
+                for c in idle[:max(1, len(idle) // 10)]:
+                    del self.clients[c]
+                self.windows = {w: win for w, win in self.windows.items() if win.client in self.clients}
+            window = self.clients[client] = Window(self.buckets, client)
+        if len(self.windows) >= self.max_clients:
+            self.windows.clear()
+        # Same Accessor object for every event of a process (ProcessCache)
+        self.windows[who] = window
+        return window
+
+    def observe(self, ts, operation, path, extra, who):
+        if operation == 'OPEN':
+            files, size, listed = 1, 0, None
+        elif operation == 'READ':
+            match = BYTES.search(extra)
+            files, size, listed = 0, int(match.group(1)) if match else 0, None
+        elif operation == 'LIST':
+            files, size, listed = 0, 0, path
+        else:
+            return
+
+        window = self.window_for(who)
+        slot = int(ts / self.width)
+        if slot != window.slot:
+            window.advance(slot)
+        window.seen = ts
+        i = window.slot % self.buckets
+        window.last_path = path
+        directory = listed if listed is not None else path.rpartition('/')[0] or '/'
+        if directory != window.last_dir:
+            window.last_dir = directory
+            window.add_dir(i, directory)
+        deep = False
+        if listed is not None:
+            depth = 0 if listed == '/' else listed.count('/')
+            if depth > window.depth[i]:
+                window.depth[i] = depth
+            deep = depth >= self.depth
+        window.files[i] += files
+        window.total_files += files
+        window.bytes[i] += size
+        window.total_bytes += size
+
+        # Cheap comparisons first; the directory sketch only when it changed
+        if ts >= window.quiet_until and (
+                window.total_files >= self.max_files or window.total_bytes >= self.max_bytes or deep
+                or (window.dirty and window.distinct_dirs() >= self.distinct_dirs)):
+            self.alert(ts, window, who)
+
+    def alert(self, ts, window, who):
+        files_rate = window.total_files / self.window
+        bytes_rate = window.total_bytes / self.window
+        depth = max(window.depth)
+        dirs = window.distinct_dirs()
+        crossed = [name for name, hit in (('files', files_rate >= self.files_per_sec),
+                                          ('bytes', bytes_rate >= self.bytes_per_sec),
+                                          ('depth', depth >= self.depth),
+                                          ('dirs', dirs >= self.distinct_dirs)) if hit]
+        window.quiet_until = ts + self.cooldown
+        extra = (f'client={window.client} files/s={files_rate:.1f} MB/s={bytes_rate / (1 << 20):.1f} '
+                 f'dirs={dirs:.0f} depth={depth} window={self.window:g}s trigger={"+".join(crossed)}')
+        self.fired += 1
+        if self.pipeline is not None:
+            self.pipeline.deliver([(ts, 'ALERT', window.last_path, extra, who)])
+
+    def close(self):
+        pass
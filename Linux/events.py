@@ -0,0 +1,236 @@
+"""
+Access event pipeline for LogFS
+FUSE callbacks only enqueue a small tuple (time, operation, path, extra,
+accessor or None); a background thread drains
+the queue in batches and hands them to the configured sinks
+"""
+
+from datetime import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# Operations emitted for detectors and alerters only, never written to the logs:
+# LIST is every directory listing, OPEN every new session as it starts (the
+# log gets the session's READ summary instead)
+SIGNALS = ('LIST', 'OPEN')
+
+
+class ConsoleSink:
+    """Human readable lines on stdout (the original LogFS output format)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def format(self, event):
+        ts, operation, path, extra, who = event
+        timestamp = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+        line = f'[{timestamp}] {operation:12} {path} {extra}'
+        if who is not None:
+            peers = f' from {",".join(who.peers)}' if who.peers else ''
+            line = f'{line.rstrip()} [{who.name} pid={who.pid} uid={who.uid} gid={who.gid}{peers}]'
+        return line + '\n'
+
+    def write(self, batch):
+        self.stream.write(''.join(self.format(e) for e in batch))
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """One JSON object per line, for shipping to a SIEM"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'a', encoding='utf-8')
+
+    def format(self, event):
+        ts, operation, path, extra, who = event
+        record = {'time': ts, 'op': operation, 'path': path}
+        if extra:
+            record['extra'] = extra
+        if who is not None:
+            record.update(uid=who.uid, gid=who.gid, pid=who.pid, process=who.name, cmdline=who.cmdline)
+            if who.peers:
+                record['peers'] = list(who.peers)
+        return json.dumps(record) + '\n'
+
+    def write(self, batch):
+        self.file.write(''.join(self.format(e) for e in batch))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class RotatingFileSink(ConsoleSink):
+    """Console-format lines in a file that rotates at max_bytes"""
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backups=5):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.stream = open(filename, 'a', encoding='utf-8')
+
+    def write(self, batch):
+        super().write(batch)
+        if self.stream.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.stream.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.filename}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.filename}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.filename, self.filename + '.1')
+        else:
+            os.remove(self.filename)
+        self.stream = open(self.filename, 'a', encoding='utf-8')
+
+    def close(self):
+        self.stream.close()
+
+
+class EventPipeline:
+    """
+    Bounded queue between FUSE callbacks and the sinks
+    overflow='drop' discards new events when the queue is full (counted in
+    dropped), overflow='block' makes the callback wait up to block_timeout
+    """
+
+    def __init__(self, sinks, max_queue=65536, batch_size=512, overflow='drop',
+                 block_timeout=0.5):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(max_queue)
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.sink_errors = 0
+        # emit runs on many FUSE threads; written and sink_errors only on the writer
+        self.lock = threading.Lock()
+        self.writer = threading.Thread(target=self.run, name='logfs-events', daemon=True)
+        self.writer.start()
+
+    def emit(self, operation, path, extra='', who=None):
+        with self.lock:
+            self.emitted += 1
+        try:
+            if self.overflow == 'block':
+                self.queue.put((time.time(), operation, path, extra, who), timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait((time.time(), operation, path, extra, who))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            batch = [event]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    event = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    stop = True
+                    break
+                batch.append(event)
+            self.deliver(batch)
+            if stop:
+                return
+
+    def deliver(self, batch):
+        # SIGNALS (listings, live opens) only go to sinks that list them in signals
+        plain = None
+        for sink in self.sinks:
+            wanted = getattr(sink, 'signals', ())
+            if wanted:
+                events = [e for e in batch if e[1] not in SIGNALS or e[1] in wanted]
+            else:
+                if plain is None:
+                    plain = [e for e in batch if e[1] not in SIGNALS]
+                events = plain
+            if not events:
+                continue
+            try:
+                sink.write(events)
+            except Exception as e:
+                self.sink_errors += 1
+                print(f'Event sink {type(sink).__name__} failed: {e}', file=sys.stderr)
+        self.written += len(batch)
+
+    def stats(self):
+        with self.lock:
+            emitted, dropped = self.emitted, self.dropped
+        return dict(emitted=emitted, written=self.written, dropped=dropped,
+                    queued=self.queue.qsize(), sink_errors=self.sink_errors)
+
+    def close(self, timeout=5.0):
+        """Flush everything still queued and close the sinks"""
+        self.queue.put(None)
+        self.writer.join(timeout)
+        for sink in self.sinks:
+            sink.close()
+
+
+class ProbeCounter:
+    """
+    Lookups of missing paths, counted per client and reported every interval
+    seconds as one ENOENT event per client instead of one per probe. Names
+    are kept per basename (desktop.ini, Thumbs.db, ...) up to max_names
+    """
+
+    def __init__(self, log, interval=60.0, max_names=256, top=5):
+        self.log = log
+        self.interval = interval
+        self.max_names = max_names
+        self.top = top
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def record(self, client, path):
+        name = path.rpartition('/')[2]
+        with self.lock:
+            names = self.counts.get(client)
+            if names is None:
+                names = self.counts[client] = {}
+            if name not in names and len(names) >= self.max_names:
+                name = '<other>'
+            names[name] = names.get(name, 0) + 1
+
+    def start(self):
+        if self.thread is None and self.interval > 0:
+            self.thread = threading.Thread(target=self.run, name='logfs-probes', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        for client, names in counts.items():
+            top = sorted(names.items(), key=lambda item: -item[1])[:self.top]
+            self.log('ENOENT', '*', f'client={client} probes={sum(names.values())} names={len(names)} '
+                                    'top=' + ','.join(f'{name}:{count}' for name, count in top))
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
@@ -4,96 +4,597 @@ Minimal FUSE filesystem that logs all access attempts
 Mount this, then share the mount point via Impacket/Responder SMB
 """
 
-from fuse import FUSE, FuseOSError, Operations
+from fuse import FUSE, FuseOSError, Operations, fuse_get_context
+from contextlib import contextmanager
+import argparse
 import errno
-from datetime import datetime
+import hashlib
 import json
 import os
+import threading
+import time
+
+from canary import DnsAlerter, parse_server
+from content import (ChunkCache, CompressedContent, Content, build_pack, content_from_config, open_pack,
+                     read_chunk)
+from control import ControlServer
+from detector import CrawlDetector
+from events import ConsoleSink, EventPipeline, JsonlSink, ProbeCounter, RotatingFileSink
+from generator import GeneratedTree
+from honeytokens import RenderCache
+from image import TreeImage, write_image
+from mount import HELP as MOUNT_HELP, PRESETS, mount_options
+from nodes import DIR_MODE, FILE_MODE, StatMaker, is_dir, parse_time
+from procinfo import ProcessCache, client_of
+from sessions import SessionTracker
 
 class LogFS(Operations):
-    def __init__(self, config_file=None):
-        self.files = {'/': dict(st_mode=0o755 | 0o040000, st_nlink=2)}
+    def __init__(self, config_file=None, events=None, pack_file=None, image_file=None, dedup=True,
+                 compress=None, cache_bytes=64 * 1024 * 1024, stat=None, negative_entries=65536,
+                 probe_interval=60.0, ignore_case=False, proc_ttl=5.0, session_timeout=30.0):
+        # Path -> immutable stat record (see nodes.StatMaker)
+        self.stat = stat or StatMaker()
+        self.files = {'/': self.stat('/', DIR_MODE)}
         self.data = {}
+        # Parent directory -> child names (dict used as an ordered set).
+        # Once mounted these dicts are never modified in place: writers build
+        # a copy and swap it in, so readdir never sees a half-updated listing
+        self.children = {'/': {}}
+        self.lock = threading.RLock()
+        self.live = False
+        self.batch_depth = 0
+        self.staged = {}
+        # Attributes and bodies changed while mounted wait here (None marks a
+        # removal) and are published together with the staged listings
+        self.staged_files = {}
+        self.staged_data = {}
+        # Bodies orphaned by removals since the blob table was last pruned
+        self.orphaned = 0
+        self.generators = []
+        self.renders = RenderCache()
+        # Content hash -> shared body, so identical decoys are stored once
+        self.dedup = dedup
+        self.blobs = {}
+        # zlib level for in-memory bodies (None keeps them raw)
+        self.compress = compress
+        self.chunk_cache = ChunkCache(cache_bytes)
+        self.pack = None
+        self.image = None
+        # "mount" section of the config (see mount.py)
+        self.mount = {}
+        self.events = events if events is not None else EventPipeline([ConsoleSink()])
+        # Paths known to be missing (case-folded with --ignore-case), so a
+        # repeat probe skips the case index, image and generators. Only
+        # consulted after self.files, so a stale entry can never hide a real
+        # file; add_node drops it anyway
+        self.missing = set()
+        self.negative_entries = negative_entries
+        # Reported from a timer thread, so without a FUSE request context
+        self.probes = ProbeCounter(self.events.emit, probe_interval)
+        self.procs = ProcessCache(proc_ttl)
+        # Emit LIST events for readdir (only sinks that ask for them see these)
+        self.list_events = False
+        self.open_events = False
+        self.sessions = SessionTracker(self.events.emit, self.current_accessor, session_timeout)
+        # Case-folded path -> stored path, for SMB clients that ignore case
+        self.folded = None
+        # control.ControlServer, started once mounted
+        self.control = None
         
         if config_file:
             self.load_config(config_file)
+        if pack_file:
+            self.load_pack(pack_file)
+        if image_file:
+            self.load_image(image_file)
+        if ignore_case:
+            self.build_case_index()
     
     def load_config(self, config_file):
         with open(config_file, 'r') as f:
             config = json.load(f)
         
         for item in config.get('files', []):
-            path = item['path']
-            content = item.get('content', '').encode()
-            
-            # Create parent directories
-            parts = path.split('/')[1:-1]
-            for i in range(len(parts)):
-                dir_path = '/' + '/'.join(parts[:i+1])
-                if dir_path not in self.files:
-                    self.files[dir_path] = dict(st_mode=0o755 | 0o040000, st_nlink=2)
-            
-            # Create file
-            self.files[path] = dict(st_mode=0o644 | 0o100000, st_size=len(content))
+            mtime = parse_time(item['mtime']) if 'mtime' in item else None
+            try:
+                content = content_from_config(item)
+            except ValueError as e:
+                raise ValueError(f'{item["path"]}: {e}') from None
+            if content is None:
+                content = item.get('content', '')
+            self.add_file(item['path'], content, mtime)
+        for spec in config.get('generators', []):
+            self.add_generator(GeneratedTree.from_config(spec))
+        self.mount = config.get('mount', {})
+
+    def load_pack(self, pack_file):
+        # Bodies stay in the mapped pack and are paged in on first read
+        self.pack, index = open_pack(pack_file)
+        view = memoryview(self.pack)
+        for path, offset, length, *spec in index:
+            if spec:
+                self.add_file(path, content_from_config(spec[0]))
+            else:
+                self.add_file(path, view[offset:offset + length])
+
+    def load_image(self, image_file):
+        # Nothing is loaded up front: the image is a read-only layer under
+        # the static tree, resolved path by path (see image.TreeImage)
+        self.image = TreeImage(image_file, self.stat)
+        for spec in self.image.meta['generators']:
+            self.add_generator(GeneratedTree.from_config(spec))
+        # A config given alongside the image has the last word
+        self.mount = dict(self.image.meta['mount'], **self.mount)
+
+    def build_case_index(self):
+        # Built once after loading; add_node keeps it current from here on.
+        # Of paths differing only in case, the first one loaded wins
+        folded = {}
+        for path in self.files:
+            folded.setdefault(path.casefold(), path)
+        if self.image is not None:
+            # The one place an image is walked in full
+            for path in self.image.paths():
+                folded.setdefault(path.casefold(), path)
+        self.folded = folded
+
+    def canonical(self, path):
+        """Stored spelling of path (unchanged unless the case index is on)"""
+        if self.folded is None or path in self.files:
+            return path
+        return self.folded.get(path.casefold(), path)
+
+    def add_generator(self, tree):
+        # Static directory for the generator root; everything below is lazy
+        self.add_directory(tree.root)
+        tree.stat = self.stat
+        self.generators.append(tree)
+
+    def generator_for(self, path):
+        for tree in self.generators:
+            if tree.owns(path):
+                return tree
+        return None
+
+    def init(self, path):
+        # Called by fusepy once mounted; from here on callbacks run concurrently
+        self.live = True
+        self.probes.start()
+        self.sessions.start()
+        if self.control is not None:
+            self.control.start()
+
+    @contextmanager
+    def batch(self):
+        # Group mutations: each touched directory is copied once and all of
+        # them are published together when the outermost batch exits
+        with self.lock:
+            self.batch_depth += 1
+            try:
+                yield
+            finally:
+                self.batch_depth -= 1
+                if not self.batch_depth and (self.staged or self.staged_files):
+                    self.publish()
+
+    def publish(self):
+        # New nodes appear before the listings naming them and removed ones
+        # go after, so readdir never returns a name that getattr rejects
+        removed = [path for path, attrs in self.staged_files.items() if attrs is None]
+        for path, content in self.staged_data.items():
+            if path in self.data:
+                self.orphaned += 1
+            self.data[path] = content
+        self.files.update((path, attrs) for path, attrs in self.staged_files.items() if attrs is not None)
+        for path, kids in self.staged.items():
+            if kids is None:
+                self.children.pop(path, None)
+            else:
+                self.children[path] = kids
+        for path in removed:
+            self.files.pop(path, None)
+            if self.data.pop(path, None) is not None:
+                self.orphaned += 1
+            if self.folded is not None and self.folded.get(path.casefold()) == path:
+                del self.folded[path.casefold()]
+        if self.staged_data or removed:
+            # Honeytokens rendered from the old bodies
+            self.renders.forget(self.staged_data.keys() | set(removed))
+        self.staged = {}
+        self.staged_files = {}
+        self.staged_data = {}
+        if self.dedup and self.orphaned > max(1024, len(self.blobs) // 2):
+            self.prune_blobs()
+
+    def prune_blobs(self):
+        # Forget shared bodies no file refers to any more
+        used = {id(content) for content in self.data.values()}
+        self.blobs = {digest: body for digest, body in self.blobs.items() if id(body) in used}
+        self.orphaned = 0
+
+    def node(self, path):
+        """Attributes of path, including changes staged by the current batch"""
+        if path in self.staged_files:
+            return self.staged_files[path]
+        attrs = self.files.get(path)
+        if attrs is None and self.image is not None:
+            attrs = self.image.getattr(path)
+        return attrs
+
+    def listing(self, path):
+        """Child names of path, including changes staged by the current batch"""
+        if path in self.staged:
+            return self.staged[path]
+        return self.with_image(path, self.children.get(path))
+
+    def with_image(self, path, kids):
+        # Names the static tree adds to an image directory come after its own
+        if self.image is None:
+            return kids
+        lower = self.image.listing(path)
+        if not lower:
+            return kids
+        return {**lower, **kids} if kids else lower
+
+    def listing_for_update(self, path):
+        if not self.live:
+            return self.children.setdefault(path, {})
+        kids = self.staged.get(path)
+        if kids is None:
+            # A listing removed earlier in this batch starts over empty
+            kids = self.staged[path] = {} if path in self.staged else dict(self.children.get(path, ()))
+        return kids
+
+    def add_file(self, path, content, mtime=None):
+        with self.batch():
+            self._add_file(path, content, mtime)
+
+    def _add_file(self, path, content, mtime):
+        if isinstance(content, str):
+            content = content.encode()
+        if self.dedup and isinstance(content, (bytes, bytearray)):
+            digest = hashlib.blake2b(content, digest_size=16).digest()
+            shared = self.blobs.get(digest)
+            if shared is None:
+                shared = self.blobs[digest] = self.pack_body(content)
+            content = shared
+        elif isinstance(content, (bytes, bytearray)):
+            content = self.pack_body(content)
+        
+        # Create parent directories
+        parent = path.rpartition('/')[0]
+        if parent and self.node(parent) is None:
+            self.add_directory(parent)
+        
+        # Create file
+        self.add_node(path, self.stat(path, FILE_MODE, len(content), mtime))
+        if self.live:
+            self.staged_data[path] = content
+        else:
             self.data[path] = content
 
+    def add_directory(self, path):
+        """Create path and any missing parents"""
+        with self.batch():
+            current = ''
+            for part in path.split('/')[1:]:
+                current += '/' + part
+                if self.node(current) is None:
+                    self.add_node(current, self.stat(current, DIR_MODE))
+
+    def add_node(self, path, attrs):
+        with self.batch():
+            if is_dir(attrs) and self.listing(path) is None:
+                self.listing_for_update(path)
+            parent, _, name = path.rpartition('/')
+            self.listing_for_update(parent or '/')[name] = None
+            if self.live:
+                self.staged_files[path] = attrs
+            else:
+                self.files[path] = attrs
+            self.missing.discard(path if self.folded is None else path.casefold())
+            if self.folded is not None:
+                self.folded.setdefault(path.casefold(), path)
+
+    def remove_node(self, path):
+        """Remove a file, or a directory and everything below it"""
+        with self.batch():
+            attrs = self.node(path)
+            if attrs is None or path == '/':
+                return False
+            if self.image is not None and self.image.getattr(path) is not None:
+                # The image is read-only
+                return False
+            if is_dir(attrs):
+                for name in list(self.listing(path) or ()):
+                    self.remove_node(path + '/' + name)
+                if self.live:
+                    self.staged[path] = None
+                else:
+                    self.children.pop(path, None)
+            parent, _, name = path.rpartition('/')
+            self.listing_for_update(parent or '/').pop(name, None)
+            self.staged_files[path] = None
+            self.staged_data.pop(path, None)
+            return True
+
+    def pack_body(self, content):
+        if self.compress is None or len(content) < 1024:
+            return content
+        compressed = CompressedContent(content, level=self.compress)
+        # Not worth it for already compressed or random data
+        if compressed.stored_size > len(content) * 0.9:
+            return content
+        return compressed
+
+    def memory_report(self):
+        logical = stored = 0
+        seen = set()
+        for content in self.data.values():
+            logical += len(content)
+            if id(content) not in seen:
+                seen.add(id(content))
+                stored += getattr(content, 'stored_size', len(content))
+        return dict(files=len(self.data), unique_bodies=len(seen), logical_bytes=logical,
+                    stored_bytes=stored, saved_bytes=logical - stored)
+
     def log(self, operation, path, extra=''):
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f'[{timestamp}] {operation:12} {path} {extra}')
+        self.events.emit(operation, path, extra, self.current_accessor())
+
+    def current_accessor(self):
+        return self.procs.describe(*self.context())
+
+    def context(self):
+        try:
+            return fuse_get_context()
+        except ValueError:
+            # Not inside a FUSE request (benchmarks, background threads)
+            return 0, 0, 0
+
+    def client(self):
+        """Who a request comes from: the remote peer behind an SMB server, else uid/pid"""
+        return client_of(self.current_accessor())
 
     def getattr(self, path, fh=None):
-        if path not in self.files:
-            raise FuseOSError(errno.ENOENT)
-        return self.files[path]
+        attrs = self.files.get(path)
+        if attrs is None:
+            if (path if self.folded is None else path.casefold()) in self.missing:
+                self.probes.record(self.client(), path)
+                raise FuseOSError(errno.ENOENT)
+            stored = self.canonical(path)
+            if stored is not path:
+                attrs = self.files.get(stored)
+            if attrs is None:
+                if self.image is not None:
+                    attrs = self.image.getattr(stored)
+                if attrs is None:
+                    tree = self.generator_for(path)
+                    if tree is not None:
+                        attrs = tree.getattr(path)
+            if attrs is None:
+                self.not_found(path)
+        return attrs
+
+    def not_found(self, path):
+        # desktop.ini, Thumbs.db, autorun.inf... probed in every directory
+        if self.negative_entries:
+            if len(self.missing) >= self.negative_entries:
+                self.missing.clear()
+            self.missing.add(path if self.folded is None else path.casefold())
+        # Per SMB peer, not per server process (see client)
+        self.probes.record(self.client(), path)
+        raise FuseOSError(errno.ENOENT)
 
     def readdir(self, path, fh):
-        entries = ['.', '..']
-        if path == '/':
-            # Root directory - show top-level items
-            for item_path in self.files:
-                if item_path != '/' and item_path.count('/') == 1:
-                    entries.append(item_path[1:])
-        else:
-            # Subdirectory - show items in this directory
-            prefix = path if path.endswith('/') else path + '/'
-            for item_path in self.files:
-                if item_path.startswith(prefix) and item_path != path:
-                    remainder = item_path[len(prefix):]
-                    if '/' not in remainder:
-                        entries.append(remainder)
+        if path != '/':
+            path = self.canonical(path.rstrip('/'))
+        if self.list_events:
+            self.log('LIST', path)
+        entries = ['.', '..'] + list(self.with_image(path, self.children.get(path)) or ())
+        tree = self.generator_for(path)
+        if tree is not None:
+            entries.extend(tree.listing(path) or ())
         return entries
 
     def open(self, path, flags):
-        self.log('OPEN', path)
-        return 0
+        path = self.canonical(path)
+        attrs = self.files.get(path)
+        if attrs is None and self.image is not None:
+            attrs = self.image.getattr(path)
+        fh, new = self.sessions.open(path, attrs['st_size'] if attrs else 0)
+        # The log gets the session's READ summary; the live OPEN is only for
+        # the detector and DNS alerts, and re-opens within the session are
+        # counted in the summary instead
+        if new and self.open_events:
+            self.log('OPEN', path)
+        return fh
     
     def release(self, path, fh):
+        self.sessions.release(fh)
         return 0
 
     def read(self, path, size, offset, fh):
-        if offset == 0:  # Only log first read chunk to avoid spam
-            self.log('COPY/READ', path)
-        if path in self.data:
-            return self.data[path][offset:offset + size]
-        raise FuseOSError(errno.ENOENT)
+        if self.folded is not None:
+            path = self.canonical(path)
+        content = self.data.get(path)
+        if content is None and self.image is not None:
+            content = self.image.content(path)
+        if content is None:
+            tree = self.generator_for(path)
+            if tree is not None:
+                content = tree.content(path)
+            if content is None:
+                raise FuseOSError(errno.ENOENT)
+        if isinstance(content, Content):
+            chunk = content.read(self, path, offset, size)
+        else:
+            chunk = read_chunk(content, offset, size)
+        self.sessions.read(path, offset, len(chunk), len(content))
+        return chunk
 
     def write(self, path, data, offset, fh):
         return len(data)
 
     def create(self, path, mode):
-        self.files[path] = dict(st_mode=mode | 0o100000, st_size=0)
+        if self.folded is not None:
+            # Land in the existing directory, whatever case the client used
+            parent, _, name = path.rpartition('/')
+            path = self.canonical(parent) + '/' + name if parent else path
+        self.add_node(path, self.stat(path, mode | 0o100000, 0, time.time()))
         return 0
 
+def compile_main(argv):
+    parser = argparse.ArgumentParser(prog='fuse_logger.py compile',
+                                     description='Compile a JSON config into a binary tree image')
+    parser.add_argument('config', help='JSON config file with filesystem structure')
+    parser.add_argument('output', help='Image file to write')
+    args = parser.parse_args(argv)
+    
+    try:
+        fs = LogFS(args.config, events=EventPipeline([]))
+        count, size = write_image(fs, args.output)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f'fuse_logger.py compile: {e}\n')
+    print(f'Compiled {count} nodes, {size} content bytes, {len(fs.generators)} generators into {args.output}')
+
+def pack_main(argv):
+    parser = argparse.ArgumentParser(prog='fuse_logger.py pack',
+                                     description='Build a memory-mapped content pack from a JSON config')
+    parser.add_argument('config', help='JSON config file with filesystem structure')
+    parser.add_argument('output', help='Pack file to write (index goes to OUTPUT.idx)')
+    args = parser.parse_args(argv)
+    
+    try:
+        count, size = build_pack(args.config, args.output)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f'fuse_logger.py pack: {e}\n')
+    print(f'Packed {count} files, {size} bytes into {args.output}')
+
 if __name__ == '__main__':
-    import argparse
+    import sys
+    
+    tools = {'pack': pack_main, 'compile': compile_main}
+    if len(sys.argv) > 1 and sys.argv[1] in tools:
+        tools[sys.argv[1]](sys.argv[2:])
+        sys.exit(0)
     
-    parser = argparse.ArgumentParser(description='FUSE filesystem logger')
+    parser = argparse.ArgumentParser(description='FUSE filesystem logger', epilog=MOUNT_HELP,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('mountpoint', help='Directory to mount filesystem')
     parser.add_argument('-c', '--config', help='JSON config file with filesystem structure')
+    parser.add_argument('-p', '--pack', help='Content pack built with "fuse_logger.py pack"')
+    parser.add_argument('-i', '--image', help='Tree image built with "fuse_logger.py compile"')
+    parser.add_argument('--compress', type=int, nargs='?', const=6, metavar='LEVEL',
+                        help='Keep file bodies zlib-compressed in memory (default level 6)')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Decompressed chunk cache size')
+    parser.add_argument('--memory-report', action='store_true', help='Print content storage stats after loading')
+    parser.add_argument('--uid', type=int, help='Owner reported for every node (default: current user)')
+    parser.add_argument('--gid', type=int, help='Group reported for every node (default: current group)')
+    parser.add_argument('--preset', choices=list(PRESETS), help='Kernel caching preset (see below)')
+    parser.add_argument('--attr-timeout', type=float, help='Seconds the kernel caches stat results')
+    parser.add_argument('--entry-timeout', type=float, help='Seconds the kernel caches name lookups')
+    parser.add_argument('--max-read', type=int, help='Largest read request in bytes')
+    parser.add_argument('--big-writes', action='store_true', default=None, help='Allow writes larger than 4 KiB')
+    parser.add_argument('--kernel-cache', action='store_true', default=None,
+                        help='Keep file data cached between opens (repeat reads are not logged)')
+    parser.add_argument('--ignore-case', action='store_true',
+                        help='Resolve paths case-insensitively, like the Windows clients of the share')
+    parser.add_argument('--control', metavar='SOCKET',
+                        help='Accept create/delete/list commands on this Unix socket while mounted')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not log events to the console')
+    parser.add_argument('--log-jsonl', help='Append events as JSON lines to this file')
+    parser.add_argument('--log-file', help='Append events to this file, rotating at --log-max-bytes')
+    parser.add_argument('--log-max-bytes', type=int, default=10 * 1024 * 1024)
+    parser.add_argument('--log-backups', type=int, default=5)
+    parser.add_argument('--queue-size', type=int, default=65536, help='Max events buffered before overflow')
+    parser.add_argument('--probe-interval', type=float, default=60.0,
+                        help='Seconds between aggregated ENOENT reports of missing-path probes')
+    parser.add_argument('--proc-ttl', type=float, default=5.0,
+                        help='Seconds a pid\'s process name and command line are cached')
+    parser.add_argument('--session-timeout', type=float, default=30.0,
+                        help='Seconds a read session stays open after its last close, or while idle')
+    parser.add_argument('--overflow', choices=['drop', 'block'], default='drop',
+                        help='When the queue is full: drop new events (counted) or block the callback briefly')
+    detect = parser.add_argument_group('bulk copy / crawl detection')
+    detect.add_argument('--detect', action='store_true', help='Raise an ALERT when a client copies or crawls in bulk')
+    detect.add_argument('--detect-window', type=float, default=10.0, help='Sliding window in seconds')
+    detect.add_argument('--detect-files-per-sec', type=float, default=20.0)
+    detect.add_argument('--detect-mb-per-sec', type=float, default=10.0)
+    detect.add_argument('--detect-dirs', type=int, default=50, help='Distinct directories touched in the window')
+    detect.add_argument('--detect-depth', type=int, default=8, help='Deepest directory listed in the window')
+    detect.add_argument('--detect-cooldown', type=float, default=300.0, help='Seconds between alerts per client')
+    dns = parser.add_argument_group('DNS canary alerts')
+    dns.add_argument('--dns-canary', metavar='DOMAIN',
+                     help='Look up u<n>.f<base32 file>.i<base32 process>.DOMAIN on every open')
+    dns.add_argument('--dns-server', help='Resolver as HOST[:PORT] (default: first nameserver in /etc/resolv.conf)')
+    dns.add_argument('--dns-rate-limit', type=float, default=5.0, help='Seconds between alerts for the same file')
+    dns.add_argument('--dns-max-in-flight', type=int, default=32, help='Concurrent lookups')
     args = parser.parse_args()
     
+    sinks = []
+    if not args.quiet:
+        sinks.append(ConsoleSink())
+    if args.log_jsonl:
+        sinks.append(JsonlSink(args.log_jsonl))
+    if args.log_file:
+        sinks.append(RotatingFileSink(args.log_file, args.log_max_bytes, args.log_backups))
+    alerter = None
+    if args.dns_canary:
+        alerter = DnsAlerter(args.dns_canary, parse_server(args.dns_server) if args.dns_server else None,
+                             args.dns_rate_limit, args.dns_max_in_flight)
+        sinks.append(alerter)
+    detector = None
+    if args.detect:
+        detector = CrawlDetector(args.detect_window, files_per_sec=args.detect_files_per_sec,
+                                 bytes_per_sec=args.detect_mb_per_sec * 1024 * 1024,
+                                 distinct_dirs=args.detect_dirs, depth=args.detect_depth,
+                                 cooldown=args.detect_cooldown)
+        sinks.append(detector)
+    events = EventPipeline(sinks, max_queue=args.queue_size, overflow=args.overflow)
+    if detector is not None:
+        detector.pipeline = events
+    
     print('Mounting LogFS at ' + args.mountpoint)
     print('All file access will be logged below:')
     print('-' * 60)
     
-    FUSE(LogFS(args.config), args.mountpoint, foreground=True, allow_other=True)
+    fs = LogFS(args.config, events, args.pack, args.image,
+               compress=args.compress, cache_bytes=args.cache_mb * 1024 * 1024,
+               stat=StatMaker(args.uid, args.gid), probe_interval=args.probe_interval,
+               ignore_case=args.ignore_case, proc_ttl=args.proc_ttl,
+               session_timeout=args.session_timeout)
+    fs.list_events = detector is not None
+    fs.open_events = detector is not None or alerter is not None
+    if args.control:
+        fs.control = ControlServer(fs, args.control)
+        print('Control socket: ' + args.control)
+    if args.memory_report:
+        report = fs.memory_report()
+        print(f"Content: {report['files']} files, {report['unique_bodies']} unique bodies, "
+              f"{report['stored_bytes']} of {report['logical_bytes']} bytes stored "
+              f"({report['saved_bytes']} saved by dedup/compression)")
+    
+    # Preset, then the config's "mount" section, then command line flags
+    mount = dict(fs.mount)
+    preset = args.preset or mount.pop('preset', 'default')
+    mount.pop('preset', None)
+    for key in ('attr_timeout', 'entry_timeout', 'max_read', 'big_writes', 'kernel_cache'):
+        if getattr(args, key) is not None:
+            mount[key] = getattr(args, key)
+    options = mount_options(preset, **mount)
+    print('Mount options: ' + (', '.join(f'{k}={v}' for k, v in options.items()) or 'libfuse defaults'))
+    
+    try:
+        # use_ino: the kernel and SMB layer see our stable st_ino values
+        FUSE(fs, args.mountpoint, foreground=True, allow_other=True, use_ino=True, **options)
+    finally:
+        if fs.control is not None:
+            fs.control.close()
+        fs.sessions.close()
+        fs.probes.close()
+        events.close()
+        stats = events.stats()
+        print(f"Events: {stats['written']} written, {stats['dropped']} dropped")
+        if alerter is not None:
+            print("DNS alerts: {sent} sent, {answered} answered, {timeouts} timed out, "
+                  "{coalesced} coalesced, {dropped} dropped".format(**alerter.stats))
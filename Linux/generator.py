@@ -0,0 +1,189 @@
+"""
+Procedurally generated decoy namespaces for LogFS
+A generator owns a directory (e.g. /home) and derives the children of any
+directory below it from (seed, path) and a list of per-depth templates, so
+the same path always has the same listing, size and body. Only directories
+that were actually looked at are kept, in a bounded LRU
+
+Config:
+    "generators": [{
+        "path": "/home",
+        "seed": 1234,
+        "levels": [
+            {"count": 5000, "name": "{first}.{last}"},
+            {"names": ["Documents", "Desktop", "Downloads"]},
+            {"count": [5, 40], "name": "{word}_{year}-{month}.{ext}",
+             "files": true, "size": [2000, 90000]}
+        ]
+    }]
+
+Placeholders: first, last, word, dept, project, year, month, day, n, ext, path, name
+"""
+
+from collections import OrderedDict
+import random
+import threading
+
+from nodes import DIR_MODE, FILE_MODE, StatMaker, is_dir
+
+VOCAB = {
+    'first': ['james', 'mary', 'robert', 'patricia', 'john', 'jennifer', 'michael', 'linda',
+              'david', 'elizabeth', 'william', 'barbara', 'richard', 'susan', 'joseph', 'jessica',
+              'thomas', 'sarah', 'chris', 'karen', 'daniel', 'lisa', 'matthew', 'nancy', 'anthony',
+              'sandra', 'mark', 'ashley', 'steven', 'kimberly', 'paul', 'emily', 'andrew', 'donna'],
+    'last': ['smith', 'johnson', 'williams', 'brown', 'jones', 'garcia', 'miller', 'davis',
+             'rodriguez', 'martinez', 'hernandez', 'lopez', 'gonzalez', 'wilson', 'anderson',
+             'thomas', 'taylor', 'moore', 'jackson', 'martin', 'lee', 'perez', 'thompson', 'white',
+             'harris', 'sanchez', 'clark', 'ramirez', 'lewis', 'robinson', 'walker', 'young'],
+    'word': ['Budget', 'Forecast', 'Invoice', 'Payroll', 'Roadmap', 'Minutes', 'Contract',
+             'Proposal', 'Audit', 'Expenses', 'Headcount', 'Pricing', 'Vendors', 'Backup',
+             'Credentials', 'Inventory', 'Onboarding', 'Review', 'Strategy', 'Migration',
+             'Passwords', 'Salaries', 'Board_Deck', 'Compliance', 'Network_Diagram'],
+    'dept': ['Finance', 'HR', 'Legal', 'Engineering', 'Sales', 'Marketing', 'IT', 'Operations',
+             'Procurement', 'Security', 'Executive', 'Facilities'],
+    'project': ['Phoenix', 'Atlas', 'Orion', 'Falcon', 'Mercury', 'Titan', 'Aurora', 'Nimbus',
+                'Apollo', 'Helix', 'Vanguard', 'Zephyr'],
+    'ext': ['docx', 'xlsx', 'pdf', 'pptx', 'txt', 'csv', 'zip', 'msg'],
+    'year': [str(y) for y in range(2019, 2026)],
+    'month': ['%02d' % m for m in range(1, 13)],
+    'day': ['%02d' % d for d in range(1, 29)],
+}
+
+
+class _Sampler(dict):
+    """format_map source that draws a fresh value for every placeholder"""
+
+    def __init__(self, rng, vocab, **fixed):
+        super().__init__(fixed)
+        self.rng = rng
+        self.vocab = vocab
+
+    def __missing__(self, key):
+        return self.rng.choice(self.vocab[key])
+
+
+class GeneratedTree:
+    def __init__(self, root, levels, seed=0, vocab=None, max_entries=200000, max_bodies=1024):
+        self.root = root.rstrip('/') or '/'
+        self.prefix = '' if self.root == '/' else self.root
+        self.levels = levels
+        self.seed = seed
+        self.vocab = dict(VOCAB, **(vocab or {}))
+        self.max_entries = max_entries
+        self.max_bodies = max_bodies
+        self.listings = OrderedDict()
+        self.bodies = OrderedDict()
+        self.cached_entries = 0
+        # FUSE callbacks run on several threads; the LRUs are not safe to share
+        self.lock = threading.RLock()
+        # Replaced by LogFS.add_generator so records match the static tree
+        self.stat = StatMaker()
+
+    @classmethod
+    def from_config(cls, spec):
+        return cls(spec['path'], spec['levels'], spec.get('seed', 0), spec.get('vocab'),
+                   spec.get('max_entries', 200000), spec.get('max_bodies', 1024))
+
+    def to_config(self):
+        """The spec from_config rebuilds this tree from"""
+        return {'path': self.root, 'levels': self.levels, 'seed': self.seed,
+                'vocab': {key: words for key, words in self.vocab.items() if VOCAB.get(key) != words},
+                'max_entries': self.max_entries, 'max_bodies': self.max_bodies}
+
+    def owns(self, path):
+        return path == self.root or path.startswith(self.prefix + '/')
+
+    def _depth(self, path):
+        if path == self.root:
+            return 0
+        return path[len(self.prefix):].count('/')
+
+    def _rng(self, path):
+        return random.Random(f'{self.seed}:{path}')
+
+    def listing(self, path):
+        """name -> stat dict for a generated directory, None if path is not one"""
+        with self.lock:
+            return self._listing(path)
+
+    def _listing(self, path):
+        entries = self.listings.get(path)
+        if entries is not None:
+            self.listings.move_to_end(path)
+            return entries
+
+        if path != self.root:
+            parent, _, name = path.rpartition('/')
+            siblings = self._listing(parent or '/')
+            if siblings is None or name not in siblings or not is_dir(siblings[name]):
+                return None
+
+        depth = self._depth(path)
+        entries = self._generate(path, self.levels[depth]) if depth < len(self.levels) else {}
+        self.listings[path] = entries
+        self.cached_entries += len(entries)
+        while self.cached_entries > self.max_entries and len(self.listings) > 1:
+            _, evicted = self.listings.popitem(last=False)
+            self.cached_entries -= len(evicted)
+        return entries
+
+    def _generate(self, path, level):
+        rng = self._rng(path)
+        is_file = level.get('files', False)
+        if 'names' in level:
+            names = list(level['names'])
+        else:
+            count = level.get('count', 10)
+            if isinstance(count, list):
+                count = rng.randint(*count)
+            template = level.get('name', '{word}')
+            names = [template.format_map(_Sampler(rng, self.vocab, n=i)) for i in range(count)]
+
+        entries = {}
+        base = '' if path == '/' else path
+        size_range = level.get('size', [1000, 50000])
+        for name in names:
+            unique, i = name, 1
+            while unique in entries:
+                i += 1
+                stem, dot, ext = name.rpartition('.')
+                unique = f'{stem} ({i}).{ext}' if dot and is_file else f'{name} ({i})'
+            if is_file:
+                entries[unique] = self.stat(f'{base}/{unique}', FILE_MODE, rng.randint(*size_range))
+            else:
+                entries[unique] = self.stat(f'{base}/{unique}', DIR_MODE)
+        return entries
+
+    def getattr(self, path):
+        if path == self.root:
+            return self.stat(path, DIR_MODE)
+        parent, _, name = path.rpartition('/')
+        siblings = self.listing(parent or '/')
+        if siblings is None:
+            return None
+        return siblings.get(name)
+
+    def content(self, path):
+        """Deterministic body for a generated file, None if path is not one"""
+        with self.lock:
+            body = self.bodies.get(path)
+            if body is not None:
+                self.bodies.move_to_end(path)
+                return body
+
+        attrs = self.getattr(path)
+        if attrs is None or is_dir(attrs):
+            return None
+        level = self.levels[self._depth(path) - 1]
+        rng = self._rng(path + '#content')
+        name = path.rpartition('/')[2]
+        template = level.get('content', 'CONFIDENTIAL - {dept}\n{path}\nOwner: {first}.{last}\n')
+        line = template.format_map(_Sampler(rng, self.vocab, path=path, name=name, n=0)).encode()
+        size = attrs['st_size']
+        body = bytearray((line * (size // max(len(line), 1) + 1))[:size])
+
+        with self.lock:
+            self.bodies[path] = body
+            if len(self.bodies) > self.max_bodies:
+                self.bodies.popitem(last=False)
+        return body
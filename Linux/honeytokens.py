@@ -0,0 +1,115 @@
+"""
+Per-access honeytokens for LogFS
+A file with a "template" instead of "content" gets fresh secrets rendered
+into its {{placeholders}} on the first read by each client (the SMB peer
+behind smbserver.py/smbd, else the local process). The values are logged
+as a TOKEN event, so a leaked key points back at the file and the client
+that copied it. Every placeholder renders to a fixed width,
+so st_size is known before anything is rendered
+
+Config:
+    {"path": "/aws/credentials",
+     "template": "[default]\\naws_access_key_id = {{aws_access_key}}\\n..."}
+"""
+
+from collections import OrderedDict
+import re
+import secrets
+import string
+import threading
+import uuid
+
+from content import Content, read_chunk
+
+UPPER_DIGITS = string.ascii_uppercase + string.digits
+ALNUM = string.ascii_letters + string.digits
+
+
+def _random(alphabet, length):
+    return ''.join(secrets.choice(alphabet) for _ in range(length))
+
+
+TOKENS = {
+    'aws_access_key': lambda: 'AKIA' + _random(UPPER_DIGITS, 16),
+    'aws_secret_key': lambda: _random(ALNUM + '/+', 40),
+    'password': lambda: _random(ALNUM, 12) + _random('!@#$%&*', 2) + _random(string.digits, 2),
+    'token': lambda: secrets.token_hex(20),
+    'hex32': lambda: secrets.token_hex(16),
+    'uuid': lambda: str(uuid.uuid4()),
+    'github_token': lambda: 'ghp_' + _random(ALNUM, 36),
+    'stripe_key': lambda: 'sk_live_' + _random(ALNUM, 48),
+    'slack_token': lambda: 'xoxb-' + _random(string.digits, 12) + '-' + _random(ALNUM, 24),
+}
+
+PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+
+class RenderCache:
+    """LRU of rendered bodies keyed by (path, client)"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self.lock:
+            self.entries[key] = body
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def forget(self, paths):
+        """Drop the bodies rendered for paths whose content changed"""
+        with self.lock:
+            if self.entries:
+                for key in [key for key in self.entries if key[0] in paths]:
+                    del self.entries[key]
+
+
+class TokenTemplate(Content):
+    def __init__(self, template):
+        self.template = template
+        self.parts = PLACEHOLDER.split(template)
+        for name in self.parts[1::2]:
+            if name not in TOKENS:
+                raise ValueError(f'Unknown honeytoken placeholder {{{{{name}}}}}')
+        self.size = len(self.render()[0])
+        self.lock = threading.Lock()
+
+    def to_config(self):
+        return {'template': self.template}
+
+    def render(self):
+        """Fresh body plus the values that went into it"""
+        values = {}
+        out = []
+        for i, part in enumerate(self.parts):
+            if i % 2:
+                values[part] = value = TOKENS[part]()
+                out.append(value)
+            else:
+                out.append(part)
+        return bytearray(''.join(out).encode()), values
+
+    def read(self, fs, path, offset, size):
+        # Per client: behind an SMB server that is the remote peer, not the
+        # server process every remote client shares
+        key = (path, fs.client())
+        body = fs.renders.get(key)
+        if body is None:
+            # Concurrent first chunks of one copy must agree on the values
+            with self.lock:
+                body = fs.renders.get(key)
+                if body is None:
+                    body, values = self.render()
+                    fs.renders.put(key, body)
+                    tokens = ' '.join(f'{k}={v}' for k, v in values.items())
+                    fs.log('TOKEN', path, f'client={key[1]} {tokens}')
+        return read_chunk(body, offset, size)
@@ -0,0 +1,244 @@
+"""
+Compiled binary tree image for LogFS
+Everything load_config builds (paths, stat records, file bodies) laid out
+as flat little-endian columns so a mount can mmap it instead of parsing JSON.
+Nothing is read up front: a path is found through the hash index and its
+stat record built on first use, so opening an image costs the same for any
+tree size
+
+Layout:
+    header      MAGIC, version, node count, then (offset, length) of each section
+    names       unique path components, UTF-8, back to back (interned)
+    name_start  where each name starts in names, plus the end (u32)
+    columns     per node: name id, parent, mode, first child, child count (u32)
+                and size, content offset, mtime (64 bit), each 8-byte aligned.
+                Nodes are in breadth-first order so the children of a
+                directory are contiguous
+    index       open-addressing hash table, crc32 of the UTF-8 path -> node + 1
+                (0 is empty), at most half full
+    meta        JSON: the config's "mount" section, "generators" specs and the
+                config keys of templated and synthetic bodies by node, rebuilt
+                at mount
+    content     file bodies, page aligned
+"""
+
+import functools
+import json
+import mmap
+import struct
+import zlib
+
+from content import Content, content_from_config
+from nodes import StatMaker, is_dir
+
+MAGIC = b'LOGFSIMG'
+IMAGE_VERSION = 5
+COLUMNS = [('name', 'I'), ('parent', 'I'), ('mode', 'I'), ('first_child', 'I'),
+           ('child_count', 'I'), ('size', 'Q'), ('offset', 'Q'), ('mtime', 'q')]
+# names, name_start, one section per column, index, meta, content
+HEADER = struct.Struct('<8sII' + 'QQ' * (len(COLUMNS) + 5))
+PAGE = 4096
+
+
+def _align(n):
+    return (n + PAGE - 1) // PAGE * PAGE
+
+
+def _pad(n):
+    # Keep every column 8-byte aligned for memoryview.cast
+    return (n + 7) // 8 * 8
+
+
+def _hash_index(paths):
+    slots = 2
+    while slots < 2 * len(paths):
+        slots *= 2
+    mask = slots - 1
+    table = [0] * slots
+    for node, path in enumerate(paths):
+        slot = zlib.crc32(path.encode()) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = node + 1
+    return table
+
+
+def write_image(fs, image_file):
+    """Compile a populated LogFS into image_file. Returns (nodes, content bytes)"""
+    order = ['/']
+    parents = [0]
+    first_child = []
+    child_count = []
+    for i, path in enumerate(order):
+        kids = list(fs.children.get(path, ())) if is_dir(fs.files[path]) else []
+        first_child.append(len(order))
+        child_count.append(len(kids))
+        prefix = path if path == '/' else path + '/'
+        for name in kids:
+            order.append(prefix + name)
+            parents.append(i)
+
+    name_ids = {}
+    names = []
+    cols = {c: [] for c, _ in COLUMNS}
+    cols['parent'] = parents
+    cols['first_child'] = first_child
+    cols['child_count'] = child_count
+    bodies = []
+    content_size = 0
+    written = {}
+    on_demand = {}
+    for node, path in enumerate(order):
+        name = path.rpartition('/')[2]
+        if name not in name_ids:
+            name_ids[name] = len(names)
+            names.append(name.encode())
+        cols['name'].append(name_ids[name])
+        attrs = fs.files[path]
+        cols['mode'].append(attrs['st_mode'])
+        cols['mtime'].append(int(attrs['st_mtime']))
+        body = fs.data.get(path)
+        if isinstance(body, Content):
+            spec = body.to_config()
+            if spec is None:
+                raise ValueError(f'{path}: {type(body).__name__} bodies cannot be compiled into an image')
+            on_demand[node] = spec
+            cols['size'].append(len(body))
+            cols['offset'].append(0)
+        elif body is None:
+            cols['size'].append(attrs.get('st_size', 0))
+            cols['offset'].append(0)
+        else:
+            # Bodies shared in memory (dedup) are written once
+            if id(body) not in written:
+                written[id(body)] = content_size
+                bodies.append(body)
+                content_size += len(body)
+            cols['size'].append(len(body))
+            cols['offset'].append(written[id(body)])
+
+    name_start = [0]
+    for name in names:
+        name_start.append(name_start[-1] + len(name))
+    sections = [b''.join(names), struct.pack(f'<{len(name_start)}I', *name_start)]
+    for column, fmt in COLUMNS:
+        sections.append(struct.pack(f'<{len(order)}{fmt}', *cols[column]))
+    index = _hash_index(order)
+    sections.append(struct.pack(f'<{len(index)}I', *index))
+    meta = {'mount': fs.mount, 'generators': [tree.to_config() for tree in fs.generators],
+            'content': on_demand}
+    sections.append(json.dumps(meta).encode())
+
+    with open(image_file, 'wb') as f:
+        pos = HEADER.size
+        layout = []
+        for section in sections:
+            layout += [pos, len(section)]
+            pos += _pad(len(section))
+        content_start = _align(pos)
+        layout += [content_start, content_size]
+        f.write(HEADER.pack(MAGIC, IMAGE_VERSION, len(order), *layout))
+        for section in sections:
+            f.write(section)
+            f.write(b'\0' * (_pad(len(section)) - len(section)))
+        f.write(b'\0' * (content_start - pos))
+        for body in bodies:
+            f.write(body)
+    return len(order), content_size
+
+
+class TreeImage:
+    """
+    Columns of a mapped image; each column is a memoryview over the mmap.
+    getattr, listing and content resolve one path at a time; recent stat
+    records and listings are kept in LRUs
+    """
+
+    def __init__(self, image_file, stat=None, max_entries=65536, max_listings=256):
+        with open(image_file, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER.unpack_from(self.map)
+        magic, version, self.count = fields[:3]
+        if magic != MAGIC or version != IMAGE_VERSION:
+            raise ValueError(f'{image_file}: not a LogFS image (version {IMAGE_VERSION}); '
+                             f'rebuild it with "fuse_logger.py compile"')
+        view = memoryview(self.map)
+        sections = [view[offset:offset + length] for offset, length in zip(fields[3::2], fields[4::2])]
+
+        self.names = sections[0]
+        self.name_start = sections[1].cast('I')
+        for (column, fmt), section in zip(COLUMNS, sections[2:]):
+            setattr(self, column, section.cast(fmt))
+        self.index = sections[-3].cast('I')
+        self.meta = json.loads(str(sections[-2], 'utf-8'))
+        # Templated bodies hold per-client state, so one object per node.
+        # Built here: few files are declared this way
+        self.on_demand = {int(node): content_from_config(spec) for node, spec in self.meta['content'].items()}
+        self.mask = len(self.index) - 1
+        self.bodies = sections[-1]
+        self.stat = stat or StatMaker()
+        self.getattr = functools.lru_cache(max_entries)(self._getattr)
+        self.listing = functools.lru_cache(max_listings)(self._listing)
+
+    def name_of(self, node):
+        n = self.name[node]
+        return str(self.names[self.name_start[n]:self.name_start[n + 1]], 'utf-8')
+
+    def lookup(self, path):
+        """Node number of path, None if the image has no such path"""
+        if path == '/':
+            return 0
+        key = path.encode(errors='surrogateescape')
+        index, mask = self.index, self.mask
+        slot = zlib.crc32(key) & mask
+        while True:
+            node = index[slot]
+            if not node:
+                return None
+            if self._is_path(node - 1, key):
+                return node - 1
+            slot = (slot + 1) & mask
+
+    def _is_path(self, node, key):
+        # Compare component by component, from the node up to the root
+        name, parent, start, names = self.name, self.parent, self.name_start, self.names
+        while node:
+            key, _, last = key.rpartition(b'/')
+            n = name[node]
+            if names[start[n]:start[n + 1]] != last:
+                return False
+            node = parent[node]
+        return not key
+
+    def _getattr(self, path):
+        node = self.lookup(path)
+        if node is None:
+            return None
+        return self.stat(path, self.mode[node], self.size[node], self.mtime[node])
+
+    def _listing(self, path):
+        """Child names of a directory (dict used as an ordered set), None if path is not one"""
+        node = self.lookup(path)
+        if node is None or not self.mode[node] & 0o040000:
+            return None
+        first = self.first_child[node]
+        return dict.fromkeys(self.name_of(kid) for kid in range(first, first + self.child_count[node]))
+
+    def content(self, path):
+        """Body of a file (a view into the mapping, or a template), None if path is not one"""
+        node = self.lookup(path)
+        if node is None or self.mode[node] & 0o040000:
+            return None
+        if node in self.on_demand:
+            return self.on_demand[node]
+        offset = self.offset[node]
+        return self.bodies[offset:offset + self.size[node]]
+
+    def paths(self):
+        """Full path of every node, in image order"""
+        names = [str(self.names[a:b], 'utf-8') for a, b in zip(self.name_start, self.name_start[1:])]
+        paths = ['/']
+        append = paths.append
+        for name, p in zip(self.name[1:], self.parent[1:]):
+            append((paths[p] if p else '') + '/' + names[name])
+        return paths
@@ -0,0 +1,55 @@
+"""
+Mount tuning for LogFS
+By default the kernel asks LogFS again for every stat and path lookup after
+one second, so a recursive listing over SMB is mostly getattr callbacks.
+Presets trade that metadata traffic for cache lifetime. LogFS only logs
+READ and TOKEN, and every open() and uncached read still reaches
+it under each preset; only --kernel-cache changes what is observable
+
+Config:
+    "mount": {"preset": "balanced", "attr_timeout": 10}
+"""
+
+PRESETS = {
+    # Every stat and lookup reaches LogFS
+    'strict': dict(attr_timeout=0, entry_timeout=0),
+    # libfuse defaults (1s attr/entry cache, 4 KiB writes)
+    'default': {},
+    'balanced': dict(attr_timeout=30, entry_timeout=30, max_read=131072, big_writes=True),
+    'fast': dict(attr_timeout=3600, entry_timeout=3600, max_read=131072, big_writes=True),
+}
+
+OPTIONS = ('attr_timeout', 'entry_timeout', 'kernel_cache', 'max_read', 'big_writes')
+
+HELP = """\
+mount presets (--preset, or "mount": {"preset": ...} in the config):
+  strict    attr/entry timeout 0: every stat and lookup reaches LogFS
+  default   libfuse defaults: 1s attr/entry cache
+  balanced  30s attr/entry cache, 128 KiB reads, big writes
+  fast      1h attr/entry cache, 128 KiB reads, big writes
+--attr-timeout, --entry-timeout, --max-read and --big-writes override the preset.
+
+what stays logged:
+  READ and TOKEN are logged under every preset: the caches only
+  absorb repeated getattr and lookups (stat, directory walks), which LogFS
+  does not log. Lookups of missing paths are never cached, so ENOENT probes
+  always reach LogFS. Creates made through the mount are visible at once;
+  only changes made behind the kernel's back wait for the timeouts.
+  --kernel-cache also keeps file data in the page cache between opens: the
+  open is still logged, but a repeat copy of a file already in memory shows
+  as a READ with bytes=0 and gets the honeytoken values of the first reader.
+"""
+
+
+def mount_options(preset='default', **overrides):
+    """FUSE keyword options for preset, with non-None overrides applied"""
+    if preset not in PRESETS:
+        raise ValueError(f'Unknown mount preset {preset!r} (choose from {", ".join(PRESETS)})')
+    options = dict(PRESETS[preset])
+    for key, value in overrides.items():
+        if key not in OPTIONS:
+            raise ValueError(f'Unknown mount option {key!r}')
+        if value is not None:
+            options[key] = value
+    # fusepy passes True as a bare flag and drops False
+    return {k: v for k, v in options.items() if v is not False}
@@ -0,0 +1,53 @@
+"""
+Stat records for LogFS nodes
+Every node gets a complete, read-only stat record when it is created, so
+getattr is a single dict lookup. Inode numbers and default timestamps are
+derived from a hash of the path: stable across remounts, no counters
+"""
+
+from datetime import datetime
+import hashlib
+import os
+import time
+from types import MappingProxyType
+
+DIR_MODE = 0o755 | 0o040000
+FILE_MODE = 0o644 | 0o100000
+ROOT_INO = 1
+
+
+def is_dir(attrs):
+    return attrs['st_mode'] & 0o040000 != 0
+
+
+def parse_time(value):
+    """Unix seconds or an ISO 8601 string"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+class StatMaker:
+    """
+    Builds stat records. Nodes without an explicit mtime get one spread
+    deterministically over the `spread` seconds before `newest`, so a
+    listing looks like files edited over time instead of all at the epoch
+    """
+
+    def __init__(self, uid=None, gid=None, newest=None, spread=2 * 365 * 86400):
+        self.uid = os.getuid() if uid is None else uid
+        self.gid = os.getgid() if gid is None else gid
+        # Default: midnight UTC today, so timestamps only move once a day
+        self.newest = int(time.time() // 86400 * 86400 if newest is None else newest)
+        self.spread = spread
+
+    def __call__(self, path, mode, size=0, mtime=None):
+        digest = hashlib.blake2b(path.encode(), digest_size=16).digest()
+        ino = ROOT_INO if path == '/' else int.from_bytes(digest[:8], 'little') >> 1 or 2
+        if mtime is None:
+            mtime = self.newest - int.from_bytes(digest[8:], 'little') % self.spread
+        directory = mode & 0o040000
+        return MappingProxyType(dict(
+            st_ino=ino, st_mode=mode, st_nlink=2 if directory else 1,
+            st_uid=self.uid, st_gid=self.gid, st_size=4096 if directory else size,
+            st_blocks=8 if directory else (size + 511) // 512, st_atime=mtime, st_mtime=mtime, st_ctime=mtime))
@@ -0,0 +1,144 @@
+"""
+Process attribution for LogFS events
+Every event carries the uid/gid/pid of the FUSE request plus the process
+name and command line from /proc. Lookups are cached per (uid, gid, pid)
+for ttl seconds, so a copy issuing thousands of reads costs one /proc
+visit. When the accessor is an SMB server (impacket smbserver.py or
+impacket-smbserver, Responder, smbd) its established TCP peers are added,
+since the process that touches the files is only a proxy for the remote client
+"""
+
+from collections import namedtuple
+import os
+import socket
+import struct
+import threading
+import time
+
+Accessor = namedtuple('Accessor', 'uid gid pid name cmdline peers')
+
+# Program names as compared by is_smb_server: basename, lower case, no .py
+SMB_SERVERS = frozenset(('smbserver', 'impacket-smbserver', 'responder', 'smbd'))
+TCP_ESTABLISHED = '01'
+
+
+def program_name(arg):
+    """'/usr/bin/smbserver.py' -> 'smbserver'; also 'smbd: client [...]' process titles"""
+    words = arg.split()
+    name = os.path.basename(words[0]).rstrip(':').lower() if words else ''
+    return name[:-3] if name.endswith('.py') else name
+
+
+def is_smb_server(argv):
+    """argv of an SMB server, run directly or through an interpreter (python3 -u smbserver.py)"""
+    script = next((arg for arg in argv[1:] if not arg.startswith(b'-')), b'')
+    return any(program_name(arg.decode(errors='replace')) in SMB_SERVERS for arg in (argv[0], script))
+
+
+def read_proc(pid, name, limit=4096):
+    try:
+        with open(f'/proc/{pid}/{name}', 'rb') as f:
+            return f.read(limit)
+    except OSError:
+        # Process already gone, or hidden by hidepid
+        return b''
+
+
+def _address(text):
+    host, port = text.split(':')
+    raw = bytes.fromhex(host)
+    if len(raw) == 4:
+        ip = socket.inet_ntop(socket.AF_INET, raw[::-1])
+    else:
+        # /proc/net/tcp6 prints the address as four host-order words
+        ip = socket.inet_ntop(socket.AF_INET6, struct.pack('<4I', *struct.unpack('>4I', raw)))
+        if ip.startswith('::ffff:'):
+            ip = ip[7:]
+        else:
+            ip = f'[{ip}]'
+    return f'{ip}:{int(port, 16)}'
+
+
+def tcp_peers(pid):
+    """Remote ends of the established TCP connections of pid, e.g. ('10.0.0.5:51234',)"""
+    inodes = set()
+    try:
+        for fd in os.listdir(f'/proc/{pid}/fd'):
+            try:
+                target = os.readlink(f'/proc/{pid}/fd/{fd}')
+            except OSError:
+                continue
+            if target.startswith('socket:['):
+                inodes.add(target[8:-1])
+    except OSError:
+        return ()
+
+    peers = []
+    for table in ('tcp', 'tcp6'):
+        try:
+            with open(f'/proc/{pid}/net/{table}', 'r') as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[3] == TCP_ESTABLISHED and fields[9] in inodes:
+                        peers.append(_address(fields[2]))
+        except OSError:
+            continue
+    return tuple(sorted(set(peers)))
+
+
+def client_of(who):
+    """
+    Remote peer for SMB servers, else the local user and process
+    smbd forks per client, but smbserver.py and Responder serve every
+    client from one process: clients connected to it at the same time
+    share one id listing all their peers
+    """
+    if who is None:
+        return 'unknown'
+    if who.peers:
+        return ','.join(who.peers)
+    return f'uid={who.uid} pid={who.pid} {who.name}'
+
+
+class ProcessCache:
+    """(uid, gid, pid) -> Accessor, each entry trusted for ttl seconds"""
+
+    def __init__(self, ttl=5.0, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def describe(self, uid, gid, pid):
+        """Accessor for a FUSE request context, None outside of a request (pid 0)"""
+        if not pid:
+            return None
+        key = (uid, gid, pid)
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        accessor = self.resolve(uid, gid, pid)
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                # Drop expired entries first, everything if that was not enough
+                self.entries = {k: e for k, e in self.entries.items() if e[0] > now}
+                if len(self.entries) >= self.max_entries:
+                    self.entries = {}
+            self.entries[key] = (now + self.ttl, accessor)
+        return accessor
+
+    def resolve(self, uid, gid, pid):
+        name = read_proc(pid, 'comm').strip().decode(errors='replace')
+        argv = read_proc(pid, 'cmdline').rstrip(b'\0').split(b'\0')
+        cmdline = b' '.join(argv).decode(errors='replace')
+        peers = ()
+        if is_smb_server(argv):
+            peers = tcp_peers(pid)
+        return Accessor(uid, gid, pid, name, cmdline, peers)
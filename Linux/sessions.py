@@ -0,0 +1,168 @@
+"""
+Read sessions for LogFS
+All opens and reads of one file by one process are folded into a session
+keyed by (pid, path). The session stays open for timeout seconds after its
+last handle is released, so a process that re-opens the file soon after is
+counted in the same session. Then it is reported as a single READ event,
+also for opens that never read anything (bytes=0, first_offset=-):
+
+    READ /aws/credentials bytes=134 chunks=1 first_offset=0 coverage=100.0% size=134
+         opens=1 opened=14:02:11 seconds=0.0 end=release
+
+coverage counts distinct bytes, so a reader that starts mid-file or a copy
+made twice by the same process is visible without one line per chunk
+"""
+
+from bisect import bisect_left
+import itertools
+import threading
+import time
+
+# Beyond this many disjoint ranges coverage is estimated from bytes read
+MAX_RANGES = 256
+
+
+class Session:
+    __slots__ = ('who', 'path', 'size', 'opened', 'started', 'last', 'first_offset', 'bytes',
+                 'chunks', 'ranges', 'opens', 'handles')
+
+    def __init__(self, who, path, size, now):
+        self.who = who
+        self.path = path
+        self.size = size
+        self.opened = time.time()
+        self.started = self.last = now
+        self.first_offset = None
+        self.bytes = 0
+        self.chunks = 0
+        # Sorted, disjoint [start, end) byte ranges read so far
+        self.ranges = []
+        self.opens = 0
+        self.handles = 0
+
+    def add(self, offset, length, now):
+        self.last = now
+        if self.first_offset is None:
+            self.first_offset = offset
+        self.bytes += length
+        self.chunks += 1
+        ranges = self.ranges
+        if ranges is None or not length:
+            return
+        end = offset + length
+        if ranges and ranges[-1][0] <= offset <= ranges[-1][1]:
+            # Sequential read: extend the last range
+            if end > ranges[-1][1]:
+                ranges[-1][1] = end
+            return
+        i = bisect_left(ranges, [offset])
+        if i and ranges[i - 1][1] >= offset:
+            i -= 1
+            offset = ranges[i][0]
+        j = i
+        while j < len(ranges) and ranges[j][0] <= end:
+            end = max(end, ranges[j][1])
+            j += 1
+        ranges[i:j] = [[offset, end]]
+        if len(ranges) > MAX_RANGES:
+            self.ranges = None
+
+    def summary(self, reason):
+        if self.ranges is None:
+            covered = min(self.bytes, self.size)
+        else:
+            covered = sum(end - start for start, end in self.ranges)
+        coverage = 100.0 * covered / self.size if self.size else 100.0
+        first = '-' if self.first_offset is None else self.first_offset
+        opened = time.strftime('%H:%M:%S', time.localtime(self.opened))
+        return (f'bytes={self.bytes} chunks={self.chunks} first_offset={first} '
+                f'coverage={coverage:.1f}% size={self.size} opens={self.opens} opened={opened} '
+                f'seconds={self.last - self.started:.1f} end={reason}')
+
+
+class SessionTracker:
+    """
+    accessor() returns the procinfo.Accessor of the current request (or
+    None); emit is EventPipeline.emit. A session whose handles are all
+    released lingers until timeout seconds pass without another open (0
+    reports it at once); sweep reports those as end=release
+    """
+
+    def __init__(self, emit, accessor, timeout=30.0):
+        self.emit = emit
+        self.accessor = accessor
+        self.timeout = timeout
+        self.sessions = {}
+        self.handles = {}
+        self.fhs = itertools.count(1)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _session(self, who, path, size, now):
+        key = (who.pid if who is not None else 0, path)
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = Session(who, path, size, now)
+            return key, session, True
+        return key, session, False
+
+    def open(self, path, size):
+        """New file handle; new is True when this starts a session"""
+        who = self.accessor()
+        fh = next(self.fhs)
+        now = time.monotonic()
+        with self.lock:
+            key, session, new = self._session(who, path, size, now)
+            session.last = now
+            session.opens += 1
+            session.handles += 1
+            self.handles[fh] = key
+        return fh, new
+
+    def read(self, path, offset, length, size):
+        who = self.accessor()
+        now = time.monotonic()
+        with self.lock:
+            _, session, _ = self._session(who, path, size, now)
+            # Generated files are opened before their size is known
+            session.size = session.size or size
+            session.add(offset, length, now)
+
+    def release(self, fh):
+        with self.lock:
+            key = self.handles.pop(fh, None)
+            session = self.sessions.get(key)
+            if session is None:
+                return
+            session.handles -= 1
+            session.last = time.monotonic()
+            if session.handles > 0 or self.timeout > 0:
+                return
+            del self.sessions[key]
+        self.finish(session, 'release')
+
+    def finish(self, session, reason):
+        self.emit('READ', session.path, session.summary(reason), session.who)
+
+    def sweep(self, reason=None, everything=False):
+        """Report idle sessions; reason defaults to release or timeout per session"""
+        cutoff = time.monotonic() - self.timeout
+        with self.lock:
+            expired = [key for key, s in self.sessions.items() if everything or s.last < cutoff]
+            done = [self.sessions.pop(key) for key in expired]
+        for session in done:
+            self.finish(session, reason or ('timeout' if session.handles else 'release'))
+
+    def start(self):
+        if self.thread is None and self.timeout > 0:
+            self.thread = threading.Thread(target=self.run, name='logfs-sessions', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(min(self.timeout / 2, 5.0)):
+            self.sweep()
+
+    def close(self):
+        self.stopped.set()
+        self.sweep('unmount', everything=True)
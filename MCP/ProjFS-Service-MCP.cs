@@ -67,6 +67,11 @@ namespace WindowsFakeFileSystemService
         public string path { get; set; }
         public string content { get; set; }
         public bool isBase64 { get; set; }
+        // Optional, echoed in the response (pipelining, see "hello")
+        public long? id { get; set; }
+        // Chunked uploads (upload_begin/append/status/commit/abort)
+        public string uploadId { get; set; }
+        public long? offset { get; set; }
     }
 
     public class MCPResponse
@@ -74,6 +79,7 @@ namespace WindowsFakeFileSystemService
         public bool success { get; set; }
         public string message { get; set; }
         public List<string> data { get; set; }
+        public long? id { get; set; }
     }
 
     // Main Service Class
@@ -284,6 +290,19 @@ namespace WindowsFakeFileSystemService
         private Dictionary<Guid, int> enumerationIndices = new Dictionary<Guid, int>();
         private readonly object fileSystemLock = new object();
         
+        // Auto-save of changes made through MCP, at most once per SaveDelayMs
+        private const int SaveDelayMs = 1000;
+        private readonly object saveLock = new object();
+        private System.Threading.Timer saveTimer;
+        private bool savePending = false;
+        
+        // Chunked uploads by id; they outlive the connection so a client can resume
+        private const int UploadIdleMinutes = 30;
+        private const long MaxUploadBytes = 256L * 1024 * 1024;
+        private const int MaxOpenUploads = 64;
+        private readonly Dictionary<string, PendingUpload> uploads = new Dictionary<string, PendingUpload>();
+        private readonly object uploadsLock = new object();
+        
         // MCP Server
         private bool mcpRunning = false;
         private Thread mcpServerThread;
@@ -365,16 +384,24 @@ namespace WindowsFakeFileSystemService
             }
         }
 
+        // Commands one pipelined client may have in progress at once
+        private const int MaxInFlightPerClient = 32;
+
         private void HandleMCPClient(NamedPipeServerStream pipeServer)
         {
+            // Until the client says "hello", commands are answered one at a time
+            // and in order. After it, commands carrying an id run on the thread
+            // pool and are answered as they complete, possibly out of order
+            bool pipelined = false;
+            object writeLock = new object();
+            SemaphoreSlim inFlight = new SemaphoreSlim(MaxInFlightPerClient, MaxInFlightPerClient);
+            
             try
             {
                 while (pipeServer.IsConnected && mcpRunning)
                 {
                     byte[] lengthBytes = new byte[4];
-                    int bytesRead = pipeServer.Read(lengthBytes, 0, 4);
-                    
-                    if (bytesRead == 0)
+                    if (!ReadExactly(pipeServer, lengthBytes))
                         break;
                     
                     int messageLength = BitConverter.ToInt32(lengthBytes, 0);
@@ -388,10 +415,10 @@ namespace WindowsFakeFileSystemService
                         break;
                     }
                     
+                    // Pipelined requests arrive back to back: a single Read may
+                    // return part of a message
                     byte[] messageBytes = new byte[messageLength];
-                    bytesRead = pipeServer.Read(messageBytes, 0, messageLength);
-                    
-                    if (bytesRead == 0)
+                    if (!ReadExactly(pipeServer, messageBytes))
                         break;
                     
                     string jsonRequest = Encoding.UTF8.GetString(messageBytes);
@@ -402,15 +429,40 @@ namespace WindowsFakeFileSystemService
                     }
                     
                     MCPCommand command = DeserializeJson<MCPCommand>(jsonRequest);
-                    MCPResponse response = ProcessMCPCommand(command);
                     
-                    string jsonResponse = SerializeJson(response);
-                    byte[] responseBytes = Encoding.UTF8.GetBytes(jsonResponse);
-                    byte[] responseLengthBytes = BitConverter.GetBytes(responseBytes.Length);
+                    if (pipelined && command.id.HasValue)
+                    {
+                        // Blocks reading further requests while the client is
+                        // MaxInFlightPerClient ahead
+                        inFlight.Wait();
+                        ThreadPool.QueueUserWorkItem(_ =>
+                        {
+                            try
+                            {
+                                WriteMCPResponse(pipeServer, writeLock, ProcessMCPCommand(command));
+                            }
+                            catch (Exception ex)
+                            {
+                                if (enableDebug)
+                                {
+                                    Console.WriteLine("MCP Client handler error: " + ex.Message);
+                                }
+                            }
+                            finally
+                            {
+                                inFlight.Release();
+                            }
+                        });
+                        continue;
+                    }
+                    
+                    MCPResponse response = ProcessMCPCommand(command);
+                    WriteMCPResponse(pipeServer, writeLock, response);
                     
-                    pipeServer.Write(responseLengthBytes, 0, 4);
-                    pipeServer.Write(responseBytes, 0, responseBytes.Length);
-                    pipeServer.Flush();
+                    if (command.action == "hello" && response.success)
+                    {
+                        pipelined = true;
+                    }
                 }
             }
             catch (Exception ex)
@@ -422,6 +474,12 @@ namespace WindowsFakeFileSystemService
             }
             finally
             {
+                // Let commands still in progress finish before the pipe goes
+                for (int i = 0; i < MaxInFlightPerClient; i++)
+                {
+                    inFlight.Wait(5000);
+                }
+                
                 // Clean up the pipe for this client
                 try
                 {
@@ -440,9 +498,37 @@ namespace WindowsFakeFileSystemService
             }
         }
 
+        private static bool ReadExactly(Stream stream, byte[] buffer)
+        {
+            int offset = 0;
+            while (offset < buffer.Length)
+            {
+                int bytesRead = stream.Read(buffer, offset, buffer.Length - offset);
+                if (bytesRead == 0)
+                    return false;
+                offset += bytesRead;
+            }
+            return true;
+        }
+
+        private void WriteMCPResponse(NamedPipeServerStream pipeServer, object writeLock, MCPResponse response)
+        {
+            string jsonResponse = SerializeJson(response);
+            byte[] responseBytes = Encoding.UTF8.GetBytes(jsonResponse);
+            byte[] responseLengthBytes = BitConverter.GetBytes(responseBytes.Length);
+            
+            // Pipelined responses are written from pool threads; keep each whole
+            lock (writeLock)
+            {
+                pipeServer.Write(responseLengthBytes, 0, 4);
+                pipeServer.Write(responseBytes, 0, responseBytes.Length);
+                pipeServer.Flush();
+            }
+        }
+
         private MCPResponse ProcessMCPCommand(MCPCommand command)
         {
-            MCPResponse response = new MCPResponse { data = new List<string>() };
+            MCPResponse response = new MCPResponse { data = new List<string>(), id = command.id };
             
             try
             {
@@ -508,6 +594,22 @@ namespace WindowsFakeFileSystemService
                         response.message = "Directory created successfully";
                         break;
                         
+                    case "hello":
+                        // Protocol extensions this service understands; older
+                        // services answer "Unknown action" and clients fall back
+                        response.data = new List<string> { "pipelining", "max_in_flight=" + MaxInFlightPerClient, "upload" };
+                        response.success = true;
+                        response.message = "Protocol extensions available";
+                        break;
+                        
+                    case "upload_begin":
+                    case "upload_append":
+                    case "upload_status":
+                    case "upload_commit":
+                    case "upload_abort":
+                        ProcessUploadCommand(command, response);
+                        break;
+                        
                     default:
                         response.success = false;
                         response.message = "Unknown action: " + command.action;
@@ -523,10 +625,156 @@ namespace WindowsFakeFileSystemService
             return response;
         }
 
+        // Files too large for one 1MB message arrive in chunks: upload_begin
+        // returns an id, each upload_append carries the offset it starts at
+        // (the bytes received so far), upload_commit the total size. A client
+        // that lost its connection asks upload_status where to carry on
+        private void ProcessUploadCommand(MCPCommand command, MCPResponse response)
+        {
+            PendingUpload upload = null;
+            
+            lock (uploadsLock)
+            {
+                // Forget uploads nobody came back for
+                DateTime expired = DateTime.UtcNow.AddMinutes(-UploadIdleMinutes);
+                foreach (string staleId in uploads.Where(u => u.Value.LastUsed < expired).Select(u => u.Key).ToList())
+                {
+                    uploads.Remove(staleId);
+                }
+                
+                if (command.action == "upload_begin")
+                {
+                    if (string.IsNullOrEmpty(command.path))
+                    {
+                        response.success = false;
+                        response.message = "Upload needs a path";
+                        return;
+                    }
+                    
+                    // Each one may hold up to MaxUploadBytes until it expires
+                    if (uploads.Values.Count(u => !u.Committed) >= MaxOpenUploads)
+                    {
+                        response.success = false;
+                        response.message = "Too many uploads in progress (" + MaxOpenUploads + "); commit or abort one first";
+                        return;
+                    }
+                    
+                    string uploadId = Guid.NewGuid().ToString("N");
+                    uploads[uploadId] = new PendingUpload
+                    {
+                        Path = command.path,
+                        Data = new MemoryStream(),
+                        LastUsed = DateTime.UtcNow
+                    };
+                    response.data.Add(uploadId);
+                    response.success = true;
+                    response.message = "Upload started";
+                    return;
+                }
+                
+                if (command.uploadId == null || !uploads.TryGetValue(command.uploadId, out upload))
+                {
+                    response.success = false;
+                    response.message = "Unknown upload: " + command.uploadId;
+                    return;
+                }
+                
+                if (command.action == "upload_abort")
+                {
+                    uploads.Remove(command.uploadId);
+                    response.success = true;
+                    response.message = "Upload aborted";
+                    return;
+                }
+            }
+            
+            // Chunks of one upload are applied one at a time, in offset order
+            lock (upload.Lock)
+            {
+                upload.LastUsed = DateTime.UtcNow;
+                
+                if (upload.Committed)
+                {
+                    response.data.Add(upload.Size.ToString());
+                    response.success = command.action != "upload_append";
+                    response.message = command.action == "upload_commit" ? "File created successfully"
+                        : command.action == "upload_status" ? "Upload committed" : "Upload already committed";
+                    return;
+                }
+                
+                long received = upload.Data.Length;
+                
+                if (command.action == "upload_status")
+                {
+                    response.data.Add(received.ToString());
+                    response.success = true;
+                    response.message = "Upload in progress";
+                    return;
+                }
+                
+                if (command.offset != received)
+                {
+                    response.data.Add(received.ToString());
+                    response.success = false;
+                    response.message = "Offset mismatch: expected " + received;
+                    return;
+                }
+                
+                if (command.action == "upload_append")
+                {
+                    byte[] chunk = command.isBase64
+                        ? Convert.FromBase64String(command.content ?? "")
+                        : Encoding.UTF8.GetBytes(command.content ?? "");
+                    
+                    if (received + chunk.Length > MaxUploadBytes)
+                    {
+                        response.success = false;
+                        response.message = "Upload exceeds " + MaxUploadBytes + " bytes";
+                        return;
+                    }
+                    
+                    upload.Data.Write(chunk, 0, chunk.Length);
+                    response.data.Add(upload.Data.Length.ToString());
+                    response.success = true;
+                    response.message = "Chunk stored";
+                    return;
+                }
+                
+                // upload_commit: offset is the total size
+                byte[] content = upload.Data.ToArray();
+                response.success = SaveFileToVirtualRoot(upload.Path, content);
+                response.message = response.success ? "File created successfully" : "Failed to create file";
+                
+                if (response.success)
+                {
+                    upload.Committed = true;
+                    upload.Size = content.Length;
+                    upload.Data.Dispose();
+                    upload.Data = null;
+                }
+            }
+        }
+
         public void StopMCPServer()
         {
             mcpRunning = false;
             
+            // Write out a save still waiting on its timer
+            bool pending;
+            lock (saveLock)
+            {
+                pending = savePending;
+                savePending = false;
+                if (saveTimer != null)
+                {
+                    saveTimer.Change(Timeout.Infinite, Timeout.Infinite);
+                }
+            }
+            if (pending)
+            {
+                SaveConfiguration();
+            }
+            
             if (enableDebug)
             {
                 Console.WriteLine("Stopping MCP Server...");
@@ -756,6 +1004,34 @@ namespace WindowsFakeFileSystemService
             }
         }
 
+        private void ScheduleSaveConfiguration()
+        {
+            // A bulk tree from MCP would otherwise rewrite the whole config
+            // once per file; changes within SaveDelayMs share one save
+            lock (saveLock)
+            {
+                if (savePending)
+                    return;
+                
+                savePending = true;
+                if (saveTimer == null)
+                {
+                    saveTimer = new System.Threading.Timer(_ =>
+                    {
+                        lock (saveLock)
+                        {
+                            savePending = false;
+                        }
+                        SaveConfiguration();
+                    }, null, SaveDelayMs, Timeout.Infinite);
+                }
+                else
+                {
+                    saveTimer.Change(SaveDelayMs, Timeout.Infinite);
+                }
+            }
+        }
+
         public void StartVirtualizing()
         {
             ProjFSNative.PrjCallbacks callbacks = new ProjFSNative.PrjCallbacks
@@ -1339,7 +1615,7 @@ namespace WindowsFakeFileSystemService
                 
                 if (autoSave)
                 {
-                    SaveConfiguration();
+                    ScheduleSaveConfiguration();
                 }
 
                 return true;
@@ -1461,7 +1737,7 @@ namespace WindowsFakeFileSystemService
                         
                         if (autoSave)
                         {
-                            SaveConfiguration();
+                            ScheduleSaveConfiguration();
                         }
 
                         return true;
@@ -1531,6 +1807,18 @@ namespace WindowsFakeFileSystemService
         }
     }
 
+    class PendingUpload
+    {
+        public string Path { get; set; }
+        public MemoryStream Data { get; set; }
+        public DateTime LastUsed { get; set; }
+        // Kept after commit so a client that missed the response can ask again
+        public bool Committed { get; set; }
+        public long Size { get; set; }
+        // Held while a chunk is applied; private to the upload, unlike the object itself
+        public readonly object Lock = new object();
+    }
+
     class FileEntry
     {
         public string Name { get; set; }
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the ProjFS MCP bridge
+Runs against reference_service.py (same protocol as the ProjFS service) on
+a Unix socket or TCP loopback, so no Windows machine is needed
+
+Usage:
+    python3 benchmark.py slow --delay 2 --slow-calls 4 --fast-calls 200
+    python3 benchmark.py load --transports unix tcp --clients 1 4 16 --commands 5000
+    python3 benchmark.py pipeline --delays 0 1 --concurrency 64
+    python3 benchmark.py tree --files 10000 --directories 100    (needs mcp)
+    python3 benchmark.py upload --sizes 0.5 4 32
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from projfs_client import ProjFSClient
+from reference_service import ReferenceService, run_in_thread
+from transports import MAX_MESSAGE
+
+
+class SlowService(ReferenceService):
+    """Reference service that stalls on paths containing 'slow'"""
+
+    def __init__(self, endpoint, delay):
+        super().__init__(endpoint)
+        self.delay = delay
+
+    async def respond(self, command):
+        if 'slow' in (command.get('path') or ''):
+            await asyncio.sleep(self.delay)
+        return await super().respond(command)
+
+
+class LatencyService(ReferenceService):
+    """Reference service taking delay seconds per command; legacy=True predates hello"""
+
+    def __init__(self, endpoint, delay, legacy=False):
+        super().__init__(endpoint)
+        self.delay = delay
+        self.legacy = legacy
+
+    async def respond(self, command):
+        if self.legacy and command.get('action') == 'hello':
+            return {'success': False, 'message': "Unknown action: hello", 'data': []}
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return await super().respond(command)
+
+
+class BlockingClient:
+    """The previous client: a synchronous round trip inside the event loop"""
+
+    def __init__(self, transport):
+        self.connection = transport.connect()
+
+    async def send_command(self, command, timeout=None):
+        return self.connection.send_command(command)
+
+
+async def list_tools_probe(stop, latencies, interval=0.01):
+    # list_tools never touches the pipe: its latency is pure event loop delay
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append(time.perf_counter() - start - interval)
+
+
+async def timed(client, command, latencies, results, timeout=None):
+    response = await client.send_command(command, timeout)
+    latencies.append(time.perf_counter())
+    results.append(bool(response and response.get('success')))
+
+
+async def slow_run(client, args, timeout):
+    stop = asyncio.Event()
+    tool_lag, fast, slow, fast_ok, slow_ok = [], [], [], [], []
+    probe = asyncio.ensure_future(list_tools_probe(stop, tool_lag))
+    start = time.perf_counter()
+    slow_calls = [asyncio.ensure_future(timed(client, {'action': 'create_file', 'path': f'\\slow\\{i}.docx',
+                                                       'content': 'x', 'isBase64': False},
+                                              slow, slow_ok, timeout))
+                  for i in range(args.slow_calls)]
+    fast_calls = []
+    issued = []
+    for i in range(args.fast_calls):
+        # Calls arrive on a fixed schedule whether or not the loop is free to
+        # take them; latency counts from then
+        issued.append(start + i * args.interval)
+        fast_calls.append(asyncio.ensure_future(timed(client, {'action': 'list_all', 'path': '\\'},
+                                                      fast, fast_ok)))
+        await asyncio.sleep(max(0.0, start + (i + 1) * args.interval - time.perf_counter()))
+    await asyncio.gather(*fast_calls, *slow_calls)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    # Calls finish in order, the stand-in answers fast ones immediately
+    fast = [done - sent for sent, done in zip(issued, sorted(fast))]
+    return elapsed, tool_lag, fast, fast_ok, slow_ok
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def bench_slow(args):
+    """Fast tool calls and list_tools while the service stalls on a few slow commands"""
+    logging.getLogger('projfs-mcp').setLevel(logging.CRITICAL)
+    tmpdir = tempfile.mkdtemp(prefix='projfs-bench-')
+    endpoint = 'unix:' + os.path.join(tmpdir, 'service.sock')
+    service = SlowService(endpoint, args.delay)
+    loop = run_in_thread(service)
+    print(f'{"client":>16} {"seconds":>8} {"fast p50 ms":>12} {"fast p99 ms":>12} {"fast ok":>8} '
+          f'{"slow ok":>8} {"list_tools max ms":>18}')
+    try:
+        runs = [('blocking', None), ('async', None), ('async+timeout', args.delay / 2)]
+        for label, timeout in runs:
+            async def run():
+                if label == 'blocking':
+                    client = BlockingClient(service.transport)
+                else:
+                    client = ProjFSClient(endpoint, max_connections=args.connections)
+                return await slow_run(client, args, timeout)
+
+            elapsed, tool_lag, fast, fast_ok, slow_ok = asyncio.run(run())
+            print(f'{label:>16} {elapsed:>8.2f} {percentile(fast, 0.5) * 1000:>12.1f} '
+                  f'{percentile(fast, 0.99) * 1000:>12.1f} {sum(fast_ok):>4}/{len(fast_ok):<3} '
+                  f'{sum(slow_ok):>4}/{len(slow_ok):<3} {max(tool_lag, default=0) * 1000:>18.1f}')
+    finally:
+        loop.call_soon_threadsafe(service.close)
+        shutil.rmtree(tmpdir)
+
+
+def load_worker(transport, commands, latencies):
+    connection = transport.connect()
+    try:
+        for i in range(commands):
+            start = time.perf_counter()
+            connection.send_command({'action': 'create_file', 'path': f'\\load\\{id(latencies)}_{i}.txt',
+                                     'content': 'decoy', 'isBase64': False})
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+
+
+async def load_async(endpoint, clients, commands, latencies):
+    # clients tool calls at a time, each on its own pooled connection
+    client = ProjFSClient(endpoint, max_connections=clients)
+
+    async def worker(w):
+        for i in range(commands // clients):
+            start = time.perf_counter()
+            response = await client.send_command({'action': 'create_file', 'path': f'\\load\\async_{w}_{i}.txt',
+                                                  'content': 'decoy', 'isBase64': False})
+            latencies.append(time.perf_counter() - start)
+            assert response and response['success']
+
+    await asyncio.gather(*(worker(w) for w in range(clients)))
+    client.disconnect()
+
+
+def bench_load(args):
+    """Round trips per second against the reference service, per transport and client count"""
+    tmpdir = tempfile.mkdtemp(prefix='projfs-bench-')
+    endpoints = {'unix': 'unix:' + os.path.join(tmpdir, 'service.sock'), 'tcp': f'tcp:127.0.0.1:{args.port}'}
+    print(f'{"transport":>9} {"client":>7} {"clients":>8} {"commands/s":>11} {"p50 us":>8} {"p99 us":>8}')
+    try:
+        for name in args.transports:
+            service = ReferenceService(endpoints[name])
+            loop = run_in_thread(service)
+            for clients in args.clients:
+                for kind in ('sync', 'async'):
+                    latencies = []
+                    start = time.perf_counter()
+                    if kind == 'sync':
+                        # One blocking connection per thread, like test_mcp.py
+                        per_thread = [[] for _ in range(clients)]
+                        threads = [threading.Thread(target=load_worker,
+                                                    args=(service.transport, args.commands // clients, lat))
+                                   for lat in per_thread]
+                        for t in threads:
+                            t.start()
+                        for t in threads:
+                            t.join()
+                        latencies = [x for lat in per_thread for x in lat]
+                    else:
+                        asyncio.run(load_async(endpoints[name], clients, args.commands, latencies))
+                    elapsed = time.perf_counter() - start
+                    print(f'{name:>9} {kind:>7} {clients:>8} {len(latencies) / elapsed:>11.0f} '
+                          f'{percentile(latencies, 0.5) * 1e6:>8.0f} {percentile(latencies, 0.99) * 1e6:>8.0f}')
+            loop.call_soon_threadsafe(service.close)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+async def pipeline_run(client, commands, concurrency):
+    latencies = []
+
+    async def caller(c):
+        for i in range(c, commands, concurrency):
+            start = time.perf_counter()
+            response = await client.send_command({'action': 'create_file', 'path': f'\\pipe\\{i}.txt',
+                                                  'content': 'decoy', 'isBase64': False})
+            latencies.append(time.perf_counter() - start)
+            assert response and response['success'], response
+
+    assert await client.connect()
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(c) for c in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    mode = 'pipelined' if client.channel is not None else 'one at a time'
+    client.disconnect()
+    return elapsed, latencies, mode
+
+
+def bench_pipeline(args):
+    """Commands per second with and without pipelining, many tool calls at once"""
+    logging.getLogger('projfs-mcp').setLevel(logging.CRITICAL)
+    tmpdir = tempfile.mkdtemp(prefix='projfs-bench-')
+    endpoint = 'unix:' + os.path.join(tmpdir, 'service.sock') if args.transport == 'unix' \
+        else f'tcp:127.0.0.1:{args.port}'
+    print(f'{"service ms":>10} {"service":>8} {"client":>16} {"mode":>14} {"commands/s":>11} '
+          f'{"p50 ms":>8} {"p99 ms":>8}')
+    try:
+        for delay in args.delays:
+            for legacy in (False, True):
+                service = LatencyService(endpoint, delay / 1000, legacy)
+                loop = run_in_thread(service)
+                runs = [('1 connection', dict(pipelining=False, max_connections=1)),
+                        (f'{args.connections} connections', dict(pipelining=False,
+                                                                 max_connections=args.connections)),
+                        ('pipelining', dict(max_in_flight=args.in_flight))]
+                for label, options in runs:
+                    if legacy and label != 'pipelining':
+                        continue
+                    client = ProjFSClient(endpoint, **options)
+                    elapsed, latencies, mode = asyncio.run(pipeline_run(client, args.commands,
+                                                                        args.concurrency))
+                    print(f'{delay:>10g} {"legacy" if legacy else "current":>8} {label:>16} {mode:>14} '
+                          f'{len(latencies) / elapsed:>11.0f} {percentile(latencies, 0.5) * 1000:>8.2f} '
+                          f'{percentile(latencies, 0.99) * 1000:>8.2f}')
+                loop.call_soon_threadsafe(service.close)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def tree_manifest(files, directories, size):
+    content = ('decoy ' * (size // 6 + 1))[:size]
+    return {'root': '\\tree',
+            'directories': [f'dept{d}' for d in range(directories)],
+            'files': [{'path': f'dept{i % directories}\\report_{i}.txt', 'content': content}
+                      for i in range(files)]}
+
+
+async def tree_one_by_one(client, manifest):
+    # What one create_virtual_file tool call per item costs on the pipe
+    for path in manifest['directories']:
+        await client.send_command({'action': 'create_directory', 'path': manifest['root'] + '\\' + path,
+                                   'content': '', 'isBase64': False})
+    for entry in manifest['files']:
+        await client.send_command({'action': 'create_file', 'path': manifest['root'] + '\\' + entry['path'],
+                                   'content': entry['content'], 'isBase64': False})
+
+
+def bench_tree(args):
+    """A whole decoy tree: create_virtual_tree against one command per item"""
+    # The tool handler needs the mcp package
+    import projfs_mcp_server
+
+    logging.getLogger('projfs-mcp').setLevel(logging.CRITICAL)
+    logging.getLogger('projfs-reference').setLevel(logging.WARNING)
+    tmpdir = tempfile.mkdtemp(prefix='projfs-bench-')
+    endpoint = 'unix:' + os.path.join(tmpdir, 'service.sock')
+    manifest = tree_manifest(args.files, args.directories, args.size)
+    print(f'{"service":>8} {"how":>20} {"items":>7} {"seconds":>8} {"items/s":>9} {"listed":>7}')
+    try:
+        for legacy in (False, True):
+            for how in ('one by one', 'create_virtual_tree'):
+                service = LatencyService(endpoint, args.delay / 1000, legacy)
+                loop = run_in_thread(service)
+                client = ProjFSClient(endpoint)
+
+                async def run():
+                    assert await client.connect()
+                    start = time.perf_counter()
+                    if how == 'one by one':
+                        await tree_one_by_one(client, manifest)
+                        report = ''
+                    else:
+                        projfs_mcp_server.projfs_client = client
+                        result = await projfs_mcp_server.handle_call_tool('create_virtual_tree', manifest)
+                        report = result[0].text
+                    elapsed = time.perf_counter() - start
+                    client.disconnect()
+                    return elapsed, report
+
+                elapsed, report = asyncio.run(run())
+                assert not report.startswith('✗'), report.splitlines()[0]
+                # Everything must have landed in the service's tree
+                listed = sum(len(service.tree.list(f'\\tree\\dept{d}', False)) for d in range(args.directories))
+                items = args.files + args.directories
+                print(f'{"legacy" if legacy else "current":>8} {how:>20} {items:>7} {elapsed:>8.2f} '
+                      f'{items / elapsed:>9.0f} {listed:>7}')
+                loop.call_soon_threadsafe(service.close)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+async def upload_single(client, path, local_path):
+    # The previous way: the whole file and its base64 copy in one message
+    with open(local_path, 'rb') as f:
+        content = base64.b64encode(f.read()).decode('ascii')
+    return await client.send_command({'action': 'create_file', 'path': path, 'content': content,
+                                      'isBase64': True})
+
+
+def bench_upload(args):
+    """Chunked uploads against single create_file messages: time and client memory"""
+    logging.getLogger('projfs-mcp').setLevel(logging.CRITICAL)
+    tmpdir = tempfile.mkdtemp(prefix='projfs-bench-')
+    endpoint = 'unix:' + os.path.join(tmpdir, 'service.sock')
+    # A separate process, so tracemalloc sees the client alone
+    service = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'reference_service.py'), '--endpoint', endpoint],
+                               stderr=subprocess.DEVNULL)
+    print(f'{"MB":>6} {"method":>15} {"seconds":>8} {"MB/s":>7} {"client peak MB":>15}  result')
+    try:
+        while not os.path.exists(endpoint[len('unix:'):]):
+            time.sleep(0.05)
+        for megabytes in args.sizes:
+            local_path = os.path.join(tmpdir, 'decoy.bin')
+            with open(local_path, 'wb') as f:
+                f.write(os.urandom(int(megabytes * 1024 * 1024)))
+            for method in ('single message', 'chunked'):
+                size = os.path.getsize(local_path)
+                if method == 'single message' and (size + 2) // 3 * 4 > MAX_MESSAGE - 100:
+                    print(f'{megabytes:>6g} {method:>15} {"":>8} {"":>7} {"":>15}  over the 1 MB message cap')
+                    continue
+
+                async def run():
+                    client = ProjFSClient(endpoint)
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    if method == 'chunked':
+                        response = await client.upload_file('\\upload\\decoy.bin', local_path)
+                    else:
+                        response = await upload_single(client, '\\upload\\decoy.bin', local_path)
+                    elapsed = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    client.disconnect()
+                    return elapsed, peak, response
+
+                elapsed, peak, response = asyncio.run(run())
+                print(f'{megabytes:>6g} {method:>15} {elapsed:>8.2f} {size / elapsed / 1048576:>7.1f} '
+                      f'{peak / 1048576:>15.1f}  {response and response.get("message")}')
+    finally:
+        service.terminate()
+        service.wait()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ProjFS MCP bridge benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('slow', help='Other tool calls while the service is slow to answer')
+    p.add_argument('--delay', type=float, default=2.0, help='Seconds the service takes for slow commands')
+    p.add_argument('--slow-calls', type=int, default=2)
+    p.add_argument('--fast-calls', type=int, default=200)
+    p.add_argument('--interval', type=float, default=0.01, help='Seconds between fast calls')
+    p.add_argument('--connections', type=int, default=4, help='Pool size of the async client')
+    p.set_defaults(func=bench_slow)
+
+    p = sub.add_parser('load', help='Throughput of the reference service per transport and client count')
+    p.add_argument('--transports', nargs='+', choices=['unix', 'tcp'], default=['unix', 'tcp'])
+    p.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    p.add_argument('--commands', type=int, default=5000, help='Commands per run')
+    p.add_argument('--port', type=int, default=9170)
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser('pipeline', help='Throughput of one pipelined connection against pooled round trips')
+    p.add_argument('--transport', choices=['unix', 'tcp'], default='unix')
+    p.add_argument('--delays', type=float, nargs='+', default=[0, 1], help='Service milliseconds per command')
+    p.add_argument('--commands', type=int, default=5000, help='Commands per run')
+    p.add_argument('--concurrency', type=int, default=64, help='Tool calls in progress at once')
+    p.add_argument('--connections', type=int, default=4, help='Pool size without pipelining')
+    p.add_argument('--in-flight', type=int, default=64, help='Pipelining window of the client')
+    p.add_argument('--port', type=int, default=9170)
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser('tree', help='Provisioning a large decoy tree in one tool call')
+    p.add_argument('--files', type=int, default=10000)
+    p.add_argument('--directories', type=int, default=100)
+    p.add_argument('--size', type=int, default=256, help='Bytes of text per file')
+    p.add_argument('--delay', type=float, default=0, help='Service milliseconds per command')
+    p.set_defaults(func=bench_tree)
+
+    p = sub.add_parser('upload', help='Large decoys as chunked uploads')
+    p.add_argument('--sizes', type=float, nargs='+', default=[0.5, 4, 32], help='File sizes in MB')
+    p.set_defaults(func=bench_upload)
+
+    args = parser.parse_args()
+    args.func(args)
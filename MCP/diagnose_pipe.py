@@ -3,39 +3,33 @@
 Named Pipe Diagnostic Tool
 
 Checks the status of the ProjFS MCP named pipe and provides troubleshooting info.
+Also works for the Unix socket / TCP endpoints of reference_service.py:
+
+    python3 diagnose_pipe.py --endpoint unix:/tmp/ProjFS_MCP_Pipe.sock
 """
 
+import argparse
 import sys
 import time
 
-try:
-    import win32pipe
-    import win32file
-    import pywintypes
-except ImportError:
-    print("Error: pywin32 not installed. Run: pip install pywin32")
-    sys.exit(1)
-
-PIPE_NAME = r'\\.\pipe\ProjFS_MCP_Pipe'
+from transports import ConnectError, parse_endpoint
 
 
-def check_pipe_exists():
+def check_pipe_exists(transport):
     """Check if the pipe exists"""
     print("=" * 60)
     print("Named Pipe Diagnostic Tool")
     print("=" * 60)
-    print("\nPipe name: " + PIPE_NAME)
+    print("\nPipe name: " + str(transport))
     print("\n[1/3] Checking if pipe exists...")
     
     try:
         # Try to wait for the pipe with a short timeout
-        win32pipe.WaitNamedPipe(PIPE_NAME, 100)  # 100ms timeout
+        transport.probe(0.1)  # 100ms timeout
         print("✓ Pipe exists!")
         return True
-    except pywintypes.error as e:
-        error_code = e.args[0]
-        
-        if error_code == 2:  # ERROR_FILE_NOT_FOUND
+    except ConnectError as e:
+        if e.reason == 'missing':
             print("✗ Pipe does NOT exist")
             print("\nThe ProjFS service is not running or MCP is disabled.")
             print("\nTo fix:")
@@ -44,7 +38,7 @@ def check_pipe_exists():
             print("  3. Verify the console shows:")
             print("     'Starting MCP Server on pipe: ProjFS_MCP_Pipe'")
             return False
-        elif error_code == 121:  # ERROR_SEM_TIMEOUT
+        elif e.reason == 'timeout':
             print("✓ Pipe exists (but timed out waiting for availability)")
             return True
         else:
@@ -52,7 +46,7 @@ def check_pipe_exists():
             return False
 
 
-def try_connection():
+def try_connection(transport):
     """Try to connect to the pipe"""
     print("\n[2/3] Attempting connection...")
     
@@ -60,31 +54,20 @@ def try_connection():
         try:
             print("  Attempt " + str(attempt + 1) + "/3...")
             
-            # Try to open the pipe
-            handle = win32file.CreateFile(
-                PIPE_NAME,
-                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
-                0,
-                None,
-                win32file.OPEN_EXISTING,
-                0,
-                None
-            )
+            # Try to open the pipe, without waiting for a free instance
+            connection = transport.connect(0.1)
             
             print("  ✓ Successfully connected!")
-            win32file.CloseHandle(handle)
+            connection.close()
             return True
             
-        except pywintypes.error as e:
-            error_code = e.args[0]
-            error_msg = e.args[2] if len(e.args) > 2 else str(e)
-            
-            if error_code == 231:  # ERROR_PIPE_BUSY
+        except ConnectError as e:
+            if e.reason == 'busy':
                 print("  ✗ Pipe is BUSY (another client connected)")
-            elif error_code == 2:
+            elif e.reason == 'missing':
                 print("  ✗ Pipe disappeared!")
             else:
-                print("  ✗ Error " + str(error_code) + ": " + error_msg)
+                print("  ✗ " + str(e))
             
             if attempt < 2:
                 time.sleep(1)
@@ -127,7 +110,12 @@ def provide_diagnosis():
 
 def main():
     """Main diagnostic function"""
-    exists = check_pipe_exists()
+    parser = argparse.ArgumentParser(description='Diagnose the ProjFS MCP service endpoint')
+    parser.add_argument('--endpoint', help='pipe:NAME, unix:PATH or tcp:HOST:PORT (default: $PROJFS_ENDPOINT '
+                                           'or the service pipe)')
+    transport = parse_endpoint(parser.parse_args().endpoint)
+    
+    exists = check_pipe_exists(transport)
     
     if not exists:
         print("\n" + "=" * 60)
@@ -135,7 +123,7 @@ def main():
         print("=" * 60)
         return 1
     
-    connected = try_connection()
+    connected = try_connection(transport)
     
     print("\n" + "=" * 60)
     if connected:
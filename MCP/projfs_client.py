@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Async client for the ProjFS service MCP pipe
+
+Commands are length-prefixed JSON (4 bytes, little-endian) exchanged with
+the service over one of the transports in transports.py: its Named Pipe,
+or a Unix socket / TCP loopback port (reference_service.py). Connections
+are driven from the asyncio event loop (overlapped I/O for the pipe), so
+waiting for the service never blocks the MCP server: other tool calls and
+list_tools keep being answered while a slow command is in flight.
+
+When the service supports pipelining (it answers "hello" with the
+"pipelining" capability), all commands share one connection: each carries
+an id, the service echoes it in the response, and a reader task hands
+every response to the command that is waiting for it, in whatever order
+they arrive. A command that times out or is cancelled simply stops
+waiting; its late response is dropped by id.
+
+Older services answer "hello" with "Unknown action". Then each command
+borrows a connection from a small pool (the service serves every pipe
+instance on its own thread), so one slow command does not hold up the
+others. A command that times out or is cancelled closes its connection
+instead of returning it, since the late reply would otherwise be read as
+the answer to the next command.
+
+Files too large for one message (the service accepts up to 1MB) are sent
+as chunked uploads: upload_begin, upload_append at increasing offsets and
+upload_commit. Chunks are read from the local file as they are sent, and
+an upload interrupted by a lost connection continues from the offset the
+service reports.
+"""
+
+import asyncio
+import base64
+import itertools
+import logging
+import os
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from transports import encode_message, parse_endpoint, read_message
+
+logger = logging.getLogger('projfs-mcp')
+
+# Configuration
+REQUEST_TIMEOUT = 30.0  # seconds for one command, reply included
+MAX_CONNECTIONS = 4  # commands in flight at once, one pipe instance each
+MAX_IN_FLIGHT = 64  # pipelined commands in flight (the service may allow fewer)
+BATCH_SIZE = 500  # commands send_many issues before waiting for their responses
+CHUNK_SIZE = 384 * 1024  # bytes per upload chunk (512KB base64); a multiple of 3
+UPLOAD_RETRIES = 3  # reconnects an upload survives without making progress
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class PipelinedConnection:
+    """One connection carrying many commands, responses matched by id"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, window: int):
+        self.writer = writer
+        self.window = asyncio.Semaphore(window)
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.closed = False
+        self.receiver = asyncio.ensure_future(self.receive(reader))
+
+    async def receive(self, reader: asyncio.StreamReader):
+        error = ConnectionError("Connection closed by the service")
+        try:
+            while True:
+                response = await read_message(reader, max_size=None)
+                future = self.pending.pop(response.get('id'), None)
+                if future is None:
+                    # Answer to a command that timed out or was cancelled
+                    logger.debug(f"Dropping response for id {response.get('id')}")
+                elif not future.done():
+                    future.set_result(response)
+        except asyncio.IncompleteReadError:
+            pass
+        except (ConnectionError, ValueError) as e:
+            error = e
+        finally:
+            self.close(error)
+
+    async def request(self, command: dict) -> dict:
+        """Send command and wait for its response (callers hold a window slot)"""
+        if self.closed:
+            raise ConnectionError("Connection closed by the service")
+        command_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[command_id] = future
+        try:
+            self.writer.write(encode_message(dict(command, id=command_id)))
+            await self.writer.drain()
+            logger.debug(f"Sent command: {command['action']} (id {command_id})")
+            return await future
+        finally:
+            self.pending.pop(command_id, None)
+
+    def close(self, error: Optional[Exception] = None):
+        if self.closed:
+            return
+        self.closed = True
+        # The receiver sees end of stream and finishes
+        self.writer.close()
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error or ConnectionError("Connection closed"))
+        self.pending.clear()
+
+
+class ProjFSClient:
+    """Client for communicating with the ProjFS service
+
+    endpoint is a transport or its text form ('pipe:NAME', 'unix:PATH',
+    'tcp:HOST:PORT'); None means $PROJFS_ENDPOINT or the platform default
+    """
+
+    def __init__(self, endpoint=None, request_timeout: float = REQUEST_TIMEOUT,
+                 max_connections: int = MAX_CONNECTIONS,
+                 open_connection: Optional[Callable[[], Awaitable[Connection]]] = None,
+                 pipelining: bool = True, max_in_flight: int = MAX_IN_FLIGHT):
+        self.transport = parse_endpoint(endpoint) if endpoint is None or isinstance(endpoint, str) else endpoint
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+        # Coroutine returning (reader, writer)
+        self.open_connection = open_connection or self.transport.open
+        self.pipelining = pipelining
+        self.max_in_flight = max_in_flight
+        self.idle = []
+        # Set once the service agreed to pipelining
+        self.channel: Optional[PipelinedConnection] = None
+        # What the service answered "hello" with (empty for older services)
+        self.capabilities: List[str] = []
+        # False until the service answered, and again after it went away
+        self.connected = False
+        self.slots = asyncio.Semaphore(max_connections)
+        self.connecting = asyncio.Lock()
+
+    async def connect(self) -> bool:
+        """Connect to the ProjFS service"""
+        # Concurrent first tool calls share one attempt
+        async with self.connecting:
+            if self.connected:
+                return True
+            try:
+                logger.info(f"Connecting to: {self.transport}")
+                await self.negotiate(*await self.open_connection())
+                logger.info("Successfully connected to ProjFS service")
+                self.connected = True
+            except (OSError, EOFError, asyncio.TimeoutError, ValueError) as e:
+                logger.error(f"Failed to connect to {self.transport}: {e}")
+                self.connected = False
+            return self.connected
+
+    async def negotiate(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Learn the service's capabilities; switch to pipelining if it offers it"""
+        try:
+            hello = await asyncio.wait_for(self.exchange(reader, writer, {'action': 'hello'}),
+                                           self.request_timeout)
+        except BaseException:
+            writer.close()
+            raise
+        # Older services: success false, "Unknown action: hello"
+        self.capabilities = (hello.get('data') or []) if hello.get('success') else []
+        if self.pipelining and 'pipelining' in self.capabilities:
+            window = self.max_in_flight
+            for capability in self.capabilities:
+                if capability.startswith('max_in_flight='):
+                    window = min(window, int(capability.split('=', 1)[1]))
+            self.channel = PipelinedConnection(reader, writer, window)
+            logger.info(f"Pipelining up to {window} commands")
+            return
+        self.idle.append((reader, writer))
+
+    def disconnect(self):
+        """Close the idle connections (busy ones close when their command ends)"""
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+        while self.idle:
+            _, writer = self.idle.pop()
+            try:
+                writer.close()
+            except Exception as e:
+                logger.error(f"Error closing pipe: {e}")
+        logger.info("Disconnected from ProjFS service")
+
+    async def send_command(self, command: dict, timeout: Optional[float] = None) -> Optional[dict]:
+        """Send a command to the ProjFS service and receive response
+
+        Returns None when the service cannot be reached or the exchange
+        fails, and a failed response when it does not answer within
+        timeout (default request_timeout) seconds.
+        """
+        timeout = timeout or self.request_timeout
+        if self.channel is not None and self.channel.closed:
+            # The service went away: negotiate again on a new connection
+            self.channel = None
+            self.connected = False
+        if not self.connected and not await self.connect():
+            return None
+        if self.channel is not None:
+            return await self.send_pipelined(self.channel, command, timeout)
+
+        async with self.slots:
+            # A pooled connection may have been closed by the service since
+            # its last use; that is retried once on a fresh connection
+            for reused in (bool(self.idle), False):
+                try:
+                    reader, writer = self.idle.pop() if reused else await self.open_connection()
+                except OSError as e:
+                    logger.error(f"Failed to connect to {self.transport}: {e}")
+                    self.connected = False
+                    return None
+                try:
+                    response = await asyncio.wait_for(self.exchange(reader, writer, command), timeout)
+                except asyncio.TimeoutError:
+                    writer.close()
+                    logger.error(f"Command {command.get('action')} timed out after {timeout}s")
+                    return {"success": False, "message": f"Timed out after {timeout}s", "data": []}
+                except asyncio.CancelledError:
+                    writer.close()
+                    logger.info(f"Command {command.get('action')} cancelled")
+                    raise
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    writer.close()
+                    if reused:
+                        continue
+                    logger.error(f"Error sending command: {e}")
+                    return None
+                except Exception as e:
+                    writer.close()
+                    logger.error(f"Error sending command: {e}")
+                    return None
+                self.idle.append((reader, writer))
+                return response
+
+    async def send_many(self, commands: Iterable[dict], batch_size: int = BATCH_SIZE,
+                        timeout: Optional[float] = None) -> List[Optional[dict]]:
+        """Send many commands, responses (as send_command) in the same order
+
+        commands may be a generator: it is consumed batch_size at a time and
+        every batch is in flight together (pipelined, or spread over the
+        pool with an older service), so memory stays bounded.
+        """
+        commands = iter(commands)
+        responses = []
+        while True:
+            batch = list(itertools.islice(commands, batch_size))
+            if not batch:
+                return responses
+            responses.extend(await asyncio.gather(*(self.send_command(command, timeout)
+                                                    for command in batch)))
+            logger.debug(f"Batch done: {len(responses)} commands sent")
+
+    async def upload_file(self, path: str, local_path: str, upload_id: Optional[str] = None,
+                          chunk_size: int = CHUNK_SIZE) -> Optional[dict]:
+        """Create path from a local file, read chunk_size bytes at a time"""
+        with open(local_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+
+            def read(offset):
+                f.seek(offset)
+                return f.read(min(chunk_size, size - offset))
+
+            async def chunk_at(offset):
+                return base64.b64encode(await asyncio.to_thread(read, offset)).decode('ascii')
+
+            return await self.upload(path, size, chunk_at, upload_id, chunk_size)
+
+    async def upload_base64(self, path: str, content_base64: str, upload_id: Optional[str] = None,
+                            chunk_size: int = CHUNK_SIZE) -> Optional[dict]:
+        """Create path from base64 content, sent in slices of the text itself"""
+        content_base64 = ''.join(content_base64.split())
+        if len(content_base64) % 4:
+            return {"success": False, "message": "Invalid base64 content length", "data": []}
+        size = len(content_base64) // 4 * 3 - (len(content_base64) - len(content_base64.rstrip('=')))
+
+        async def chunk_at(offset):
+            # Four characters per 3 bytes, so only whole groups can be sliced out
+            if offset % 3:
+                raise ValueError(f"Offset {offset} is not a multiple of 3")
+            start = offset // 3 * 4
+            return content_base64[start:start + chunk_size // 3 * 4]
+
+        return await self.upload(path, size, chunk_at, upload_id, chunk_size, alignment=3)
+
+    async def upload(self, path: str, size: int, chunk_at: Callable[[int], Awaitable[str]],
+                     upload_id: Optional[str] = None, chunk_size: int = CHUNK_SIZE,
+                     alignment: int = 1) -> Optional[dict]:
+        """Create a file of size bytes, chunk_at(offset) giving the base64 of the next chunk
+
+        A file that fits in one chunk is a single create_file. Larger ones
+        need a service with the "upload" capability. Lost connections are
+        retried from the offset the service reports; a failed upload's
+        response carries its id in data, to resume it later as upload_id.
+        chunk_at is only asked for multiples of alignment: an upload the
+        service reports elsewhere (resumed with other chunk sizes) is
+        aborted and started over.
+        """
+        if not self.connected and not await self.connect():
+            return None
+        if upload_id is None and size <= chunk_size:
+            return await self.send_command({
+                "action": "create_file",
+                "path": path,
+                "content": await chunk_at(0),
+                "isBase64": True
+            })
+        if 'upload' not in self.capabilities:
+            return {"success": False, "message": "The ProjFS service does not support chunked uploads "
+                                                 "(files over one chunk need a newer service)", "data": []}
+
+        if upload_id is None:
+            response = await self.send_command({"action": "upload_begin", "path": path})
+            if not response or not response.get("success"):
+                return response
+            upload_id = response["data"][0]
+            offset = 0
+        else:
+            offset = None
+
+        retries = 0
+        while True:
+            if offset is None:
+                # Where the service got to (after a reconnect, or when resuming)
+                command = {"action": "upload_status", "uploadId": upload_id}
+            elif offset < size:
+                command = {"action": "upload_append", "uploadId": upload_id, "offset": offset,
+                           "content": await chunk_at(offset), "isBase64": True}
+            else:
+                command = {"action": "upload_commit", "uploadId": upload_id, "offset": size}
+            response = await self.send_command(command)
+
+            if response is None or response.get("message", "").startswith("Timed out"):
+                # The chunk may or may not have arrived: ask, then carry on
+                retries += 1
+                if retries > UPLOAD_RETRIES:
+                    message = response.get("message") if response else "No response from service"
+                    return self.upload_failed(upload_id, message, offset, size)
+                logger.info(f"Upload {upload_id} interrupted, resuming (attempt {retries})")
+                await asyncio.sleep(0.5 * retries)
+                offset = None
+                continue
+            if not response.get("success"):
+                if not response.get("message", "").startswith("Offset mismatch") or retries >= UPLOAD_RETRIES:
+                    return self.upload_failed(upload_id, response.get("message", "Unknown error"), offset, size)
+                retries += 1
+            elif command["action"] == "upload_commit":
+                return response
+            elif command["action"] == "upload_append":
+                retries = 0
+
+            offset = int(response["data"][0])
+            if offset < size and offset % alignment:
+                response = await self.restart_upload(path, upload_id, offset)
+                if not response or not response.get("success"):
+                    return response
+                upload_id, offset = response["data"][0], 0
+            elif command["action"] == "upload_append":
+                logger.debug(f"Upload {upload_id}: {offset} of {size} bytes")
+
+    async def restart_upload(self, path: str, upload_id: str, offset: int) -> Optional[dict]:
+        """Abort upload_id and begin path again; the upload_begin response"""
+        logger.warning(f"Upload {upload_id} is at {offset}, which this upload cannot resume from; starting over")
+        await self.send_command({"action": "upload_abort", "uploadId": upload_id})
+        return await self.send_command({"action": "upload_begin", "path": path})
+
+    def upload_failed(self, upload_id: str, message: str, offset: Optional[int], size: int) -> dict:
+        at = f" at {offset} of {size} bytes" if offset is not None else ""
+        logger.error(f"Upload {upload_id} failed{at}: {message}")
+        return {"success": False, "message": f"{message} (upload {upload_id}{at}; pass its id to resume)",
+                "data": [upload_id]}
+
+    async def send_pipelined(self, channel: PipelinedConnection, command: dict,
+                             timeout: float) -> Optional[dict]:
+        async with channel.window:
+            try:
+                response = await asyncio.wait_for(channel.request(command), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Command {command.get('action')} timed out after {timeout}s")
+                return {"success": False, "message": f"Timed out after {timeout}s", "data": []}
+            except asyncio.CancelledError:
+                logger.info(f"Command {command.get('action')} cancelled")
+                raise
+            except (ConnectionError, ValueError) as e:
+                logger.error(f"Error sending command: {e}")
+                self.connected = False
+                return None
+        logger.debug(f"Received response: success={response.get('success')}")
+        return response
+
+    async def exchange(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                       command: dict) -> dict:
+        """One request/response round trip on a connection"""
+        writer.write(encode_message(command))
+        await writer.drain()
+        logger.debug(f"Sent command: {command['action']}")
+
+        # Replies are not capped (a large listing may exceed the request limit)
+        response = await read_message(reader, max_size=None)
+        logger.debug(f"Received response: success={response.get('success')}")
+        return response
@@ -6,13 +6,18 @@ An MCP server that provides AI agents with the ability to dynamically
 create and manage files in a Windows ProjFS virtual file system.
 
 This server connects to the ProjFS service via Named Pipes and exposes
-file system operations as MCP tools.
+file system operations as MCP tools. Pipe I/O is asynchronous (see
+projfs_client.py), so a slow service never stalls the MCP loop.
 
 Installation:
-    pip install mcp win32pipe win32file pywintypes
+    pip install mcp
 
 Usage:
     python projfs_mcp_server.py
+    python projfs_mcp_server.py --endpoint unix:/tmp/ProjFS_MCP_Pipe.sock
+
+The endpoint defaults to $PROJFS_ENDPOINT, else the service's Named Pipe on
+Windows (a Unix socket elsewhere, see reference_service.py).
 
 Add to Claude Desktop config.json:
     {
@@ -25,26 +30,24 @@ Add to Claude Desktop config.json:
     }
 """
 
+import argparse
+import base64
 import json
-import struct
+import os
 import sys
 import asyncio
-from typing import Any, Optional
+import time
+from typing import Any
 import logging
 
-try:
-    import win32pipe
-    import win32file
-    import pywintypes
-except ImportError:
-    print("Error: win32pipe module not found. Install with: pip install pywin32", file=sys.stderr)
-    sys.exit(1)
-
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
 from mcp import types
 
+from projfs_client import ProjFSClient
+from transports import MAX_MESSAGE, encode_message
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -56,97 +59,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger('projfs-mcp')
 
-# Configuration
-PIPE_NAME = r'\\.\pipe\ProjFS_MCP_Pipe'
-PIPE_TIMEOUT = 5000  # 5 seconds
+# Initialize MCP server
+server = Server("projfs-filesystem")
+projfs_client = ProjFSClient()
 
+# Items listed one by one in a create_virtual_tree report (failures beyond are counted)
+REPORT_LIMIT = 100
 
-class ProjFSClient:
-    """Client for communicating with the ProjFS service via Named Pipe"""
-    
-    def __init__(self, pipe_name: str = PIPE_NAME):
-        self.pipe_name = pipe_name
-        self.pipe_handle = None
-        
-    def connect(self) -> bool:
-        """Connect to the ProjFS service named pipe"""
-        try:
-            logger.info(f"Connecting to pipe: {self.pipe_name}")
-            
-            # Wait for pipe to be available
-            win32pipe.WaitNamedPipe(self.pipe_name, PIPE_TIMEOUT)
-            
-            # Open the pipe
-            self.pipe_handle = win32file.CreateFile(
-                self.pipe_name,
-                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
-                0,
-                None,
-                win32file.OPEN_EXISTING,
-                0,
-                None
-            )
-            
-            logger.info("Successfully connected to ProjFS service")
-            return True
-            
-        except pywintypes.error as e:
-            logger.error(f"Failed to connect to pipe: {e}")
-            return False
-    
-    def disconnect(self):
-        """Disconnect from the named pipe"""
-        if self.pipe_handle:
-            try:
-                win32file.CloseHandle(self.pipe_handle)
-                logger.info("Disconnected from ProjFS service")
-            except Exception as e:
-                logger.error(f"Error closing pipe: {e}")
-            finally:
-                self.pipe_handle = None
-    
-    def send_command(self, command: dict) -> Optional[dict]:
-        """Send a command to the ProjFS service and receive response"""
-        if not self.pipe_handle:
-            logger.error("Not connected to pipe")
-            return None
-        
-        try:
-            # Serialize command to JSON
-            json_data = json.dumps(command)
-            message_bytes = json_data.encode('utf-8')
-            
-            # Send length prefix (4 bytes, little-endian)
-            length_bytes = struct.pack('<I', len(message_bytes))
-            win32file.WriteFile(self.pipe_handle, length_bytes)
-            
-            # Send message
-            win32file.WriteFile(self.pipe_handle, message_bytes)
-            
-            logger.debug(f"Sent command: {command['action']}")
-            
-            # Read length prefix from response
-            result, length_bytes = win32file.ReadFile(self.pipe_handle, 4)
-            message_length = struct.unpack('<I', length_bytes)[0]
-            
-            # Read response message
-            result, response_bytes = win32file.ReadFile(self.pipe_handle, message_length)
-            response_json = response_bytes.decode('utf-8')
-            
-            # Parse response
-            response = json.loads(response_json)
-            logger.debug(f"Received response: success={response.get('success')}")
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Error sending command: {e}")
-            return None
 
+def tree_items(manifest: dict) -> list[dict]:
+    """Items of a create_virtual_tree manifest: kind, path and command, or error"""
+    root = (manifest.get("root") or "").rstrip("\\/")
 
-# Initialize MCP server
-server = Server("projfs-filesystem")
-projfs_client = ProjFSClient()
+    def join(path: str) -> str:
+        return root + "\\" + path.lstrip("\\/") if root else path
+
+    items = []
+    for index, path in enumerate(manifest.get("directories") or []):
+        if not isinstance(path, str) or not path.strip("\\/"):
+            items.append({"kind": "directory", "path": f"directories[{index}]", "error": "Invalid directory path"})
+            continue
+        items.append({"kind": "directory", "path": join(path), "command": {
+            "action": "create_directory",
+            "path": join(path),
+            "content": "",
+            "isBase64": False
+        }})
+    for index, entry in enumerate(manifest.get("files") or []):
+        path = entry.get("path") if isinstance(entry, dict) else None
+        if not isinstance(path, str) or not path.strip("\\/"):
+            items.append({"kind": "file", "path": f"files[{index}]", "error": "File entry needs a path"})
+        elif "content" in entry and "content_base64" in entry:
+            items.append({"kind": "file", "path": join(path),
+                          "error": "Give content or content_base64, not both"})
+        else:
+            is_base64 = "content_base64" in entry
+            command = {
+                "action": "create_file",
+                "path": join(path),
+                "content": entry.get("content_base64" if is_base64 else "content") or "",
+                "isBase64": is_base64
+            }
+            # JSON escaping can grow text up to 6x: only long content may not fit
+            large = len(command["content"]) > MAX_MESSAGE // 8 and len(encode_message(command)) > MAX_MESSAGE
+            items.append({"kind": "file", "path": join(path), "command": command, "large": large})
+    return items
+
+
+def tree_report(items: list[dict], elapsed: float) -> str:
+    failed = [item for item in items if item.get("error")]
+    directories = sum(1 for item in items if item["kind"] == "directory" and not item.get("error"))
+    files = sum(1 for item in items if item["kind"] == "file" and not item.get("error"))
+    lines = [f"{'✗' if failed else '✓'} Created {directories} director(ies) and {files} file(s) "
+             f"in {elapsed:.2f}s" + (f", {len(failed)} failed" if failed else "")]
+    # Small trees get every item, large ones their failures
+    shown = items if len(items) <= REPORT_LIMIT else failed[:REPORT_LIMIT]
+    for item in shown:
+        if item.get("error"):
+            lines.append(f"  ✗ {item['path']}: {item['error']}")
+        else:
+            lines.append(f"  ✓ {item['path']}")
+    if len(items) > REPORT_LIMIT and len(failed) > REPORT_LIMIT:
+        lines.append(f"  ... and {len(failed) - REPORT_LIMIT} more failure(s)")
+    return "\n".join(lines)
 
 
 @server.list_tools()
@@ -197,6 +172,32 @@ The content should be base64-encoded.""",
                 "required": ["path", "content_base64"]
             }
         ),
+        types.Tool(
+            name="upload_virtual_file",
+            description="""Create a file in the virtual ProjFS file system from a local file.
+            
+Use this for large binary decoys (Office documents, PDFs, archives of several MB): the file is read
+from the machine running this MCP server and sent in chunks, so it is never passed through the
+conversation. If an upload fails part way, call again with the upload_id from the error to resume.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {
+                        "type": "string",
+                        "description": "Virtual path for the file"
+                    },
+                    "local_path": {
+                        "type": "string",
+                        "description": "Path of the local file to upload"
+                    },
+                    "upload_id": {
+                        "type": "string",
+                        "description": "Id of an interrupted upload to resume"
+                    }
+                },
+                "required": ["path", "local_path"]
+            }
+        ),
         types.Tool(
             name="delete_virtual_file",
             description="""Delete a file from the virtual ProjFS file system.
@@ -279,6 +280,48 @@ Creates all necessary parent directories. Use this before creating files in nest
                 },
                 "required": ["path"]
             }
+        ),
+        types.Tool(
+            name="create_virtual_tree",
+            description="""Create many directories and files in the virtual file system in one call.
+            
+Use this instead of repeated create_virtual_directory / create_virtual_file calls when planting
+more than a few items (thousands are fine). Parent directories are created automatically.
+Each file takes either text 'content' or 'content_base64'. Reports which items failed.
+
+For very large trees, write the manifest to a JSON file with the same fields and pass manifest_file.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "root": {
+                        "type": "string",
+                        "description": "Virtual path prefixed to every item (e.g., '\\Documents\\Finance')"
+                    },
+                    "directories": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Directory paths to create, including empty ones"
+                    },
+                    "files": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "path": {"type": "string"},
+                                "content": {"type": "string", "description": "Text content"},
+                                "content_base64": {"type": "string", "description": "Base64-encoded binary content"}
+                            },
+                            "required": ["path"]
+                        },
+                        "description": "Files to create"
+                    },
+                    "manifest_file": {
+                        "type": "string",
+                        "description": "Local JSON file with root, directories and files (used instead of the arguments)"
+                    }
+                },
+                "required": []
+            }
         )
     ]
 
@@ -293,8 +336,8 @@ async def handle_call_tool(
         arguments = {}
     
     # Ensure connection to ProjFS service
-    if not projfs_client.pipe_handle:
-        if not projfs_client.connect():
+    if not projfs_client.connected:
+        if not await projfs_client.connect():
             return [types.TextContent(
                 type="text",
                 text="Error: Cannot connect to ProjFS service. Ensure the service is running."
@@ -305,7 +348,7 @@ async def handle_call_tool(
             path = arguments.get("path", "")
             content = arguments.get("content", "")
             
-            response = projfs_client.send_command({
+            response = await projfs_client.send_command({
                 "action": "create_file",
                 "path": path,
                 "content": content,
@@ -328,12 +371,8 @@ async def handle_call_tool(
             path = arguments.get("path", "")
             content_base64 = arguments.get("content_base64", "")
             
-            response = projfs_client.send_command({
-                "action": "create_file",
-                "path": path,
-                "content": content_base64,
-                "isBase64": True
-            })
+            # Content over one message goes as a chunked upload
+            response = await projfs_client.upload_base64(path, content_base64)
             
             if response and response.get("success"):
                 return [types.TextContent(
@@ -347,10 +386,35 @@ async def handle_call_tool(
                     text=f"✗ Failed to create binary file: {error_msg}"
                 )]
         
+        elif name == "upload_virtual_file":
+            path = arguments.get("path", "")
+            local_path = arguments.get("local_path", "")
+            
+            try:
+                size = os.path.getsize(local_path)
+                response = await projfs_client.upload_file(path, local_path, arguments.get("upload_id"))
+            except OSError as e:
+                return [types.TextContent(
+                    type="text",
+                    text=f"✗ Cannot read {local_path}: {e}"
+                )]
+            
+            if response and response.get("success"):
+                return [types.TextContent(
+                    type="text",
+                    text=f"✓ Uploaded virtual file: {path} ({size} bytes)"
+                )]
+            else:
+                error_msg = response.get("message", "Unknown error") if response else "No response from service"
+                return [types.TextContent(
+                    type="text",
+                    text=f"✗ Failed to upload file: {error_msg}"
+                )]
+        
         elif name == "delete_virtual_file":
             path = arguments.get("path", "")
             
-            response = projfs_client.send_command({
+            response = await projfs_client.send_command({
                 "action": "delete_file",
                 "path": path,
                 "content": "",
@@ -372,7 +436,7 @@ async def handle_call_tool(
         elif name == "list_virtual_files":
             path = arguments.get("path", "\\")
             
-            response = projfs_client.send_command({
+            response = await projfs_client.send_command({
                 "action": "list_files",
                 "path": path,
                 "content": "",
@@ -402,7 +466,7 @@ async def handle_call_tool(
         elif name == "list_virtual_directories":
             path = arguments.get("path", "\\")
             
-            response = projfs_client.send_command({
+            response = await projfs_client.send_command({
                 "action": "list_directories",
                 "path": path,
                 "content": "",
@@ -432,7 +496,7 @@ async def handle_call_tool(
         elif name == "list_all_virtual_items":
             path = arguments.get("path", "\\")
             
-            response = projfs_client.send_command({
+            response = await projfs_client.send_command({
                 "action": "list_all",
                 "path": path,
                 "content": "",
@@ -462,7 +526,7 @@ async def handle_call_tool(
         elif name == "create_virtual_directory":
             path = arguments.get("path", "")
             
-            response = projfs_client.send_command({
+            response = await projfs_client.send_command({
                 "action": "create_directory",
                 "path": path,
                 "content": "",
@@ -481,6 +545,49 @@ async def handle_call_tool(
                     text=f"✗ Failed to create directory: {error_msg}"
                 )]
         
+        elif name == "create_virtual_tree":
+            manifest = arguments
+            if arguments.get("manifest_file"):
+                try:
+                    with open(arguments["manifest_file"], encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError) as e:
+                    return [types.TextContent(
+                        type="text",
+                        text=f"✗ Failed to read manifest: {e}"
+                    )]
+            
+            items = tree_items(manifest)
+            if not items:
+                return [types.TextContent(
+                    type="text",
+                    text="✗ Manifest has no directories or files"
+                )]
+            
+            start = time.perf_counter()
+            # Directories first, so empty ones are there before their files
+            for kind in ("directory", "file"):
+                batch = [item for item in items if item["kind"] == kind and "command" in item
+                         and not item.get("large")]
+                responses = await projfs_client.send_many(item.pop("command") for item in batch)
+                for item, response in zip(batch, responses):
+                    if not response or not response.get("success"):
+                        item["error"] = response.get("message", "Unknown error") if response else "No response from service"
+            # Files over one message, one chunked upload each
+            for item in items:
+                if item.get("large"):
+                    command = item.pop("command")
+                    content = command["content"] if command["isBase64"] else \
+                        base64.b64encode(command["content"].encode("utf-8")).decode("ascii")
+                    response = await projfs_client.upload_base64(item["path"], content)
+                    if not response or not response.get("success"):
+                        item["error"] = response.get("message", "Unknown error") if response else "No response from service"
+            
+            return [types.TextContent(
+                type="text",
+                text=tree_report(items, time.perf_counter() - start)
+            )]
+        
         else:
             return [types.TextContent(
                 type="text",
@@ -500,7 +607,7 @@ async def main():
     logger.info("Starting ProjFS MCP Server...")
     
     # Connect to ProjFS service
-    if not projfs_client.connect():
+    if not await projfs_client.connect():
         logger.error("Failed to connect to ProjFS service")
         logger.error("Make sure the ProjFS service is running with MCP enabled")
         return
@@ -526,6 +633,12 @@ async def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ProjFS MCP Server')
+    parser.add_argument('--endpoint', help='pipe:NAME, unix:PATH or tcp:HOST:PORT of the ProjFS service')
+    args = parser.parse_args()
+    if args.endpoint:
+        projfs_client = ProjFSClient(args.endpoint)
+    
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
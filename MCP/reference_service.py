@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Reference ProjFS MCP service
+
+A stand-in for the MCP side of ProjFS-Service-MCP.exe: the same
+length-prefixed JSON protocol and the same actions (create_file,
+delete_file, list_files, list_directories, list_all, create_directory,
+hello, upload_*), with the same path handling, pipelining and response
+messages, kept in memory. Nothing is projected to disk and no DNS alerts
+are sent. It lets the MCP server, test_mcp.py, diagnose_pipe.py and
+benchmark.py run on Linux or macOS:
+
+    python3 reference_service.py                        # default endpoint
+    python3 reference_service.py --endpoint tcp:127.0.0.1:9170
+    PROJFS_ENDPOINT=tcp:127.0.0.1:9170 python3 test_mcp.py --yes
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import logging
+import threading
+import time
+import uuid
+
+from transports import encode_message, parse_endpoint, read_message
+
+logger = logging.getLogger('projfs-reference')
+
+# Commands one pipelined client may have in progress, as MaxInFlightPerClient
+MAX_IN_FLIGHT = 32
+# Chunked uploads, as UploadIdleMinutes, MaxUploadBytes and MaxOpenUploads
+UPLOAD_IDLE = 30 * 60
+MAX_UPLOAD = 256 * 1024 * 1024
+MAX_UPLOADS = 64
+
+
+def normalize_path(path):
+    """Single leading backslash, like NormalizePath in the service ('/' is accepted too)"""
+    path = (path or '').replace('/', '\\').lstrip('\\')
+    return '\\' + path
+
+
+def split_path(path):
+    parent, _, name = path.rpartition('\\')
+    return parent or '\\', name
+
+
+class Upload:
+    """A chunked upload in progress (PendingUpload)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = bytearray()
+        self.last_used = time.monotonic()
+        # Kept after commit so a client that missed the response can ask again
+        self.committed = False
+        self.size = 0
+        self.lock = threading.Lock()
+
+
+class VirtualTree:
+    """In-memory fileSystem / fileContents of the service"""
+
+    def __init__(self):
+        # Directory path -> {lower-case name: (name, is_directory)}. Like the
+        # service, directory keys are exact and names are case-insensitive
+        self.entries = {'\\': {}}
+        # Lower-case file path -> content
+        self.contents = {}
+        self.lock = threading.Lock()
+        # Upload id -> Upload; they outlive connections so clients can resume
+        self.uploads = {}
+
+    def ensure_directory(self, path):
+        current = '\\'
+        for part in [p for p in path.split('\\') if p]:
+            parent = current
+            current = '\\' + part if current == '\\' else current + '\\' + part
+            entries = self.entries.setdefault(parent, {})
+            existing = entries.get(part.lower())
+            if existing is None or not existing[1]:
+                entries[part.lower()] = (part, True)
+
+    def save_file(self, path, content):
+        parent, name = split_path(path)
+        with self.lock:
+            self.ensure_directory(parent)
+            entries = self.entries.setdefault(parent, {})
+            existing = entries.get(name.lower())
+            entries[name.lower()] = (existing[0] if existing else name, False)
+            self.contents[path.lower()] = content
+        return True
+
+    def delete_file(self, path):
+        parent, name = split_path(path)
+        with self.lock:
+            entries = self.entries.get(parent)
+            entry = entries.get(name.lower()) if entries else None
+            if entry is None or entry[1]:
+                return False
+            del entries[name.lower()]
+            self.contents.pop(path.lower(), None)
+        return True
+
+    def list(self, path, directories):
+        with self.lock:
+            entries = self.entries.get(path, {})
+            return [name for name, is_dir in entries.values() if is_dir == directories]
+
+    def process_upload(self, action, command, path, response):
+        """upload_* actions, as ProcessUploadCommand"""
+        with self.lock:
+            expired = time.monotonic() - UPLOAD_IDLE
+            for stale in [key for key, upload in self.uploads.items() if upload.last_used < expired]:
+                del self.uploads[stale]
+
+            if action == 'upload_begin':
+                if not path:
+                    response['message'] = "Upload needs a path"
+                    return
+                if sum(not upload.committed for upload in self.uploads.values()) >= MAX_UPLOADS:
+                    response['message'] = f"Too many uploads in progress ({MAX_UPLOADS}); commit or abort one first"
+                    return
+                upload_id = uuid.uuid4().hex
+                self.uploads[upload_id] = Upload(path)
+                response['data'].append(upload_id)
+                response['success'] = True
+                response['message'] = "Upload started"
+                return
+
+            upload = self.uploads.get(command.get('uploadId'))
+            if upload is None:
+                response['message'] = "Unknown upload: " + str(command.get('uploadId') or '')
+                return
+            if action == 'upload_abort':
+                del self.uploads[command.get('uploadId')]
+                response['success'] = True
+                response['message'] = "Upload aborted"
+                return
+
+        with upload.lock:
+            upload.last_used = time.monotonic()
+            if upload.committed:
+                response['data'].append(str(upload.size))
+                response['success'] = action != 'upload_append'
+                response['message'] = {'upload_commit': "File created successfully",
+                                       'upload_status': "Upload committed"}.get(action, "Upload already committed")
+                return
+
+            received = len(upload.data)
+            if action == 'upload_status':
+                response['data'].append(str(received))
+                response['success'] = True
+                response['message'] = "Upload in progress"
+                return
+            if command.get('offset') != received:
+                response['data'].append(str(received))
+                response['message'] = f"Offset mismatch: expected {received}"
+                return
+
+            if action == 'upload_append':
+                if command.get('isBase64'):
+                    chunk = base64.b64decode(command.get('content') or '', validate=True)
+                else:
+                    chunk = (command.get('content') or '').encode('utf-8')
+                if received + len(chunk) > MAX_UPLOAD:
+                    response['message'] = f"Upload exceeds {MAX_UPLOAD} bytes"
+                    return
+                upload.data += chunk
+                response['data'].append(str(len(upload.data)))
+                response['success'] = True
+                response['message'] = "Chunk stored"
+                return
+
+            # upload_commit: offset is the total size
+            response['success'] = self.save_file(upload.path, bytes(upload.data))
+            response['message'] = "File created successfully" if response['success'] else "Failed to create file"
+            if response['success']:
+                upload.committed = True
+                upload.size = len(upload.data)
+                upload.data = None
+
+    def process(self, command):
+        """Response for one command, as ProcessMCPCommand builds it"""
+        response = {'success': False, 'message': '', 'data': [], 'id': command.get('id')}
+        try:
+            action = command.get('action')
+            path = command.get('path')
+            if path:
+                path = normalize_path(path)
+
+            if action == 'create_file':
+                if command.get('isBase64'):
+                    content = base64.b64decode(command.get('content') or '', validate=True)
+                else:
+                    content = (command.get('content') or '').encode('utf-8')
+                response['success'] = self.save_file(path, content)
+                response['message'] = ("File created successfully" if response['success']
+                                       else "Failed to create file")
+            elif action == 'delete_file':
+                response['success'] = self.delete_file(path)
+                response['message'] = ("File deleted successfully" if response['success']
+                                       else "Failed to delete file")
+            elif action == 'list_files':
+                response['data'] = self.list(path or '\\', False)
+                response['success'] = True
+                response['message'] = "Files listed successfully"
+            elif action == 'list_directories':
+                response['data'] = self.list(path or '\\', True)
+                response['success'] = True
+                response['message'] = "Directories listed successfully"
+            elif action == 'list_all':
+                response['data'] = (['[DIR] ' + d for d in self.list(path or '\\', True)]
+                                    + self.list(path or '\\', False))
+                response['success'] = True
+                response['message'] = "All items listed successfully"
+            elif action == 'create_directory':
+                with self.lock:
+                    self.ensure_directory(path or '\\')
+                response['success'] = True
+                response['message'] = "Directory created successfully"
+            elif action == 'hello':
+                response['data'] = ['pipelining', f'max_in_flight={MAX_IN_FLIGHT}', 'upload']
+                response['success'] = True
+                response['message'] = "Protocol extensions available"
+            elif action in ('upload_begin', 'upload_append', 'upload_status', 'upload_commit', 'upload_abort'):
+                self.process_upload(action, command, path, response)
+            else:
+                response['message'] = "Unknown action: " + str(action)
+        except (binascii.Error, AttributeError, TypeError, ValueError) as e:
+            response['success'] = False
+            response['message'] = "Error: " + str(e)
+        return response
+
+
+class ReferenceService:
+    """Serves a VirtualTree on a transport, each client handled concurrently"""
+
+    def __init__(self, endpoint=None, tree=None):
+        self.transport = parse_endpoint(endpoint)
+        self.tree = tree or VirtualTree()
+        self.server = None
+
+    async def respond(self, command):
+        """Hook for subclasses (benchmarks add latency here)"""
+        return self.tree.process(command)
+
+    async def reply(self, command, writer, window):
+        try:
+            writer.write(encode_message(await self.respond(command)))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            window.release()
+
+    async def handle_client(self, reader, writer):
+        # In order until "hello"; after it, commands with an id run
+        # concurrently and are answered as they complete
+        pipelined = False
+        window = asyncio.Semaphore(MAX_IN_FLIGHT)
+        running = set()
+        try:
+            while True:
+                try:
+                    command = await read_message(reader)
+                except ValueError as e:
+                    # Bad length or body: the service drops the connection
+                    logger.debug(f"Dropping client: {e}")
+                    break
+                logger.debug(f"MCP Request: {command}")
+                if pipelined and command.get('id') is not None:
+                    await window.acquire()
+                    task = asyncio.ensure_future(self.reply(command, writer, window))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    continue
+                response = await self.respond(command)
+                writer.write(encode_message(response))
+                await writer.drain()
+                if command.get('action') == 'hello' and response['success']:
+                    pipelined = True
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if running:
+                await asyncio.wait(running)
+            writer.close()
+
+    async def start(self):
+        self.server = await self.transport.serve(self.handle_client)
+        logger.info(f"Reference service listening on {self.transport}")
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.close()
+
+
+def run_in_thread(service):
+    """Start service on an event loop of its own; returns the loop"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(service.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name='projfs-reference', daemon=True).start()
+    ready.wait()
+    return loop
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-memory stand-in for the ProjFS MCP service')
+    parser.add_argument('--endpoint', help='pipe:NAME, unix:PATH or tcp:HOST:PORT '
+                                           '(default: $PROJFS_ENDPOINT or the platform default)')
+    parser.add_argument('--debug', action='store_true', help='Log every command')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(ReferenceService(args.endpoint).serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -3,7 +3,8 @@
 Test script for ProjFS MCP integration
 
 This script tests the connection between the MCP server and ProjFS service
-by sending sample commands through the named pipe.
+by sending sample commands through the named pipe (or the Unix socket / TCP
+endpoint of reference_service.py).
 
 Tests path normalization (v1.3.2 fix):
 - Sends paths with double backslashes (\\TestMCP)
@@ -12,62 +13,40 @@ Tests path normalization (v1.3.2 fix):
 
 Usage:
     python test_mcp.py
+    python3 test_mcp.py --endpoint unix:/tmp/ProjFS_MCP_Pipe.sock --yes
 """
 
-import json
-import struct
+import argparse
 import sys
 import time
 
-try:
-    import win32pipe
-    import win32file
-    import pywintypes
-except ImportError:
-    print("Error: pywin32 not installed. Run: pip install pywin32")
-    sys.exit(1)
+from transports import ConnectError, parse_endpoint
 
-PIPE_NAME = r'\\.\pipe\ProjFS_MCP_Pipe'
-PIPE_TIMEOUT = 10000  # 10 seconds
+CONNECT_TIMEOUT = 10  # seconds
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
 
 
-def connect_to_pipe(retries=MAX_RETRIES):
-    """Connect to the named pipe with retry logic"""
+def connect_to_pipe(transport, retries=MAX_RETRIES):
+    """Connect to the service endpoint with retry logic"""
     for attempt in range(retries):
         try:
             print("  Attempt " + str(attempt + 1) + "/" + str(retries) + "...")
             
-            # Wait for pipe to be available
-            win32pipe.WaitNamedPipe(PIPE_NAME, PIPE_TIMEOUT)
-            
-            # Open the pipe
-            pipe = win32file.CreateFile(
-                PIPE_NAME,
-                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
-                0,
-                None,
-                win32file.OPEN_EXISTING,
-                0,
-                None
-            )
+            connection = transport.connect(CONNECT_TIMEOUT)
             
             print("  ✓ Connected!")
-            return pipe
-            
-        except pywintypes.error as e:
-            error_code = e.args[0]
-            error_msg = e.args[2] if len(e.args) > 2 else str(e)
+            return connection
             
-            if error_code == 121:  # ERROR_SEM_TIMEOUT
+        except ConnectError as e:
+            if e.reason == 'timeout':
                 print("  ✗ Timeout - pipe not available")
-            elif error_code == 2:  # ERROR_FILE_NOT_FOUND
+            elif e.reason == 'missing':
                 print("  ✗ Pipe does not exist")
-            elif error_code == 231:  # ERROR_PIPE_BUSY
+            elif e.reason == 'busy':
                 print("  ✗ Pipe is busy")
             else:
-                print("  ✗ Error " + str(error_code) + ": " + error_msg)
+                print("  ✗ " + str(e))
             
             if attempt < retries - 1:
                 print("  Waiting " + str(RETRY_DELAY) + " seconds before retry...")
@@ -78,33 +57,20 @@ def connect_to_pipe(retries=MAX_RETRIES):
     return None
 
 
-def send_command(pipe_handle, command):
+def send_command(connection, command):
     """Send a command and receive response"""
-    json_data = json.dumps(command)
-    message_bytes = json_data.encode('utf-8')
-    
-    # Send length + message
-    length_bytes = struct.pack('<I', len(message_bytes))
-    win32file.WriteFile(pipe_handle, length_bytes)
-    win32file.WriteFile(pipe_handle, message_bytes)
-    
-    # Read response
-    result, length_bytes = win32file.ReadFile(pipe_handle, 4)
-    message_length = struct.unpack('<I', length_bytes)[0]
-    result, response_bytes = win32file.ReadFile(pipe_handle, message_length)
-    
-    return json.loads(response_bytes.decode('utf-8'))
+    return connection.send_command(command)
 
 
-def test_connection():
+def test_connection(transport):
     """Test connection to ProjFS service"""
     print("=" * 60)
     print("ProjFS MCP Connection Test")
     print("=" * 60)
     
     try:
-        print("\n[1/6] Connecting to pipe: " + PIPE_NAME)
-        pipe = connect_to_pipe()
+        print("\n[1/6] Connecting to pipe: " + str(transport))
+        pipe = connect_to_pipe(transport)
         
         if pipe is None:
             return False
@@ -200,7 +166,7 @@ def test_connection():
         else:
             print("✗ Test failed:", response.get("message"))
         
-        win32file.CloseHandle(pipe)
+        pipe.close()
         
         print("\n" + "=" * 60)
         print("All tests completed!")
@@ -211,14 +177,11 @@ def test_connection():
         print("3. Configure Claude Desktop with the MCP server")
         print("4. Test MCP tools with Claude")
         
-    except pywintypes.error as e:
-        error_code = e.args[0] if len(e.args) > 0 else 0
-        error_msg = e.args[2] if len(e.args) > 2 else str(e)
-        
-        print("\n✗ Connection failed: Error " + str(error_code) + " - " + error_msg)
+    except ConnectError as e:
+        print("\n✗ Connection failed: " + str(e))
         print("\nTroubleshooting:")
         
-        if error_code == 121:  # ERROR_SEM_TIMEOUT
+        if e.reason == 'timeout':
             print("\nThe pipe exists but is not responding (timeout).")
             print("Possible causes:")
             print("  1. The MCP server thread may have crashed")
@@ -229,13 +192,13 @@ def test_connection():
             print("  2. Check the service console for error messages")
             print("  3. Make sure no other process is connected to the pipe")
             print("  4. Try running this test again (the timing may align better)")
-        elif error_code == 2:  # ERROR_FILE_NOT_FOUND
+        elif e.reason == 'missing':
             print("\nThe named pipe does not exist.")
             print("Solutions:")
             print("  1. Make sure ProjFS-Service-MCP is running")
             print("  2. Check if EnableMCPServer=true in App.config")
             print("  3. Verify MCPPipeName matches in both configs")
-        elif error_code == 231:  # ERROR_PIPE_BUSY
+        elif e.reason == 'busy':
             print("\nThe pipe is busy with another connection.")
             print("Solutions:")
             print("  1. Wait a moment and try again")
@@ -247,6 +210,7 @@ def test_connection():
             print("  3. Verify MCPPipeName matches in both configs")
             print("  4. Try running the service in console mode:")
             print("     ProjFS-Service-MCP.exe /console")
+            print("  5. On Linux/macOS, start reference_service.py with the same endpoint")
         
         return False
     
@@ -260,13 +224,20 @@ def test_connection():
 
 
 if __name__ == "__main__":
-    print("\nMake sure the ProjFS service is running before testing!")
-    print("Press Enter to continue or Ctrl+C to cancel...")
-    try:
-        input()
-    except KeyboardInterrupt:
-        print("\nTest cancelled")
-        sys.exit(0)
+    parser = argparse.ArgumentParser(description='Test the ProjFS MCP service connection')
+    parser.add_argument('--endpoint', help='pipe:NAME, unix:PATH or tcp:HOST:PORT (default: $PROJFS_ENDPOINT '
+                                           'or the service pipe)')
+    parser.add_argument('-y', '--yes', action='store_true', help='Do not wait for Enter before testing')
+    args = parser.parse_args()
+    
+    if not args.yes:
+        print("\nMake sure the ProjFS service is running before testing!")
+        print("Press Enter to continue or Ctrl+C to cancel...")
+        try:
+            input()
+        except KeyboardInterrupt:
+            print("\nTest cancelled")
+            sys.exit(0)
     
-    success = test_connection()
+    success = test_connection(parse_endpoint(args.endpoint))
     sys.exit(0 if success else 1)
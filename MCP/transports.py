@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Transports for the ProjFS MCP protocol
+
+The service protocol is the same on every transport: a 4-byte
+little-endian length followed by a UTF-8 JSON command, answered the same
+way. Endpoints are written as
+
+    pipe:ProjFS_MCP_Pipe        Windows Named Pipe (also \\\\.\\pipe\\ProjFS_MCP_Pipe)
+    unix:/tmp/projfs.sock       Unix domain socket
+    tcp:127.0.0.1:9170          TCP, meant for loopback only
+
+The default is the service's Named Pipe on Windows and a Unix socket
+elsewhere, overridden by the PROJFS_ENDPOINT environment variable. Every
+transport offers an asyncio connection (open), a blocking one for the
+test scripts (connect) and a server side (serve) for reference_service.py.
+"""
+
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+
+PIPE_NAME = r'\\.\pipe\ProjFS_MCP_Pipe'
+PIPE_TIMEOUT = 5000  # 5 seconds
+MAX_MESSAGE = 1048576  # 1MB, as in HandleMCPClient
+
+# Windows errors while every pipe instance is taken or being recreated
+ERROR_FILE_NOT_FOUND = 2
+ERROR_SEM_TIMEOUT = 121
+ERROR_PIPE_BUSY = 231
+
+if sys.platform == 'win32':
+    DEFAULT_ENDPOINT = 'pipe:ProjFS_MCP_Pipe'
+else:
+    DEFAULT_ENDPOINT = 'unix:' + os.path.join(tempfile.gettempdir(), 'ProjFS_MCP_Pipe.sock')
+
+
+class ConnectError(OSError):
+    """Connecting failed; reason is 'missing', 'busy', 'timeout' or 'error'"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def encode_message(message: dict) -> bytes:
+    body = json.dumps(message).encode('utf-8')
+    return struct.pack('<I', len(body)) + body
+
+
+def decode_length(header: bytes, max_size=MAX_MESSAGE) -> int:
+    """Length from a message header; max_size None accepts any (replies are not capped)"""
+    length = struct.unpack('<I', header)[0]
+    if length == 0 or (max_size is not None and length > max_size):
+        raise ValueError("Invalid message length: " + str(length))
+    return length
+
+
+async def read_message(reader: asyncio.StreamReader, max_size=MAX_MESSAGE) -> dict:
+    """Next message from reader; IncompleteReadError once the peer is gone"""
+    length = decode_length(await reader.readexactly(4), max_size)
+    return json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+
+class SyncConnection:
+    """Blocking connection for scripts: send_command() is one round trip"""
+
+    def __init__(self, send, recv, close):
+        self._send = send
+        self._recv = recv
+        self._close = close
+
+    def recv_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by the service")
+            data += chunk
+        return data
+
+    def send_command(self, command: dict) -> dict:
+        self._send(encode_message(command))
+        length = decode_length(self.recv_exactly(4), None)
+        return json.loads(self.recv_exactly(length).decode('utf-8'))
+
+    def close(self):
+        self._close()
+
+
+class PipeTransport:
+    """Windows Named Pipe, the transport of ProjFS-Service-MCP"""
+
+    def __init__(self, name: str):
+        self.address = name if name.startswith('\\\\') else '\\\\.\\pipe\\' + name
+
+    def __str__(self):
+        return 'pipe:' + self.address
+
+    async def open(self):
+        """Open one pipe instance, waiting up to PIPE_TIMEOUT for a free one"""
+        loop = asyncio.get_running_loop()
+        if not hasattr(loop, 'create_pipe_connection'):
+            raise ConnectError('error', "Named pipes need the Windows proactor event loop "
+                                        f"(platform: {sys.platform}); use a unix: or tcp: endpoint")
+        deadline = loop.time() + PIPE_TIMEOUT / 1000
+        while True:
+            reader = asyncio.StreamReader()
+            protocol = asyncio.StreamReaderProtocol(reader)
+            try:
+                transport, _ = await loop.create_pipe_connection(lambda: protocol, self.address)
+            except OSError as e:
+                # Same wait as WaitNamedPipe, without holding up the event loop
+                if getattr(e, 'winerror', None) not in (ERROR_FILE_NOT_FOUND, ERROR_PIPE_BUSY) \
+                        or loop.time() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+                continue
+            return reader, asyncio.StreamWriter(transport, protocol, reader, loop)
+
+    def _win32(self):
+        try:
+            import win32file
+            import win32pipe
+            import pywintypes
+        except ImportError:
+            raise ConnectError('error', "pywin32 not installed. Run: pip install pywin32")
+        return win32file, win32pipe, pywintypes
+
+    def _error(self, e):
+        code = e.args[0] if e.args else 0
+        message = e.args[2] if len(e.args) > 2 else str(e)
+        reason = {ERROR_FILE_NOT_FOUND: 'missing', ERROR_PIPE_BUSY: 'busy',
+                  ERROR_SEM_TIMEOUT: 'timeout'}.get(code, 'error')
+        return ConnectError(reason, "Error " + str(code) + ": " + message)
+
+    def probe(self, timeout: float = 0.1):
+        """Raise ConnectError unless the endpoint exists"""
+        win32file, win32pipe, pywintypes = self._win32()
+        try:
+            win32pipe.WaitNamedPipe(self.address, int(timeout * 1000))
+        except pywintypes.error as e:
+            error = self._error(e)
+            # Timed out: the pipe exists, all instances are just taken
+            if error.reason != 'timeout':
+                raise error
+
+    def connect(self, timeout: float = PIPE_TIMEOUT / 1000) -> SyncConnection:
+        win32file, win32pipe, pywintypes = self._win32()
+        try:
+            win32pipe.WaitNamedPipe(self.address, int(timeout * 1000))
+            handle = win32file.CreateFile(self.address, win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                                          0, None, win32file.OPEN_EXISTING, 0, None)
+        except pywintypes.error as e:
+            raise self._error(e)
+        return SyncConnection(lambda data: win32file.WriteFile(handle, data),
+                              lambda size: win32file.ReadFile(handle, size)[1],
+                              lambda: win32file.CloseHandle(handle))
+
+    async def serve(self, client_connected):
+        loop = asyncio.get_running_loop()
+        if not hasattr(loop, 'start_serving_pipe'):
+            raise ConnectError('error', "Serving a named pipe needs Windows; use a unix: or tcp: endpoint")
+
+        def factory():
+            return asyncio.StreamReaderProtocol(asyncio.StreamReader(), client_connected)
+
+        servers = await loop.start_serving_pipe(factory, self.address)
+        return _PipeServers(servers)
+
+
+class _PipeServers:
+    def __init__(self, servers):
+        self.servers = servers
+
+    def close(self):
+        for server in self.servers:
+            server.close()
+
+    async def wait_closed(self):
+        pass
+
+
+class SocketTransport:
+    """Common part of the Unix socket and TCP transports"""
+    family = None
+
+    def __str__(self):
+        return self.scheme + ':' + self.describe()
+
+    def _error(self, e):
+        if isinstance(e, socket.timeout):
+            return ConnectError('timeout', "Timed out connecting to " + str(self))
+        if isinstance(e, (FileNotFoundError, ConnectionRefusedError)):
+            return ConnectError('missing', f"Nothing is listening on {self} ({e.strerror})")
+        return ConnectError('error', str(e))
+
+    def probe(self, timeout: float = 0.1):
+        self.connect(timeout).close()
+
+    def connect(self, timeout: float = PIPE_TIMEOUT / 1000) -> SyncConnection:
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(self.address)
+            sock.settimeout(None)
+        except OSError as e:
+            sock.close()
+            raise self._error(e)
+        return SyncConnection(sock.sendall, sock.recv, sock.close)
+
+
+class UnixTransport(SocketTransport):
+    scheme = 'unix'
+    family = getattr(socket, 'AF_UNIX', None)
+
+    def __init__(self, path: str):
+        self.address = path
+
+    def describe(self):
+        return self.address
+
+    async def open(self):
+        try:
+            return await asyncio.open_unix_connection(self.address)
+        except OSError as e:
+            raise self._error(e)
+
+    async def serve(self, client_connected):
+        # A socket left behind by an earlier run
+        if os.path.exists(self.address) and stat.S_ISSOCK(os.stat(self.address).st_mode):
+            os.unlink(self.address)
+        # Anyone who can connect can plant or remove decoys: owner only,
+        # from the moment the socket exists rather than after a chmod
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(client_connected, self.address)
+        finally:
+            os.umask(umask)
+        os.chmod(self.address, 0o600)
+        return server
+
+
+class TcpTransport(SocketTransport):
+    scheme = 'tcp'
+    family = socket.AF_INET
+
+    def __init__(self, host: str, port: int):
+        self.address = (host, port)
+        if ':' in host:
+            self.family = socket.AF_INET6
+
+    def describe(self):
+        host, port = self.address
+        return f'[{host}]:{port}' if ':' in host else f'{host}:{port}'
+
+    async def open(self):
+        try:
+            return await asyncio.open_connection(*self.address)
+        except OSError as e:
+            raise self._error(e)
+
+    async def serve(self, client_connected):
+        host, port = self.address
+        # The protocol has no authentication: never listen beyond this host
+        if host != 'localhost' and not ipaddress.ip_address(host).is_loopback:
+            raise ValueError("Refusing to serve on non-loopback address " + host)
+        return await asyncio.start_server(client_connected, host, port)
+
+
+def parse_endpoint(text=None):
+    """'pipe:NAME', '\\\\.\\pipe\\NAME', 'unix:PATH', 'tcp:HOST:PORT' or 'tcp:PORT' -> transport"""
+    text = text or os.environ.get('PROJFS_ENDPOINT') or DEFAULT_ENDPOINT
+    if text.startswith('\\\\'):
+        return PipeTransport(text)
+    scheme, _, rest = text.partition(':')
+    if scheme == 'pipe' and rest:
+        return PipeTransport(rest)
+    if scheme == 'unix' and rest:
+        return UnixTransport(rest)
+    if scheme == 'tcp' and rest:
+        host, _, port = rest.rpartition(':')
+        host = host.strip('[]') or '127.0.0.1'
+        return TcpTransport(host, int(port))
+    raise ValueError("Unknown endpoint (expected pipe:, unix: or tcp:): " + text)
+